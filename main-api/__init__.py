@@ -1,15 +1,24 @@
 from os import PathLike
 from typing import Any
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from bson import ObjectId
+from pathlib import PurePath
 from flask_jwt_extended import JWTManager, create_access_token
 from datetime import timedelta
 from .models.user import User
 from .utils.config import Config
+from .utils.database import get_client, get_pool_stats
+from .utils.passwords import hasher, PasswordPoolSaturated
+from .utils.ratelimit import limiter
+from .utils.counters import counters
+from .models.timeline import fanout
+from pymongo import MongoClient
 import logging
 import os
 
 # Configurer le dossier de stockage des images
-UPLOAD_FOLDER = os.path.join('static', 'profile_pics')
+UPLOAD_FOLDER = Config.UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Create a logger
@@ -29,29 +38,90 @@ stream_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 logger.addHandler(stream_handler)
 
+class WatifJSONProvider(DefaultJSONProvider):
+    """JSON encoding of the model dicts: ObjectIds and paths are sent as strings, like in the NDJSON streams."""
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        if isinstance(o, (ObjectId, PurePath)):
+            return str(o)
+        return DefaultJSONProvider.default(o)
+
 class WatifAPI(Flask):
+    json_provider_class = WatifJSONProvider
+
     def __init__(self, import_name: str, static_url_path: str | None = None, static_folder: str | PathLike[str] | None = "static", static_host: str | None = None, host_matching: bool = False, subdomain_matching: bool = False, template_folder: str | PathLike[str] | None = "templates", instance_path: str | None = None, instance_relative_config: bool = False, root_path: str | None = None):
         super().__init__(import_name, static_url_path, static_folder, static_host, host_matching, subdomain_matching, template_folder, instance_path, instance_relative_config, root_path)
         self.config["JWT_SECRET_KEY"] = Config.SECRET_KEY
         self.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=Config.TOKEN_EXPIRES)  # Durée de validité du token
         self.jwt = JWTManager()
         self.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+        # Les corps multipart plus gros que la plus grande limite sont refusés (413) avant d'être lus
+        self.config['MAX_CONTENT_LENGTH'] = max(Config.UPLOAD_LIMITS["pp"], Config.UPLOAD_MAX_CHUNK) + 64 * 1024
 
         @self.route('/login', methods=['POST'])
+        @limiter.limit("login", email_field="mail")
         def login():
             data = request.get_json()
             email = data.get("mail")
             password = data.get("password")
 
             user = User.get_by_email(email)
-            if user and user.check_password(password):
-                access_token = create_access_token(identity=str(user._id))
-                return jsonify(access_token=access_token), 200
+            try:
+                if user and user.check_password(password):
+                    # Mise à niveau transparente du hash si le coût bcrypt a changé
+                    user.rehash_password(password)
+                    access_token = create_access_token(identity=str(user._id))
+                    return jsonify(access_token=access_token), 200
+            except PasswordPoolSaturated:
+                logger.warning("Login rejected: password pool saturated")
+                return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": "1"}
 
             return jsonify({"error": "Invalid email or password"}), 401
 
-        from routes.user_routes import user_bp
+        @self.route('/metrics/database', methods=['GET'])
+        def database_metrics():
+            return jsonify(get_pool_stats()), 200
+
+        @self.route('/metrics/passwords', methods=['GET'])
+        def password_metrics():
+            return jsonify(hasher.stats()), 200
+
+        @self.route('/metrics/counters', methods=['GET'])
+        def counter_metrics():
+            return jsonify(counters.stats()), 200
+
+        @self.route('/metrics/fanout', methods=['GET'])
+        def fanout_metrics():
+            return jsonify(fanout.stats()), 200
+
+        from .routes.user_routes import user_bp
+        from .routes.thread_routes import thread_bp
+        from .routes.post_routes import post_bp
+        from .routes.comment_routes import comment_bp
+        from .routes.key_routes import key_bp
+        from .routes.interest_routes import interest_bp
+        from .routes.upload_routes import upload_bp
+        from .routes.feed_routes import feed_bp
+        from .routes.search_routes import search_bp
+        from .routes.trending_routes import trending_bp
+        from .routes.suggestion_routes import suggestion_bp
         self.register_blueprint(user_bp)
+        self.register_blueprint(thread_bp)
+        self.register_blueprint(post_bp)
+        self.register_blueprint(comment_bp)
+        self.register_blueprint(key_bp)
+        self.register_blueprint(interest_bp)
+        self.register_blueprint(upload_bp)
+        self.register_blueprint(feed_bp)
+        self.register_blueprint(search_bp)
+        self.register_blueprint(trending_bp)
+        self.register_blueprint(suggestion_bp)
+
+    @property
+    def mongo(self) -> MongoClient:
+        """Process-wide pooled client, created on first use and recreated in forked workers."""
+        return get_client()
 
     def run(self, host: str | None = None, port: int | None = None, debug: bool | None = None, load_dotenv: bool = True, **options: Any) -> None:
         self.jwt.init_app(self)
@@ -1,9 +1,67 @@
 import argparse
+import sys
 from . import WatifAPI
 
 def main(debug, host, port):
     WatifAPI().run(debug=debug, host=host, port=port)
 
+def indexes(action, prune=False):
+    from .utils.indexes import diff_indexes, sync_indexes, check_query_plans
+
+    if action == "check":
+        report = check_query_plans()
+        for finder, status, stages in report:
+            print(f"{status:8} {finder}: {' > '.join(stages)}")
+        return 1 if any(status != "ok" for _, status, _ in report) else 0
+
+    diffs = sync_indexes(prune=prune) if action == "sync" else diff_indexes()
+    for diff in diffs:
+        for index in diff.missing:
+            print(f"{diff.collection}: missing {index.document['name']}" + (" (created)" if action == "sync" else ""))
+        for index in diff.changed:
+            print(f"{diff.collection}: changed {index.document['name']}" + (" (rebuilt)" if action == "sync" and prune else ""))
+        for name in diff.extra:
+            print(f"{diff.collection}: undeclared {name}" + (" (dropped)" if action == "sync" and prune else ""))
+    return 0 if action == "sync" or all(diff.is_clean() for diff in diffs) else 1
+
+def migrate(name, batch_size, max_batches=None):
+    from .utils.migrations import migrate_comments, migrate_likes, migrate_comment_trees, migrate_memberships, migrate_thread_stats, MigrationOrderError
+
+    migrations = {"comments": migrate_comments, "likes": migrate_likes, "comment-trees": migrate_comment_trees,
+                  "memberships": migrate_memberships, "thread-stats": migrate_thread_stats}
+    try:
+        state = migrations[name](batch_size=batch_size, max_batches=max_batches,
+                                 progress=lambda state: print(f"{state['processed']} documents migrated (last _id: {state['last_id']})"))
+    except MigrationOrderError as e:
+        print(e)
+        return 1
+    print("Migration complete" if state["done"] else "Migration paused, run the command again to resume")
+    return 0
+
+def trending(action):
+    from .models.trending import TrendingSnapshot
+
+    if action == "refresh":
+        snapshot = TrendingSnapshot.compute()
+        print(", ".join(f"{window}: {len(keys)} keys" for window, keys in snapshot.windows.items()))
+    return 0
+
+def suggestions(action, full=False, chunk_size=None):
+    from .models.suggestion import Suggestion
+
+    if action == "compute":
+        count = Suggestion.compute(full=full, chunk_size=chunk_size,
+                                   progress=lambda done, total: print(f"{done}/{total} users"))
+        print(f"Suggestions computed for {count} users")
+    return 0
+
+def uploads(action):
+    from .models.upload import Upload
+
+    if action == "purge":
+        print(f"{Upload.purge_expired()} expired upload parts removed")
+    return 0
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the Watif API")
     parser.add_argument('--debug', action='store_true', help='Run the API in debug mode')
@@ -11,8 +69,40 @@ if __name__ == "__main__":
     parser.add_argument('--port', type=int, default=5000, help='Port to run the API on')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose output')
 
+    subparsers = parser.add_subparsers(dest='command')
+    indexes_parser = subparsers.add_parser('indexes', help='Manage the MongoDB indexes declared by the models')
+    indexes_parser.add_argument('action', choices=['sync', 'diff', 'check'], help='Create missing indexes, show differences, or explain() every finder query')
+    indexes_parser.add_argument('--prune', action='store_true', help='With sync, also rebuild changed indexes and drop undeclared ones')
+
+    migrate_parser = subparsers.add_parser('migrate', help='Run a resumable data migration')
+    migrate_parser.add_argument('name', choices=['comments', 'likes', 'comment-trees', 'memberships', 'thread-stats'], help='comments: move comments from the posts collection to their own collection; likes: move embedded likes to the likes collection (after comments); comment-trees: replace reply arrays by materialized paths (after comments); memberships: move thread members to the memberships collection; thread-stats: recompute post_count and last_post_at of threads')
+    migrate_parser.add_argument('--batch-size', type=int, default=1000, help='Documents processed per batch')
+    migrate_parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches (the next run resumes)')
+
+    uploads_parser = subparsers.add_parser('uploads', help='Maintain the resumable upload sessions')
+    uploads_parser.add_argument('action', choices=['purge'], help='purge: remove the part files of expired sessions')
+
+    trending_parser = subparsers.add_parser('trending', help='Maintain the trending keys')
+    trending_parser.add_argument('action', choices=['refresh'], help='refresh: recompute the trending snapshot and drop expired buckets')
+
+    suggestions_parser = subparsers.add_parser('suggestions', help='Maintain the suggested users and threads (requires numpy and scipy)')
+    suggestions_parser.add_argument('action', choices=['compute'], help='compute: recompute the suggestions of the users whose interests, follows or memberships changed')
+    suggestions_parser.add_argument('--full', action='store_true', help='Recompute every user')
+    suggestions_parser.add_argument('--chunk-size', type=int, default=None, help='Users per block of the similarity products')
+
     args = parser.parse_args()
 
+    if args.command == 'indexes':
+        sys.exit(indexes(args.action, prune=args.prune))
+    if args.command == 'migrate':
+        sys.exit(migrate(args.name, args.batch_size, args.max_batches))
+    if args.command == 'uploads':
+        sys.exit(uploads(args.action))
+    if args.command == 'trending':
+        sys.exit(trending(args.action))
+    if args.command == 'suggestions':
+        sys.exit(suggestions(args.action, full=args.full, chunk_size=args.chunk_size))
+
     if args.verbose:
         print(f"Starting the API on {args.host}:{args.port} with debug={args.debug}")
 
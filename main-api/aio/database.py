@@ -0,0 +1,27 @@
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from ..utils.config import Config
+from ..utils.database import client_options
+
+# Client asynchrone (driver asyncio natif de pymongo) : créé au premier accès, donc dans
+# la boucle d'événements du worker ASGI, et jamais partagé entre processus.
+
+_client: AsyncMongoClient | None = None
+
+
+def get_async_client() -> AsyncMongoClient:
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(Config.MONGO_URI, **client_options())
+    return _client
+
+
+def get_async_database() -> AsyncDatabase:
+    return get_async_client()[Config.MONGO_DB]
+
+
+async def close_async_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
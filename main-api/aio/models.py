@@ -0,0 +1,201 @@
+from typing import AsyncIterator
+from bson import ObjectId
+from pymongo.asynchronous.collection import AsyncCollection
+from ..models.base import Document
+from ..models.user import User
+from ..models.role import Role
+from ..models.key import Key
+from ..models.interest import Interest
+from ..models.thread import Thread
+from ..models.suggestion import Suggestion
+from ..models.post import Post
+from ..models.comment import Comment
+from ..utils.config import Config
+from ..utils.helpers import to_objectid
+from ..utils.pagination import ID_SORT, RECENT_SORT, page_query, split_page
+from .database import get_async_database
+
+
+class AsyncModel:
+    """
+    Asyncio mirror of a sync model: same collection and dataclass, non-blocking data access.
+
+    Objects returned are instances of the sync model (`User`, `Thread`...), so DTO conversion and
+    dirty tracking are shared; only the methods that talk to MongoDB are re-implemented here.
+
+    Methods:
+        get_by_id(obj_id, projection=None) -> Document | None: Retrieves a document by its ID.
+        get_by_ids(ids, projection=None) -> tuple[list[Document], list[ObjectId]]: Retrieves several documents in one query.
+        page(limit=30, cursor=None, projection=None, **kwargs) -> tuple[list[Document], str | None]: Retrieves one page.
+        stream(projection=None, **kwargs) -> AsyncIterator[Document]: Iterates over matching documents in batches.
+        save(obj) -> None: Inserts the object or sends its pending changes.
+        delete(obj) -> None: Deletes the object.
+    """
+    model: type[Document]
+    sort: list[tuple[str, int]] = ID_SORT
+
+    @classmethod
+    def collection(cls) -> AsyncCollection:
+        return get_async_database()[cls.model.COLLECTION]
+
+    @classmethod
+    def _build(cls, data: dict, projection: dict | None = None) -> Document:
+        return cls.model.from_partial(data) if projection else cls.model(**data)
+
+    @classmethod
+    async def get_by_id(cls, obj_id: str | ObjectId, projection: dict | None = None) -> Document | None:
+        data = await cls.collection().find_one({"_id": to_objectid(obj_id)}, projection)
+        return cls._build(data, projection) if data else None
+
+    @classmethod
+    async def get_by_ids(cls, ids: list[str | ObjectId], projection: dict | None = None) -> tuple[list[Document], list[ObjectId]]:
+        ids = [to_objectid(i) for i in ids]
+        if not ids:
+            return [], []
+        by_id = {doc["_id"]: doc async for doc in cls.collection().find({"_id": {"$in": list(set(ids))}}, projection)}
+        found, missing = [], []
+        for i in ids:
+            if i in by_id:
+                found.append(cls._build(by_id[i], projection))
+            else:
+                missing.append(i)
+        return found, missing
+
+    @classmethod
+    async def page(cls, limit: int = 30, cursor: str | None = None, projection: dict | None = None,
+                   **kwargs) -> tuple[list[Document], str | None]:
+        find = cls.collection().find(page_query(kwargs, cls.sort, cursor), projection).sort(cls.sort).limit(limit + 1)
+        docs, next_cursor = split_page(await find.to_list(None), cls.sort, limit)
+        return [cls._build(data, projection) for data in docs], next_cursor
+
+    @classmethod
+    async def stream(cls, projection: dict | None = None, **kwargs) -> AsyncIterator[Document]:
+        async for data in cls.collection().find(kwargs, projection).sort(cls.sort).batch_size(Config.STREAM_BATCH_SIZE):
+            yield cls._build(data, projection)
+
+    @classmethod
+    async def save(cls, obj: Document) -> None:
+        if obj._id is None:
+            result = await cls.collection().insert_one(obj.to_document())
+            obj._id = result.inserted_id
+        else:
+            update = obj.changes()
+            if update:
+                await cls.collection().update_one({"_id": obj._id}, update)
+        obj.mark_clean()
+
+    @classmethod
+    async def delete(cls, obj: Document) -> None:
+        if obj._id:
+            await cls.collection().delete_one({"_id": obj._id})
+
+    @classmethod
+    async def _get_by_name(cls, name: str) -> Document | None:
+        data = await cls.collection().find_one({"name": name})
+        return cls.model(**data) if data else None
+
+
+class AsyncUser(AsyncModel):
+    model = User
+
+    @classmethod
+    async def get_by_email(cls, user_email: str) -> User | None:
+        data = await cls.collection().find_one({"email": user_email})
+        return User(**data) if data else None
+
+    @classmethod
+    async def exists(cls, user_id: str | ObjectId) -> bool:
+        return await cls.collection().count_documents({"_id": to_objectid(user_id)}, limit=1) == 1
+
+    @classmethod
+    async def stream_by_ids(cls, user_ids: list[str | ObjectId], projection: dict | None = None) -> AsyncIterator[User]:
+        for start in range(0, len(user_ids), Config.STREAM_BATCH_SIZE):
+            users, _ = await cls.get_by_ids(user_ids[start:start + Config.STREAM_BATCH_SIZE], projection)
+            for user in users:
+                yield user
+
+    @classmethod
+    async def _edit_relation(cls, user_id: str | ObjectId, relation: str, target_id: str | ObjectId, add: bool) -> bool | None:
+        user_id, target_id = to_objectid(user_id), to_objectid(target_id)
+        if add:
+            result = await cls.collection().update_one({"_id": user_id, relation: {"$ne": target_id}}, {"$addToSet": {relation: target_id}})
+        else:
+            result = await cls.collection().update_one({"_id": user_id, relation: target_id}, {"$pull": {relation: target_id}})
+        if result.modified_count:
+            if relation == "followed":
+                await cls.collection().update_one({"_id": target_id}, {"$inc": {"follower_count": 1 if add else -1}})
+            await get_async_database().suggestions.update_one({"_id": user_id}, Suggestion.stale_update(), upsert=True)
+            return True
+        return False if await cls.exists(user_id) else None
+
+    @classmethod
+    async def follow(cls, user_id: str | ObjectId, target_id: str | ObjectId) -> bool | None:
+        return await cls._edit_relation(user_id, "followed", target_id, add=True)
+
+    @classmethod
+    async def unfollow(cls, user_id: str | ObjectId, target_id: str | ObjectId) -> bool | None:
+        return await cls._edit_relation(user_id, "followed", target_id, add=False)
+
+    @classmethod
+    async def block(cls, user_id: str | ObjectId, target_id: str | ObjectId) -> bool | None:
+        return await cls._edit_relation(user_id, "blocked", target_id, add=True)
+
+    @classmethod
+    async def unblock(cls, user_id: str | ObjectId, target_id: str | ObjectId) -> bool | None:
+        return await cls._edit_relation(user_id, "blocked", target_id, add=False)
+
+
+class AsyncRole(AsyncModel):
+    model = Role
+
+    @classmethod
+    async def get_by_name(cls, role_name: str) -> Role | None:
+        return await cls._get_by_name(role_name)
+
+
+class AsyncKey(AsyncModel):
+    model = Key
+
+    @classmethod
+    async def get_by_name(cls, key_name: str) -> Key | None:
+        return await cls._get_by_name(key_name)
+
+
+class AsyncInterest(AsyncModel):
+    model = Interest
+
+    @classmethod
+    async def get_by_name(cls, interest_name: str) -> Interest | None:
+        return await cls._get_by_name(interest_name)
+
+
+class AsyncThread(AsyncModel):
+    model = Thread
+
+    @classmethod
+    async def role_of(cls, thread: Thread, id_user: str | ObjectId | None) -> str | None:
+        if id_user is None:
+            return None
+        id_user = to_objectid(id_user)
+        if id_user == thread.id_owner:
+            return "owner"
+        doc = await get_async_database().memberships.find_one({"id_thread": thread._id, "id_user": id_user}, {"role": 1, "_id": 0})
+        return doc["role"] if doc else None
+
+    @classmethod
+    async def can_read(cls, thread: Thread, id_user: str | ObjectId | None) -> bool:
+        return thread.public or await cls.role_of(thread, id_user) is not None
+
+    @classmethod
+    async def get_posts(cls, thread: Thread, limit: int = 30, cursor: str | None = None) -> tuple[list[Post], str | None]:
+        return await AsyncPost.page(limit, cursor, id_thread=thread._id)
+
+
+class AsyncPost(AsyncModel):
+    model = Post
+    sort = RECENT_SORT
+
+
+class AsyncComment(AsyncModel):
+    model = Comment
+    sort = RECENT_SORT
@@ -0,0 +1,242 @@
+import json
+import re
+from typing import AsyncIterator, Awaitable, Callable
+from urllib.parse import parse_qsl
+import jwt
+from flask import Flask
+from flask_jwt_extended import decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from ..dtos.user_dto import PrivateUserDTO, PublicUserDTO
+from ..models.user import User
+from ..utils.helpers import isobjectid
+from ..utils.streaming import NDJSON_MIMETYPE
+from .database import close_async_client
+from .models import AsyncUser, AsyncRole, AsyncThread, AsyncPost
+from .. import logger
+
+
+class Request:
+    def __init__(self, scope: dict, receive: Callable, app: Flask | None = None):
+        self.app = app
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        self.args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self._receive = receive
+
+    async def json(self) -> dict | None:
+        body = b""
+        while True:
+            message = await self._receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        try:
+            return json.loads(body) if body else None
+        except ValueError:
+            return None
+
+    def identity(self) -> str | None:
+        """Return the user ID of the bearer access token issued by /login, or None.
+
+        The token is decoded by flask_jwt_extended with the JWT_* settings of the Flask application,
+        exactly as `jwt_required` does on the sync routes.
+        """
+        auth = self.headers.get("authorization", "")
+        if self.app is None or not auth.startswith("Bearer "):
+            return None
+        try:
+            with self.app.app_context():
+                claims = decode_token(auth[7:])
+        except (jwt.PyJWTError, JWTExtendedException):
+            return None
+        return claims.get(self.app.config["JWT_IDENTITY_CLAIM"]) if claims.get("type") == "access" else None
+
+    def wants_ndjson(self) -> bool:
+        return self.args.get("stream", "").lower() in ("1", "true", "ndjson") or NDJSON_MIMETYPE in self.headers.get("accept", "")
+
+
+class Response:
+    def __init__(self, body: bytes | AsyncIterator[bytes], status: int = 200, headers: dict | None = None,
+                 mimetype: str = "application/json"):
+        self.body = body
+        self.status = status
+        self.headers = {"content-type": mimetype, **(headers or {})}
+
+    async def send(self, send: Callable) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status,
+            "headers": [(k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in self.headers.items()],
+        })
+        if isinstance(self.body, bytes):
+            await send({"type": "http.response.body", "body": self.body})
+            return
+        async for chunk in self.body:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def json_response(data, status: int = 200, headers: dict | None = None) -> Response:
+    return Response(json.dumps(data, default=str).encode("utf-8"), status, headers)
+
+
+def ndjson_response(items: AsyncIterator, serialize: Callable) -> Response:
+    async def generate():
+        async for item in items:
+            yield (json.dumps(await serialize(item), default=str) + "\n").encode("utf-8")
+    return Response(generate(), mimetype=NDJSON_MIMETYPE)
+
+
+class AsyncRouter:
+    """
+    Minimal ASGI router serving the asyncio route variants.
+
+    Requests that match no async route are handed to `fallback`, the Flask application wrapped
+    for ASGI, so every blueprint stays reachable through the same entry point. `app` is that Flask
+    application, whose JWT settings authenticate the async routes.
+    """
+
+    def __init__(self, fallback: Callable | None = None, app: Flask | None = None):
+        self.fallback = fallback
+        self.app = app
+        self.routes: list[tuple[re.Pattern, tuple[str, ...], Callable[..., Awaitable[Response]]]] = []
+
+    def route(self, path: str, methods: tuple[str, ...] = ("GET",)):
+        pattern = re.compile("^" + re.sub(r"<(\w+)>", r"(?P<\1>[^/]+)", path) + "$")
+
+        def decorator(handler):
+            self.routes.append((pattern, methods, handler))
+            return handler
+        return decorator
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] == "http":
+            for pattern, methods, handler in self.routes:
+                match = pattern.match(scope["path"])
+                if match and scope["method"] in methods:
+                    response = await handler(Request(scope, receive, self.app), **match.groupdict())
+                    return await response.send(send)
+        await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await close_async_client()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+router = AsyncRouter()
+
+
+async def _roles_by_id(users: list[User]) -> dict:
+    roles, _ = await AsyncRole.get_by_ids(list({user.id_role for user in users}))
+    return {role._id: role for role in roles}
+
+
+@router.route("/api/user/<user_id>")
+async def get_user(request: Request, user_id: str):
+    current_user_id = request.identity()
+    logger.info(f"GET /user/{user_id} (async) - Current user ID: {current_user_id}")
+    if not isobjectid(user_id):
+        return json_response({"error": "User not found"}, 404)
+    user = await AsyncUser.get_by_id(user_id, projection=User.projection(PrivateUserDTO))
+    if not user:
+        logger.error(f"User {user_id} not found")
+        return json_response({"error": "User not found"}, 404)
+    role = await AsyncRole.get_by_id(user.id_role)
+    private = str(user._id) == current_user_id or role.name != 'admin'
+    return json_response(user.to_dto(private=private, role=role).model_dump())
+
+
+@router.route("/api/user/<user_id>/followed")
+async def get_followed_users(request: Request, user_id: str):
+    logger.info(f"GET /user/{user_id}/followed (async)")
+    user = await AsyncUser.get_by_id(user_id, projection={"followed": 1}) if isobjectid(user_id) else None
+    if not user:
+        logger.error(f"User {user_id} not found")
+        return json_response({"error": "User not found"}, 404)
+
+    projection = User.projection(PublicUserDTO)
+    if request.wants_ndjson():
+        roles = {}
+
+        async def serialize(followed_user: User) -> dict:
+            if followed_user.id_role not in roles:
+                roles[followed_user.id_role] = await AsyncRole.get_by_id(followed_user.id_role)
+            return followed_user.to_dto(role=roles[followed_user.id_role]).model_dump()
+        return ndjson_response(AsyncUser.stream_by_ids(user.followed, projection), serialize)
+
+    followed_users, _ = await AsyncUser.get_by_ids(user.followed, projection)
+    roles = await _roles_by_id(followed_users)
+    return json_response([followed_user.to_dto(role=roles[followed_user.id_role]).model_dump() for followed_user in followed_users])
+
+
+async def _edit_relation(request: Request, user_id: str, action: str) -> Response:
+    current_user_id = request.identity()
+    if current_user_id is None:
+        return json_response({"msg": "Missing Authorization Header"}, 401)
+    logger.info(f"POST /user/{user_id}/{action} (async) - Current user ID: {current_user_id}")
+    if not isobjectid(user_id) or not await AsyncUser.exists(user_id):
+        logger.error(f"Target user not found - ID: {user_id}")
+        return json_response({"error": "Target user not found"}, 404)
+    changed = await getattr(AsyncUser, action)(current_user_id, user_id)
+    if changed is None:
+        logger.error(f"Current user not found - ID: {current_user_id}")
+        return json_response({"error": "Current user not found"}, 404)
+    messages = {
+        "follow": ("You are now following this user", "You are already following this user"),
+        "unfollow": ("You have unfollowed this user", "You are not following this user"),
+        "block": ("You have blocked this user", "This user is already blocked"),
+        "unblock": ("You have unblocked this user", "This user is not in your blocked list"),
+    }
+    return json_response({"message": messages[action][0 if changed else 1]}, 200 if changed else 400)
+
+
+@router.route("/api/user/<user_id>/follow", methods=("POST",))
+async def follow_user(request: Request, user_id: str):
+    return await _edit_relation(request, user_id, "follow")
+
+
+@router.route("/api/user/<user_id>/unfollow", methods=("POST",))
+async def unfollow_user(request: Request, user_id: str):
+    return await _edit_relation(request, user_id, "unfollow")
+
+
+@router.route("/api/user/<user_id>/block", methods=("POST",))
+async def block_user(request: Request, user_id: str):
+    return await _edit_relation(request, user_id, "block")
+
+
+@router.route("/api/user/<user_id>/unblock", methods=("POST",))
+async def unblock_user(request: Request, user_id: str):
+    return await _edit_relation(request, user_id, "unblock")
+
+
+@router.route("/threads/<thread_id>/posts")
+async def get_thread_posts(request: Request, thread_id: str):
+    current_user_id = request.identity()
+    thread = await AsyncThread.get_by_id(thread_id) if isobjectid(thread_id) else None
+    if not thread or not await AsyncThread.can_read(thread, current_user_id):
+        return json_response({"error": "Thread not found or access denied"}, 404)
+
+    if request.wants_ndjson():
+        async def serialize(post) -> dict:
+            return post.__dict__
+        return ndjson_response(AsyncPost.stream(id_thread=thread._id), serialize)
+
+    try:
+        limit = min(max(int(request.args.get("limit", 30)), 1), 100)
+    except ValueError:
+        return json_response({"error": "Invalid limit"}, 400)
+    try:
+        posts, next_cursor = await AsyncThread.get_posts(thread, limit=limit, cursor=request.args.get("cursor"))
+    except ValueError:
+        return json_response({"error": "Invalid cursor"}, 400)
+    return json_response([post.__dict__ for post in posts], headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
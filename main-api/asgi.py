@@ -0,0 +1,13 @@
+from asgiref.wsgi import WsgiToAsgi
+from . import WatifAPI
+from .aio.routes import router
+
+# Point d'entrée ASGI (ex: `uvicorn main-api.asgi:app`) : les routes à fort trafic sont
+# servies par leurs variantes asyncio, toutes les autres par l'application Flask et ses blueprints.
+
+flask_app = WatifAPI(__name__)
+flask_app.jwt.init_app(flask_app)
+
+router.fallback = WsgiToAsgi(flask_app)
+router.app = flask_app
+app = router
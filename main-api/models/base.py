@@ -0,0 +1,204 @@
+import copy
+from dataclasses import fields
+from typing import NamedTuple
+from pymongo import IndexModel
+from pymongo.collection import Collection
+
+_MISSING = object()
+
+
+class UnloadedFieldError(AttributeError):
+    """Raised when reading a field that the projection used to load the document left out."""
+
+
+class QueryShape(NamedTuple):
+    """A representative query issued by a model finder, checked with `explain()` to ensure an index serves it."""
+    finder: str
+    filter: dict
+    sort: list[tuple[str, int]] | None = None
+
+
+class Document:
+    """
+    Base class of the MongoDB-backed dataclasses, tracking what changed since the document was loaded or saved.
+
+    The state of the fields is snapshotted after `__init__` and after each write, so `save()` only sends
+    the fields that actually differ. List fields that only gained or only lost elements are written with
+    `$addToSet`/`$pull` instead of being rewritten. The snapshot lives in a slot, not in `__dict__`.
+
+    Methods:
+        to_document() -> dict: Returns the fields to store in MongoDB.
+        mark_clean() -> None: Records the current state as the persisted one.
+        changes() -> dict: Returns the minimal update document for the pending changes.
+        added_items(name: str) -> list: Returns the elements added to a list field since the last snapshot.
+        from_partial(data: dict) -> Document: Builds an object from a projected document.
+
+    Class attributes:
+        COLLECTION (str): Name of the MongoDB collection holding the documents.
+        INDEXES (list[IndexModel]): Indexes the collection must have, created by `indexes sync`.
+        QUERIES (list[QueryShape]): Shapes of the finder queries, checked by `indexes check`.
+    """
+    __slots__ = ("_snapshot",)
+
+    COLLECTION: str = ""
+    INDEXES: list[IndexModel] = []
+    QUERIES: list[QueryShape] = []
+
+    def __post_init__(self):
+        self.mark_clean()
+
+    @classmethod
+    def field_names(cls) -> list[str]:
+        return [f.name for f in fields(cls)]
+
+    @classmethod
+    def from_partial(cls, data: dict) -> 'Document':
+        """Build an object from a document loaded with a projection.
+
+        `__init__` is bypassed, so missing required fields are allowed; reading one of them
+        raises `UnloadedFieldError` instead of silently returning a default value.
+        """
+        obj = object.__new__(_partial_class(cls))
+        obj.__dict__.update(data)
+        obj.mark_clean()
+        return obj
+
+    def is_partial(self) -> bool:
+        return any(name not in self.__dict__ for name in self.field_names())
+
+    def to_document(self) -> dict:
+        """Return the document to insert, without `_id` when MongoDB has not assigned one yet."""
+        doc = {name: self.__dict__[name] for name in self.field_names() if name in self.__dict__}
+        if doc.get("_id") is None:
+            doc.pop("_id", None)
+        return doc
+
+    def mark_clean(self) -> None:
+        self._snapshot = {
+            name: copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+            for name, value in self.__dict__.items()
+        }
+
+    def is_dirty(self) -> bool:
+        return bool(self.changes())
+
+    def changes(self) -> dict:
+        """Build the update document for the fields modified since the last snapshot.
+
+        Returns:
+            dict: A mix of `$set`, `$unset`, `$addToSet` and `$pull` operators, empty if nothing changed.
+        """
+        snapshot = getattr(self, "_snapshot", None) or {}
+        update = {}
+        for name in self.field_names():
+            if name == "_id":
+                continue
+            old = snapshot.get(name, _MISSING)
+            new = self.__dict__.get(name, _MISSING)
+            if new is _MISSING:
+                if old is not _MISSING:
+                    update.setdefault("$unset", {})[name] = ""
+                continue
+            if old is not _MISSING and old == new:
+                continue
+            if isinstance(old, list) and isinstance(new, list):
+                op = _list_delta(old, new)
+                if op is not None:
+                    operator, value = op
+                    update.setdefault(operator, {})[name] = value
+                    continue
+            update.setdefault("$set", {})[name] = new
+        return update
+
+    def added_items(self, name: str) -> list:
+        """Return the elements of the list field `name` added since the snapshot, all of them if not inserted yet."""
+        items = self.__dict__.get(name, [])
+        if self.__dict__.get("_id") is None:
+            return list(items)
+        old = (getattr(self, "_snapshot", None) or {}).get(name, [])
+        return [item for item in items if item not in old]
+
+    def _persist(self, collection: Collection) -> None:
+        """Insert the document, or send only the pending changes if it already exists."""
+        if self._id is None:
+            result = collection.insert_one(self.to_document())
+            self._id = result.inserted_id
+        else:
+            update = self.changes()
+            if update:
+                collection.update_one({"_id": self._id}, update)
+        self.mark_clean()
+
+    def _add_to_set(self, collection: Collection, name: str, value) -> bool:
+        """Atomically add `value` to the list field `name`.
+
+        Returns:
+            bool: True if the value was added, False if it was already present.
+        """
+        result = collection.update_one({"_id": self._id, name: {"$ne": value}}, {"$addToSet": {name: value}})
+        items = getattr(self, name)
+        if value not in items:
+            items.append(value)
+        self._snapshot[name] = list(items)
+        return result.modified_count == 1
+
+    def _pull(self, collection: Collection, name: str, value) -> bool:
+        """Atomically remove `value` from the list field `name`.
+
+        Returns:
+            bool: True if the value was removed, False if it was not present.
+        """
+        result = collection.update_one({"_id": self._id, name: value}, {"$pull": {name: value}})
+        setattr(self, name, [item for item in getattr(self, name) if item != value])
+        self._snapshot[name] = list(getattr(self, name))
+        return result.modified_count == 1
+
+
+class _LoadedField:
+    """Descriptor of the partial classes: reads the instance value, or fails if it was not loaded."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise UnloadedFieldError(f"Field '{self.name}' of {owner.__name__} was not loaded by the projection") from None
+
+    def __set__(self, obj, value) -> None:
+        obj.__dict__[self.name] = value
+
+    def __delete__(self, obj) -> None:
+        del obj.__dict__[self.name]
+
+
+_partial_classes: dict[type, type] = {}
+
+
+def _partial_class(cls: type) -> type:
+    # Sous-classe créée une seule fois par modèle : les objets complets ne paient aucun surcoût.
+    if cls not in _partial_classes:
+        namespace = {name: _LoadedField(name) for name in cls.field_names()}
+        namespace["__repr__"] = lambda self: f"{cls.__name__}(partial, {', '.join(f'{k}={v!r}' for k, v in self.__dict__.items())})"
+        _partial_classes[cls] = type(f"Partial{cls.__name__}", (cls,), namespace)
+    return _partial_classes[cls]
+
+
+def _list_delta(old: list, new: list) -> tuple[str, dict] | None:
+    # Only pure additions or pure removals can be expressed without rewriting the list.
+    try:
+        old_set, new_set = set(old), set(new)
+    except TypeError:
+        return None
+    if len(old_set) != len(old) or len(new_set) != len(new):
+        return None
+    added = [item for item in new if item not in old_set]
+    removed = [item for item in old if item not in new_set]
+    if added and not removed and new[:len(old)] == old:
+        return "$addToSet", {"$each": added}
+    if removed and not added and [item for item in old if item in new_set] == new:
+        return "$pull", {"$in": removed}
+    return None
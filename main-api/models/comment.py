@@ -2,56 +2,224 @@ from dataclasses import dataclass, field
 from bson import ObjectId
 from datetime import datetime
 from pathlib import Path
-from ..utils.database import get_database
-from typing import Generator
+from ..utils.database import get_database, find_by_ids
+from ..utils.pagination import paginate, RECENT_SORT, CHRONO_SORT
+from ..utils.counters import counters
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from .base import Document, QueryShape
+from ..utils.helpers import to_objectid
+from ..utils import identity_map
+from ..utils.search import search, text_index
+from typing import Generator, NamedTuple
 from .user import User
+from .like import Like
 from .key import Key
-from PIL.Image import Image
+from .trending import KeyBucket
+from .media import Media
 from ..utils.config import Config
 
 db = get_database()
 
-@dataclass
-class Comment:
+
+class CommentNode(NamedTuple):
+    """A comment and the replies loaded with it, assembled in memory from one query."""
+    comment: 'Comment'
+    replies: list['CommentNode']
+
+    def to_dict(self) -> dict:
+        return {**self.comment.__dict__, "replies": [reply.to_dict() for reply in self.replies]}
+
+
+@dataclass(kw_only=True)
+class Comment(Document):
+    """
+    Comment of a post, or reply to another comment.
+
+    Comments form a tree stored with materialized paths: each one carries the post at the root of its
+    tree and the list of its ancestors, so a whole tree, a sub-tree or the first levels of it are read
+    with one indexed query and assembled in memory (see `tree` and `page_with_replies`).
+
+    Attributes:
+        id_post (ObjectId): Post at the root of the tree.
+        id_parent (ObjectId | None): Comment replied to, None for a comment of the post itself.
+        path (list[ObjectId]): Ancestor comments, from the top-level one down to the parent.
+        depth (int): Length of `path` (0 for a top-level comment).
+        reply_count (int): Number of direct replies, updated through the buffered counters.
+
+    Methods:
+        reply(id_author, content, **kwargs) -> Comment: Creates a reply to this comment.
+        get_replies(limit=30, cursor=None) -> tuple[list[Comment], str | None]: Pages through the direct replies.
+        create(id_post, id_author, content, parent=None, **kwargs) -> Comment: Creates a comment in a tree.
+        siblings(id_post, id_parent=None, limit=30, cursor=None) -> tuple[list[Comment], str | None]: Pages through a level.
+        tree(id_post, root=None, max_depth=None) -> list[CommentNode]: Loads a tree or a sub-tree in one query.
+        page_with_replies(id_post, limit=30, cursor=None, depth=2, replies=3) -> tuple[list[CommentNode], str | None]:
+            Loads a page of top-level comments with their first replies, in two queries.
+    """
+    COLLECTION = "comments"
+    INDEXES = [
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)], name="comments_recent"),
+        IndexModel([("id_post", ASCENDING), ("depth", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)], name="post_tree"),
+        IndexModel([("id_post", ASCENDING), ("id_parent", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)], name="siblings"),
+        IndexModel([("path", ASCENDING), ("depth", ASCENDING)], name="subtree"),
+        text_index("comments"),
+    ]
+    QUERIES = [
+        QueryShape("get_by_id", {"_id": ObjectId()}),
+        QueryShape("page", {}, RECENT_SORT),
+        QueryShape("tree", {"id_post": ObjectId(), "depth": {"$lte": 3}}),
+        QueryShape("siblings", {"id_post": ObjectId(), "id_parent": None}, CHRONO_SORT),
+        QueryShape("subtree", {"path": {"$in": [ObjectId()]}, "depth": {"$lte": 3}}),
+    ]
+
     _id: ObjectId = field(default_factory=lambda: None)
     id_author: ObjectId
     date: datetime = field(default_factory=lambda: datetime.now())
     content: str
-    medias: list[Path] = field(default_factory=list)
+    medias: list[dict] = field(default_factory=list)  # métadonnées des fichiers, voir Media
     keys: list[ObjectId] = field(default_factory=list)
-    likes: list[ObjectId] = field(default_factory=list)
-    comments: list[ObjectId] = field(default_factory=list)
+    like_count: int = 0  # dénormalisé, les likes sont dans la collection `likes`
+    id_post: ObjectId = None
+    id_parent: ObjectId | None = None
+    path: list[ObjectId] = field(default_factory=list)  # ancêtres, du commentaire de premier niveau au parent
+    depth: int = 0
+    reply_count: int = 0
 
     def save(self) -> None:
-        if self._id is None:
-            result = db.posts.insert_one(self.__dict__)
-            self._id = result.inserted_id
-        else:
-            db.posts.update_one({"_id": self._id}, {"$set": self.__dict__})
+        added_keys = self.added_items("keys")
+        self._persist(db.comments)
+        identity_map.invalidate("comments", self._id)
+        search.update("comments", self)
+        KeyBucket.record(added_keys)
 
     def delete(self) -> None:
+        """Delete the comment and every reply below it."""
         if self._id:
-            db.posts.delete_one({"_id": self._id})
+            ids = [self._id] + [doc["_id"] for doc in db.comments.find({"path": self._id}, {"_id": 1})]
+            db.comments.delete_many({"_id": {"$in": ids}})
+            Like.delete_all(*ids)
+            for comment_id in ids:
+                identity_map.invalidate("comments", comment_id)
+                search.remove("comments", comment_id)
+            if self.id_parent is not None:
+                counters.incr("comments", self.id_parent, "reply_count", -1)
 
     def get_keys(self) -> list[Key]:
-        return [Key.get_by_id(key_id) for key_id in self.keys]
+        return Key.get_by_ids(self.keys)[0]
 
-    def get_likes(self) -> list[User]:
-        return [User.get_by_id(user_id) for user_id in self.likes]
+    def get_likes(self, limit: int = 30, cursor: str | None = None) -> tuple[list[User], str | None]:
+        likes, next_cursor = Like.page(self._id, limit, cursor)
+        return User.get_by_ids([like.id_user for like in likes])[0], next_cursor
 
-    def get_comments(self) -> list['Comment']:
-        return [Comment.get_by_id(comment_id) for comment_id in self.comments]
+    def like(self, id_user: ObjectId) -> bool:
+        return Like.like("comments", self._id, id_user)
 
-    def get_medias(self) -> list[Image]:
-        return [Image(Config.MEDIA_PATH / image) for image in self.medias]
+    def unlike(self, id_user: ObjectId) -> bool:
+        return Like.unlike("comments", self._id, id_user)
+
+    def reply(self, id_author: ObjectId, content: str, **kwargs) -> 'Comment':
+        return Comment.create(self.id_post, id_author, content, parent=self, **kwargs)
+
+    def get_replies(self, limit: int = 30, cursor: str | None = None) -> tuple[list['Comment'], str | None]:
+        return Comment.siblings(self.id_post, self._id, limit, cursor)
+
+    def get_medias(self) -> list[Media]:
+        return [Media.from_value(media) for media in self.medias]
+
+    def add_media(self, media: Media | str | Path) -> Media:
+        """Attach a media, or a file stored under `Config.MEDIA_PATH` measured once (the change is sent by `save()`)."""
+        media = media if isinstance(media, Media) else Media.from_file(media)
+        self.medias = self.medias + [media.to_document()]
+        return media
 
     @staticmethod
     def get_by_id(comment_id: str | ObjectId) -> 'Comment':
-        data = db.posts.find_one({"_id": comment_id})
-        if data and not data.get("title"):
-            return Comment(**data)
+        comment_id = to_objectid(comment_id)
+        cached = identity_map.get("comments", comment_id)
+        if cached is not None:
+            return cached
+        data = db.comments.find_one({"_id": comment_id})
+        if data:
+            return identity_map.put("comments", comment_id, Comment(**data))
         return None
 
+    @staticmethod
+    def exists(comment_id: str | ObjectId) -> bool:
+        return db.comments.count_documents({"_id": to_objectid(comment_id)}, limit=1) == 1
+
+    @staticmethod
+    def get_by_ids(comment_ids: list[str | ObjectId]) -> tuple[list['Comment'], list[ObjectId]]:
+        return identity_map.load_many("comments", comment_ids, lambda ids: find_by_ids(db.comments, ids), lambda data: Comment(**data))
+
+    @staticmethod
+    def create(id_post: ObjectId, id_author: ObjectId, content: str, parent: 'Comment | None' = None, **kwargs) -> 'Comment':
+        """Create a comment of the post `id_post`, as a reply to `parent` if given."""
+        path = parent.path + [parent._id] if parent else []
+        comment = Comment(id_author=id_author, content=content, id_post=id_post,
+                          id_parent=parent._id if parent else None, path=path, depth=len(path), **kwargs)
+        comment.save()
+        if parent:
+            counters.incr("comments", parent._id, "reply_count", 1)
+        return comment
+
+    @staticmethod
+    def siblings(id_post: ObjectId, id_parent: ObjectId | None = None, limit: int = 30,
+                 cursor: str | None = None) -> tuple[list['Comment'], str | None]:
+        """Page through the comments of one level, oldest first (`id_parent` None for the top level)."""
+        docs, next_cursor = paginate(db.comments, {"id_post": to_objectid(id_post), "id_parent": id_parent}, CHRONO_SORT, limit, cursor)
+        return [Comment(**data) for data in docs], next_cursor
+
+    @staticmethod
+    def tree(id_post: ObjectId, root: ObjectId | None = None, max_depth: int | None = None) -> list[CommentNode]:
+        """Load the comments of a post, or the replies below `root`, in one query.
+
+        Args:
+            id_post: The post at the root of the tree.
+            root: A comment whose sub-tree is loaded instead of the whole tree.
+            max_depth: Deepest level loaded (0 for top-level comments only), None for no limit.
+        """
+        query = {"path": to_objectid(root)} if root else {"id_post": to_objectid(id_post)}
+        if max_depth is not None:
+            query["depth"] = {"$lte": max_depth}
+        return _assemble([Comment(**data) for data in db.comments.find(query).sort(CHRONO_SORT)])
+
+    @staticmethod
+    def page_with_replies(id_post: ObjectId, limit: int = 30, cursor: str | None = None, depth: int = 2,
+                          replies: int = 3) -> tuple[list[CommentNode], str | None]:
+        """Load one page of top-level comments with, for each comment, its first `replies` replies down to `depth`.
+
+        Two queries whatever the size of the tree: one for the page, one aggregation for the replies,
+        cut per parent on the server by `$topN` (MongoDB 5.2+), which only ever keeps `replies` comments
+        per parent in memory. `reply_count` tells the client when there are more to page through.
+        """
+        top, next_cursor = Comment.siblings(id_post, None, limit, cursor)
+        if not top or depth < 1 or replies < 1:
+            return [CommentNode(comment, []) for comment in top], next_cursor
+        groups = db.comments.aggregate([
+            {"$match": {"path": {"$in": [comment._id for comment in top]}, "depth": {"$lte": depth}}},
+            {"$group": {"_id": "$id_parent", "replies": {"$topN": {"n": replies, "sortBy": {"date": 1, "_id": 1}, "output": "$$ROOT"}}}},
+        ])
+        loaded = [Comment(**data) for group in groups for data in group["replies"]]
+        return _assemble(top + sorted(loaded, key=lambda comment: (comment.date, comment._id))), next_cursor
+
+    @staticmethod
+    def page(limit: int = 30, cursor: str | None = None, **kwargs) -> tuple[list['Comment'], str | None]:
+        docs, next_cursor = paginate(db.comments, kwargs, RECENT_SORT, limit, cursor)
+        return [Comment(**data) for data in docs], next_cursor
+
     @staticmethod
     def all(limit: int = 30, **kwargs) -> Generator['User']:
-        return (Comment(**post) for post in db.posts.find({**kwargs, "title": {"$exists": False}}).limit(limit))
+        return (Comment(**post) for post in db.comments.find(kwargs).limit(limit))
+
+
+def _assemble(comments: list[Comment]) -> list[CommentNode]:
+    # Les commentaires arrivent triés : un parent est toujours vu avant ses réponses.
+    # Les réponses dont le parent n'a pas été chargé (coupé par une limite) sont ignorées.
+    top_depth = min((comment.depth for comment in comments), default=0)
+    nodes, roots = {}, []
+    for comment in comments:
+        parent = nodes.get(comment.id_parent)
+        if parent is None and comment.depth != top_depth:
+            continue
+        node = nodes[comment._id] = CommentNode(comment, [])
+        (parent.replies if parent else roots).append(node)
+    return roots
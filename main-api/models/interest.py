@@ -1,31 +1,42 @@
 from dataclasses import dataclass, field
 from bson import ObjectId
-from ..utils.database import get_database
+from ..utils.database import get_database, find_by_ids
+from ..utils.pagination import paginate, ID_SORT
+from pymongo import IndexModel, ASCENDING
+from .base import Document, QueryShape
+from ..utils.helpers import to_objectid
+from ..utils import identity_map
 from typing import Generator
 
 db = get_database()
 
-@dataclass
-class Interest:
+@dataclass(kw_only=True)
+class Interest(Document):
+    COLLECTION = "interests"
+    INDEXES = [IndexModel([("name", ASCENDING)], unique=True, name="name_unique")]
+    QUERIES = [QueryShape("get_by_id", {"_id": ObjectId()}), QueryShape("get_by_name", {"name": ""})]
+
     _id: ObjectId = field(default_factory=lambda: None)
     name: str
 
     def save(self) -> None:
-        if self._id is None:
-            result = db.users.insert_one(self.__dict__)
-            self._id = result.inserted_id
-        else:
-            db.users.update_one({"_id": self._id}, {"$set": self.__dict__})
+        self._persist(db.interests)
+        identity_map.invalidate("interests", self._id)
 
     def delete(self) -> None:
         if self._id:
             db.interests.delete_one({"_id": self._id})
+            identity_map.invalidate("interests", self._id)
 
     @staticmethod
     def get_by_id(interest_id: str | ObjectId) -> 'Interest | None':
+        interest_id = to_objectid(interest_id)
+        cached = identity_map.get("interests", interest_id)
+        if cached is not None:
+            return cached
         data = db.interests.find_one({"_id": interest_id})
         if data:
-            return Interest(**data)
+            return identity_map.put("interests", interest_id, Interest(**data))
         return None
 
     @staticmethod
@@ -35,6 +46,15 @@ class Interest:
             return Interest(**data)
         return None
 
+    @staticmethod
+    def get_by_ids(interest_ids: list[str | ObjectId]) -> tuple[list['Interest'], list[ObjectId]]:
+        return identity_map.load_many("interests", interest_ids, lambda ids: find_by_ids(db.interests, ids), lambda data: Interest(**data))
+
+    @staticmethod
+    def page(limit: int = 30, cursor: str | None = None, **kwargs) -> tuple[list['Interest'], str | None]:
+        docs, next_cursor = paginate(db.interests, kwargs, ID_SORT, limit, cursor)
+        return [Interest(**data) for data in docs], next_cursor
+
     @staticmethod
     def all(limit: int = 30, **kwargs) -> Generator['Interest']:
         return (Interest(**key) for key in db.interests.find(kwargs).limit(limit))
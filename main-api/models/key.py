@@ -1,31 +1,42 @@
 from dataclasses import dataclass, field
 from bson import ObjectId
-from ..utils.database import get_database
+from ..utils.database import get_database, find_by_ids
+from ..utils.pagination import paginate, ID_SORT
+from pymongo import IndexModel, ASCENDING
+from .base import Document, QueryShape
+from ..utils.helpers import to_objectid
+from ..utils import identity_map
 from typing import Generator
 
 db = get_database()
 
-@dataclass
-class Key:
+@dataclass(kw_only=True)
+class Key(Document):
+    COLLECTION = "keys"
+    INDEXES = [IndexModel([("name", ASCENDING)], unique=True, name="name_unique")]
+    QUERIES = [QueryShape("get_by_id", {"_id": ObjectId()}), QueryShape("get_by_name", {"name": ""})]
+
     _id: ObjectId = field(default_factory=lambda: None)
     name: str
 
     def save(self) -> None:
-        if self._id is None:
-            result = db.keys.insert_one(self.__dict__)
-            self._id = result.inserted_id
-        else:
-            db.keys.update_one({"_id": self._id}, {"$set": self.__dict__})
+        self._persist(db.keys)
+        identity_map.invalidate("keys", self._id)
 
     def delete(self) -> None:
         if self._id:
             db.keys.delete_one({"_id": self._id})
+            identity_map.invalidate("keys", self._id)
 
     @staticmethod
     def get_by_id(key_id: str | ObjectId) -> 'Key | None':
+        key_id = to_objectid(key_id)
+        cached = identity_map.get("keys", key_id)
+        if cached is not None:
+            return cached
         data = db.keys.find_one({"_id": key_id})
         if data:
-            return Key(**data)
+            return identity_map.put("keys", key_id, Key(**data))
         return None
 
     @staticmethod
@@ -35,6 +46,15 @@ class Key:
             return Key(**data)
         return None
 
+    @staticmethod
+    def get_by_ids(key_ids: list[str | ObjectId]) -> tuple[list['Key'], list[ObjectId]]:
+        return identity_map.load_many("keys", key_ids, lambda ids: find_by_ids(db.keys, ids), lambda data: Key(**data))
+
+    @staticmethod
+    def page(limit: int = 30, cursor: str | None = None, **kwargs) -> tuple[list['Key'], str | None]:
+        docs, next_cursor = paginate(db.keys, kwargs, ID_SORT, limit, cursor)
+        return [Key(**data) for data in docs], next_cursor
+
     @staticmethod
     def all(limit: int = 30, **kwargs) -> Generator['Key']:
         return (Key(**key) for key in db.keys.find(kwargs).limit(limit))
@@ -0,0 +1,86 @@
+from dataclasses import dataclass, field
+from bson import ObjectId
+from datetime import datetime
+from ..utils.database import get_database
+from ..utils.pagination import paginate, RECENT_SORT
+from ..utils.counters import counters
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+from .base import Document, QueryShape
+from ..utils.helpers import to_objectid
+
+db = get_database()
+
+@dataclass(kw_only=True)
+class Like(Document):
+    """
+    A like given by a user to a post or a comment, stored once per (target, user) pair.
+
+    The count of likes is denormalized in the `like_count` field of the target, updated through the
+    buffered counters (`utils.counters`), so it may lag by a few seconds.
+
+    Attributes:
+        _id (ObjectId): Identifier of the like.
+        target (str): Collection of the liked document (`"posts"` or `"comments"`).
+        id_target (ObjectId): Identifier of the liked document.
+        id_user (ObjectId): User who liked it.
+        date (datetime): When the like was given.
+
+    Methods:
+        like(target, id_target, id_user) -> bool: Adds a like, False if it already existed.
+        unlike(target, id_target, id_user) -> bool: Removes a like, False if there was none.
+        liked_by(id_user, ids) -> set[ObjectId]: Tells which of the given documents a user liked, in one query.
+        page(id_target, limit=30, cursor=None) -> tuple[list[Like], str | None]: Lists the likes of a document.
+    """
+    COLLECTION = "likes"
+    INDEXES = [
+        IndexModel([("id_target", ASCENDING), ("id_user", ASCENDING)], unique=True, name="target_user_unique"),
+        IndexModel([("id_target", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="target_recent"),
+    ]
+    QUERIES = [
+        QueryShape("liked_by", {"id_user": ObjectId(), "id_target": {"$in": [ObjectId()]}}),
+        QueryShape("page", {"id_target": ObjectId()}, RECENT_SORT),
+    ]
+
+    _id: ObjectId = field(default_factory=lambda: None)
+    target: str
+    id_target: ObjectId
+    id_user: ObjectId
+    date: datetime = field(default_factory=lambda: datetime.now())
+
+    @staticmethod
+    def like(target: str, id_target: str | ObjectId, id_user: str | ObjectId) -> bool:
+        """Like a document; liking twice is a no-op thanks to the unique index."""
+        like = Like(target=target, id_target=to_objectid(id_target), id_user=to_objectid(id_user))
+        try:
+            db.likes.insert_one(like.to_document())
+        except DuplicateKeyError:
+            return False
+        counters.incr(target, like.id_target, "like_count", 1)
+        return True
+
+    @staticmethod
+    def unlike(target: str, id_target: str | ObjectId, id_user: str | ObjectId) -> bool:
+        id_target = to_objectid(id_target)
+        result = db.likes.delete_one({"id_target": id_target, "id_user": to_objectid(id_user)})
+        if result.deleted_count:
+            counters.incr(target, id_target, "like_count", -1)
+            return True
+        return False
+
+    @staticmethod
+    def liked_by(id_user: str | ObjectId, ids: list[ObjectId]) -> set[ObjectId]:
+        if not ids:
+            return set()
+        cursor = db.likes.find({"id_user": to_objectid(id_user), "id_target": {"$in": list(set(ids))}}, {"id_target": 1, "_id": 0})
+        return {doc["id_target"] for doc in cursor}
+
+    @staticmethod
+    def page(id_target: str | ObjectId, limit: int = 30, cursor: str | None = None) -> tuple[list['Like'], str | None]:
+        docs, next_cursor = paginate(db.likes, {"id_target": to_objectid(id_target)}, RECENT_SORT, limit, cursor)
+        return [Like(**data) for data in docs], next_cursor
+
+    @staticmethod
+    def delete_all(*ids_target: ObjectId) -> None:
+        """Delete the likes of the given documents, when they are deleted."""
+        db.likes.delete_many({"id_target": {"$in": list(ids_target)}})
@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Iterator
+import hashlib
+import mimetypes
+import mmap
+import os
+from PIL import Image
+from ..utils.config import Config
+
+
+@dataclass(frozen=True)
+class Media:
+    """
+    Handle on a file attached to a post or a comment.
+
+    The metadata is measured once, when the file is attached, and stored in the parent document,
+    so listing medias opens no file. Bytes and pixels are only read on demand, through a read-only
+    memory map of the file.
+
+    Attributes:
+        path (str): Path of the file, relative to `Config.MEDIA_PATH`.
+        mime (str | None): MIME type of the file.
+        size (int | None): Size of the file in bytes.
+        width (int | None): Width in pixels, for images.
+        height (int | None): Height in pixels, for images.
+        sha256 (str | None): SHA-256 hex digest of the file content.
+
+    Methods:
+        from_value(value: dict | str | Path) -> Media: Builds a handle from a stored value (legacy paths included).
+        from_file(path: str | Path) -> Media: Measures a file stored under `Config.MEDIA_PATH`.
+        to_document() -> dict: Returns the value to store in the parent document.
+        mapped() -> Iterator[mmap.mmap]: Maps the file content in memory, read-only.
+        open() -> Image.Image: Decodes the image from the mapped file.
+    """
+    path: str
+    mime: str | None = None
+    size: int | None = None
+    width: int | None = None
+    height: int | None = None
+    sha256: str | None = None
+
+    @classmethod
+    def from_value(cls, value: dict | str | Path) -> 'Media':
+        # Les anciens documents ne stockent que le chemin
+        return cls(**value) if isinstance(value, dict) else cls(path=str(value))
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> 'Media':
+        """Measure a file: size, content hash, and for images the format and dimensions read from the header."""
+        media = cls(path=str(path))
+        width = height = None
+        mime = mimetypes.guess_type(media.path)[0]
+        with media.mapped() as data:
+            sha256 = hashlib.sha256(data).hexdigest()
+            size = len(data)
+            try:
+                # Image.open ne lit que l'en-tête, les pixels ne sont pas décodés
+                with Image.open(data) as image:
+                    width, height = image.size
+                    mime = Image.MIME.get(image.format, mime)
+            except (Image.UnidentifiedImageError, OSError, ValueError):  # fichier tronqué ou inconnu
+                pass
+        return cls(path=media.path, mime=mime, size=size, width=width, height=height, sha256=sha256)
+
+    @property
+    def full_path(self) -> Path:
+        return Path(Config.MEDIA_PATH) / self.path
+
+    def is_image(self) -> bool:
+        return bool(self.mime and self.mime.startswith("image/"))
+
+    def to_document(self) -> dict:
+        return asdict(self)
+
+    @contextmanager
+    def mapped(self) -> Iterator[mmap.mmap | bytes]:
+        """Map the file content in memory, read-only; pages are only loaded when accessed."""
+        with open(self.full_path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                yield b""  # un fichier vide ne peut pas être mappé
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+
+    def open(self) -> Image.Image:
+        """Decode the image. The pixels are copied out of the map, which is closed on return."""
+        with self.mapped() as data:
+            with Image.open(data) as image:
+                image.load()
+                return image.copy()
@@ -0,0 +1,155 @@
+from dataclasses import dataclass, field
+from bson import ObjectId
+from datetime import datetime
+from typing import Generator
+from ..utils.database import get_database
+from ..utils.pagination import paginate, ID_SORT
+from ..utils.cache import TTLCache
+from ..utils.helpers import to_objectid
+from ..utils.config import Config
+from pymongo import IndexModel, ASCENDING
+from pymongo.errors import DuplicateKeyError
+from .base import Document, QueryShape
+from .suggestion import Suggestion
+
+db = get_database()
+
+MEMBER = "member"
+MODERATOR = "moderator"
+
+# Rôle de chaque (fil, utilisateur) vérifié récemment ; None est aussi mis en cache (pas membre)
+_roles = TTLCache(ttl=Config.THREAD_ACCESS_CACHE_TTL, max_size=Config.THREAD_ACCESS_CACHE_SIZE).reset_at_fork()
+
+@dataclass(kw_only=True)
+class Membership(Document):
+    """
+    Membership of a user in a thread, one document per (thread, user) pair.
+
+    A moderator is a member with the `"moderator"` role. Access checks are a single lookup on the
+    unique index, cached for `Config.THREAD_ACCESS_CACHE_TTL` seconds in the process, and member
+    lists are paged instead of being embedded in the thread document.
+
+    Attributes:
+        _id (ObjectId): Identifier of the membership.
+        id_thread (ObjectId): The thread.
+        id_user (ObjectId): The member.
+        role (str): `"member"` or `"moderator"`.
+        date (datetime): When the user joined.
+
+    Methods:
+        role_of(id_thread, id_user) -> str | None: Returns the role of a user in a thread, None if not a member.
+        roles_of(id_user, thread_ids) -> dict[ObjectId, str]: Returns the roles of a user in several threads, in one query.
+        add(id_thread, id_user, role) -> bool: Adds a member, or promotes a member to moderator.
+        remove(id_thread, id_user) -> bool: Removes a member, whatever their role.
+        demote(id_thread, id_user) -> bool: Turns a moderator back into a member.
+        page(id_thread, role=None, limit=30, cursor=None) -> tuple[list[Membership], str | None]: Lists the members.
+        user_ids(id_thread) -> Generator[ObjectId]: Iterates over the member IDs, in batches.
+        thread_ids(id_user) -> list[ObjectId]: Returns the threads a user joined.
+    """
+    COLLECTION = "memberships"
+    INDEXES = [
+        IndexModel([("id_thread", ASCENDING), ("id_user", ASCENDING)], unique=True, name="thread_user_unique"),
+        IndexModel([("id_user", ASCENDING), ("id_thread", ASCENDING)], name="user_threads"),
+        IndexModel([("id_thread", ASCENDING), ("role", ASCENDING), ("_id", ASCENDING)], name="thread_role"),
+    ]
+    QUERIES = [
+        QueryShape("role_of", {"id_thread": ObjectId(), "id_user": ObjectId()}),
+        QueryShape("roles_of", {"id_user": ObjectId(), "id_thread": {"$in": [ObjectId()]}}),
+        QueryShape("page", {"id_thread": ObjectId()}, ID_SORT),
+        QueryShape("page(role)", {"id_thread": ObjectId(), "role": MODERATOR}, ID_SORT),
+        QueryShape("thread_ids", {"id_user": ObjectId()}),
+    ]
+
+    _id: ObjectId = field(default_factory=lambda: None)
+    id_thread: ObjectId
+    id_user: ObjectId
+    role: str = MEMBER
+    date: datetime = field(default_factory=lambda: datetime.now())
+
+    @staticmethod
+    def role_of(id_thread: str | ObjectId, id_user: str | ObjectId | None) -> str | None:
+        if id_user is None:
+            return None
+        # Les identifiants du JWT sont des chaînes : tout est ramené en ObjectId avant comparaison
+        key = (to_objectid(id_thread), to_objectid(id_user))
+        role = _roles.get(key)
+        if TTLCache.is_missing(role):
+            doc = db.memberships.find_one({"id_thread": key[0], "id_user": key[1]}, {"role": 1, "_id": 0})
+            role = _roles.set(key, doc["role"] if doc else None)
+        return role
+
+    @staticmethod
+    def roles_of(id_user: str | ObjectId, thread_ids: list[ObjectId]) -> dict[ObjectId, str]:
+        if id_user is None or not thread_ids:
+            return {}
+        id_user = to_objectid(id_user)
+        cursor = db.memberships.find({"id_user": id_user, "id_thread": {"$in": list(set(thread_ids))}}, {"id_thread": 1, "role": 1, "_id": 0})
+        roles = {doc["id_thread"]: doc["role"] for doc in cursor}
+        for id_thread in thread_ids:
+            _roles.set((id_thread, id_user), roles.get(id_thread))
+        return roles
+
+    @staticmethod
+    def add(id_thread: ObjectId, id_user: ObjectId, role: str = MEMBER) -> bool:
+        """Add `id_user` to the thread with `role`.
+
+        Returns:
+            bool: False if the user already had this role (or was a moderator and `role` is member).
+        """
+        id_thread, id_user = to_objectid(id_thread), to_objectid(id_user)
+        _roles.invalidate((id_thread, id_user))
+        if role == MODERATOR:
+            result = db.memberships.update_one({"id_thread": id_thread, "id_user": id_user, "role": MEMBER}, {"$set": {"role": MODERATOR}})
+            if result.modified_count:
+                return True
+        try:
+            db.memberships.insert_one(Membership(id_thread=id_thread, id_user=id_user, role=role).to_document())
+        except DuplicateKeyError:
+            return False
+        db.threads.update_one({"_id": id_thread}, {"$inc": {"member_count": 1}})
+        Suggestion.mark_stale(id_user)
+        return True
+
+    @staticmethod
+    def remove(id_thread: ObjectId, id_user: ObjectId) -> bool:
+        id_thread, id_user = to_objectid(id_thread), to_objectid(id_user)
+        _roles.invalidate((id_thread, id_user))
+        if db.memberships.delete_one({"id_thread": id_thread, "id_user": id_user}).deleted_count:
+            db.threads.update_one({"_id": id_thread}, {"$inc": {"member_count": -1}})
+            Suggestion.mark_stale(id_user)
+            return True
+        return False
+
+    @staticmethod
+    def demote(id_thread: ObjectId, id_user: ObjectId) -> bool:
+        id_thread, id_user = to_objectid(id_thread), to_objectid(id_user)
+        _roles.invalidate((id_thread, id_user))
+        result = db.memberships.update_one({"id_thread": id_thread, "id_user": id_user, "role": MODERATOR}, {"$set": {"role": MEMBER}})
+        return result.modified_count == 1
+
+    @staticmethod
+    def page(id_thread: ObjectId, role: str | None = None, limit: int = 30,
+             cursor: str | None = None) -> tuple[list['Membership'], str | None]:
+        query = {"id_thread": to_objectid(id_thread)}
+        if role:
+            query["role"] = role
+        docs, next_cursor = paginate(db.memberships, query, ID_SORT, limit, cursor)
+        return [Membership(**data) for data in docs], next_cursor
+
+    @staticmethod
+    def user_ids(id_thread: ObjectId) -> Generator[ObjectId]:
+        cursor = db.memberships.find({"id_thread": to_objectid(id_thread)}, {"id_user": 1, "_id": 0}).batch_size(Config.STREAM_BATCH_SIZE)
+        return (doc["id_user"] for doc in cursor)
+
+    @staticmethod
+    def thread_ids(id_user: ObjectId) -> list[ObjectId]:
+        return [doc["id_thread"] for doc in db.memberships.find({"id_user": to_objectid(id_user)}, {"id_thread": 1, "_id": 0})]
+
+    @staticmethod
+    def delete_all(id_thread: ObjectId) -> None:
+        db.memberships.delete_many({"id_thread": id_thread})
+        _roles.clear()
+
+    @staticmethod
+    def cache_stats() -> dict:
+        return _roles.stats()
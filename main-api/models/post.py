@@ -4,57 +4,140 @@ from bson import ObjectId
 from datetime import datetime
 from pathlib import Path
 from .key import Key
-from PIL.Image import Image
+from .trending import KeyBucket
+from .media import Media
 from .user import User
-from .comment import Comment
-from ..utils.database import get_database
+from .like import Like
+from .comment import Comment, CommentNode
+from ..utils.database import get_database, find_by_ids
+from ..utils.pagination import paginate, RECENT_SORT
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from .base import Document, QueryShape
+from ..utils.helpers import to_objectid
+from ..utils import identity_map
+from ..utils.search import search, text_index
 from ..utils.config import Config
 
 db = get_database()
 
-@dataclass
-class Post:
+@dataclass(kw_only=True)
+class Post(Document):
+    COLLECTION = "posts"
+    INDEXES = [
+        IndexModel([("id_thread", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="thread_recent"),
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)], name="posts_recent"),
+        IndexModel([("id_author", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="author_recent"),
+        text_index("posts"),
+    ]
+    QUERIES = [
+        QueryShape("get_by_id", {"_id": ObjectId()}),
+        QueryShape("page", {}, RECENT_SORT),
+        QueryShape("page(id_thread)", {"id_thread": ObjectId()}, RECENT_SORT),
+        QueryShape("feed(id_author)", {"id_author": ObjectId()}, RECENT_SORT),
+    ]
+
     _id: ObjectId = field(default_factory=lambda: None)
     id_thread: ObjectId
     id_author: ObjectId
     date: datetime = field(default_factory=lambda: datetime.now())
     title: str
     content: str
-    medias: list[Path] = field(default_factory=list)
+    medias: list[dict] = field(default_factory=list)  # métadonnées des fichiers, voir Media
     keys: list[ObjectId] = field(default_factory=list)
-    likes: list[ObjectId] = field(default_factory=list)
-    comments: list[ObjectId] = field(default_factory=list)
+    like_count: int = 0  # dénormalisé, les likes sont dans la collection `likes`
 
     def save(self) -> None:
-        if self._id is None:
-            result = db.posts.insert_one(self.__dict__)
-            self._id = result.inserted_id
-        else:
-            db.posts.update_one({"_id": self._id}, {"$set": self.__dict__})
+        is_new = self._id is None
+        added_keys = self.added_items("keys")
+        self._persist(db.posts)
+        identity_map.invalidate("posts", self._id)
+        search.update("posts", self)
+        KeyBucket.record(added_keys)
+        if is_new:
+            self._update_thread_stats(added=True)
+            from .timeline import Timeline  # import tardif : timeline dépend de Post
+            Timeline.fan_out_later(self)
 
     def delete(self) -> None:
         if self._id:
             db.posts.delete_one({"_id": self._id})
+            self._update_thread_stats(added=False)
+            comment_ids = [doc["_id"] for doc in db.comments.find({"id_post": self._id}, {"_id": 1})]
+            db.comments.delete_many({"id_post": self._id})
+            Like.delete_all(self._id, *comment_ids)
+            identity_map.invalidate("posts", self._id)
+            search.remove("posts", self._id)
+            for comment_id in comment_ids:
+                search.remove("comments", comment_id)
+
+    def _update_thread_stats(self, added: bool) -> None:
+        # Compteurs dénormalisés du fil : aucune page de fil n'a à compter ou parcourir ses posts
+        if added:
+            update = {"$inc": {"post_count": 1}, "$max": {"last_post_at": self.date}}
+        else:
+            latest = db.posts.find_one({"id_thread": self.id_thread}, {"date": 1}, sort=RECENT_SORT)
+            update = {"$inc": {"post_count": -1}, "$set": {"last_post_at": latest["date"] if latest else None}}
+        db.threads.update_one({"_id": self.id_thread}, update)
+        identity_map.invalidate("threads", self.id_thread)
 
     def get_keys(self) -> list[Key]:
-        return [Key.get_by_id(key_id) for key_id in self.keys]
+        return Key.get_by_ids(self.keys)[0]
+
+    def get_likes(self, limit: int = 30, cursor: str | None = None) -> tuple[list[User], str | None]:
+        likes, next_cursor = Like.page(self._id, limit, cursor)
+        return User.get_by_ids([like.id_user for like in likes])[0], next_cursor
+
+    def like(self, id_user: ObjectId) -> bool:
+        return Like.like("posts", self._id, id_user)
+
+    def unlike(self, id_user: ObjectId) -> bool:
+        return Like.unlike("posts", self._id, id_user)
+
+    def get_comments(self, limit: int = 30, cursor: str | None = None) -> tuple[list[Comment], str | None]:
+        return Comment.siblings(self._id, None, limit, cursor)
 
-    def get_likes(self) -> list[User]:
-        return [User.get_by_id(user_id) for user_id in self.likes]
+    def get_comment_tree(self, limit: int = 30, cursor: str | None = None, depth: int = 2,
+                         replies: int = 3) -> tuple[list[CommentNode], str | None]:
+        return Comment.page_with_replies(self._id, limit, cursor, depth, replies)
 
-    def get_comments(self) -> list[Comment]:
-        return [Comment.get_by_id(comment_id) for comment_id in self.comments]
+    def get_medias(self) -> list[Media]:
+        return [Media.from_value(media) for media in self.medias]
 
-    def get_medias(self) -> list[Image]:
-        return [Image(Config.MEDIA_PATH / image) for image in self.medias]
+    def add_media(self, media: Media | str | Path) -> Media:
+        """Attach a media, or a file stored under `Config.MEDIA_PATH` measured once (the change is sent by `save()`)."""
+        media = media if isinstance(media, Media) else Media.from_file(media)
+        self.medias = self.medias + [media.to_document()]
+        return media
 
     @staticmethod
     def get_by_id(user_id: str | ObjectId) -> 'Post | None':
+        user_id = to_objectid(user_id)
+        cached = identity_map.get("posts", user_id)
+        if cached is not None:
+            return cached
         data = db.posts.find_one({"_id": user_id})
         if data:
-            return Post(**data)
+            return identity_map.put("posts", user_id, Post(**data))
         return None
 
+    @staticmethod
+    def exists(post_id: str | ObjectId) -> bool:
+        return db.posts.count_documents({"_id": to_objectid(post_id)}, limit=1) == 1
+
+    @staticmethod
+    def get_by_ids(post_ids: list[str | ObjectId]) -> tuple[list['Post'], list[ObjectId]]:
+        return identity_map.load_many("posts", post_ids, lambda ids: find_by_ids(db.posts, ids), lambda data: Post(**data))
+
+    @staticmethod
+    def page(limit: int = 30, cursor: str | None = None, **kwargs) -> tuple[list['Post'], str | None]:
+        docs, next_cursor = paginate(db.posts, kwargs, RECENT_SORT, limit, cursor)
+        return [Post(**data) for data in docs], next_cursor
+
+    @staticmethod
+    def stream(**kwargs) -> Generator['Post']:
+        cursor = db.posts.find(kwargs).sort(RECENT_SORT).batch_size(Config.STREAM_BATCH_SIZE)
+        return (Post(**post) for post in cursor)
+
     @staticmethod
     def all(limit: int = 30, **kwargs) -> Generator['User']:
-        return (Post(**post) for post in db.posts.find({**kwargs, "title": {"$exists": True}}).limit(limit))
+        return (Post(**post) for post in db.posts.find(kwargs).limit(limit))
@@ -1,27 +1,34 @@
 from dataclasses import dataclass, field
 from bson import ObjectId
-from ..utils.database import get_database
+from ..utils.database import get_database, find_by_ids
+from ..utils.pagination import paginate, ID_SORT
+from pymongo import IndexModel, ASCENDING
+from .base import Document, QueryShape
+from ..utils.helpers import to_objectid
+from ..utils import identity_map
 from typing import Generator
 
 db = get_database()
 
-@dataclass
-class Role:
+@dataclass(kw_only=True)
+class Role(Document):
+    COLLECTION = "roles"
+    INDEXES = [IndexModel([("name", ASCENDING)], unique=True, name="name_unique")]
+    QUERIES = [QueryShape("get_by_id", {"_id": ObjectId()}), QueryShape("get_by_name", {"name": ""})]
+
     _id: ObjectId = field(default_factory=lambda: None)
     name: str
     rights: list[str] = field(default_factory=list)
     extend: list[ObjectId] = field(default_factory=list)
 
     def save(self) -> None:
-        if self._id is None:
-            result = db.role.insert_one(self.__dict__)
-            self._id = result.inserted_id
-        else:
-            db.roles.update_one({"_id": self._id}, {"$set": self.__dict__})
+        self._persist(db.roles)
+        identity_map.invalidate("roles", self._id)
 
     def delete(self) -> None:
         if self._id:
             db.roles.delete_one({"_id": self._id})
+            identity_map.invalidate("roles", self._id)
 
     def update(self, **kwargs) -> None:
         editable = set(self.__dict__.keys()) - {"_id", "name", "extend"}
@@ -32,9 +39,13 @@ class Role:
 
     @staticmethod
     def get_by_id(role_id: str | ObjectId) -> 'Role | None':
+        role_id = to_objectid(role_id)
+        cached = identity_map.get("roles", role_id)
+        if cached is not None:
+            return cached
         data = db.roles.find_one({"_id": role_id})
         if data:
-            return Role(**data)
+            return identity_map.put("roles", role_id, Role(**data))
         return None
 
     @staticmethod
@@ -44,6 +55,15 @@ class Role:
             return Role(**data)
         return None
 
+    @staticmethod
+    def get_by_ids(role_ids: list[str | ObjectId]) -> tuple[list['Role'], list[ObjectId]]:
+        return identity_map.load_many("roles", role_ids, lambda ids: find_by_ids(db.roles, ids), lambda data: Role(**data))
+
+    @staticmethod
+    def page(limit: int = 30, cursor: str | None = None, **kwargs) -> tuple[list['Role'], str | None]:
+        docs, next_cursor = paginate(db.roles, kwargs, ID_SORT, limit, cursor)
+        return [Role(**data) for data in docs], next_cursor
+
     @staticmethod
     def all(limit: int = 30, **kwargs) -> Generator['Role']:
         return (Role(**key) for key in db.roles.find(kwargs).limit(limit))
@@ -0,0 +1,198 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING, UpdateOne
+from .base import Document, QueryShape
+from ..utils.database import get_database
+from ..utils.helpers import to_objectid
+from ..utils.config import Config
+
+db = get_database()
+
+@dataclass(kw_only=True)
+class Suggestion(Document):
+    """
+    Users and threads suggested to a user, precomputed by `Suggestion.compute` and read in one lookup.
+
+    Two users are close when they share interests (cosine similarity of their interest vectors) and
+    follow the same people (Jaccard index of their followed sets), weighted by
+    `Config.SUGGESTIONS_INTEREST_WEIGHT` and `Config.SUGGESTIONS_FOLLOW_WEIGHT`. Suggested users are
+    the closest ones not followed yet; suggested threads are the public threads joined by close users,
+    each member adding their similarity to the thread score.
+
+    Changing one's interests, follows, blocks or memberships sets `stale_at`; the job recomputes only
+    those users unless run with `full=True`. The scores of the other users are not refreshed by the
+    change, the periodic full run takes care of that.
+
+    Attributes:
+        _id (ObjectId): Identifier of the user the suggestions are for.
+        users (list[dict]): `{_id, score}` of the suggested users, best first.
+        threads (list[dict]): `{_id, score}` of the suggested threads, best first.
+        computed_at (datetime | None): When the suggestions were computed.
+        stale_at (datetime | None): When the inputs of the user last changed, None if up to date.
+
+    Methods:
+        get(user_id) -> Suggestion | None: Returns the stored suggestions of a user.
+        mark_stale(user_id) -> None: Flags a user for the next incremental run.
+        compute(full=False, chunk_size=None, progress=None) -> int: Recomputes the suggestions, returns the number of users processed.
+    """
+    COLLECTION = "suggestions"
+    INDEXES = [IndexModel([("stale_at", ASCENDING)], partialFilterExpression={"stale_at": {"$type": "date"}}, name="stale")]
+    QUERIES = [
+        QueryShape("get", {"_id": ObjectId()}),
+        QueryShape("stale", {"stale_at": {"$type": "date"}}),
+    ]
+
+    _id: ObjectId
+    users: list[dict] = field(default_factory=list)
+    threads: list[dict] = field(default_factory=list)
+    computed_at: datetime | None = None
+    stale_at: datetime | None = None
+
+    @staticmethod
+    def get(user_id: str | ObjectId) -> 'Suggestion | None':
+        data = db.suggestions.find_one({"_id": to_objectid(user_id)})
+        return Suggestion(**data) if data else None
+
+    @staticmethod
+    def stale_update() -> dict:
+        return {"$set": {"stale_at": datetime.now()}}
+
+    @staticmethod
+    def mark_stale(user_id: str | ObjectId) -> None:
+        db.suggestions.update_one({"_id": to_objectid(user_id)}, Suggestion.stale_update(), upsert=True)
+
+    @staticmethod
+    def delete(user_id: ObjectId) -> None:
+        db.suggestions.delete_one({"_id": user_id})
+
+    @staticmethod
+    def compute(full: bool = False, chunk_size: int | None = None,
+                progress: Callable[[int, int], None] | None = None) -> int:
+        """Recompute the suggestions of the stale users, or of every user if `full` is True.
+
+        All users are loaded as sparse matrices (users x interests, users x followed users, users x
+        public threads); the similarities of the users to recompute are then computed `chunk_size`
+        rows at a time, so memory stays bounded by the chunk and not by the square of the user count.
+
+        Args:
+            full: Recompute every user instead of the stale ones.
+            chunk_size: Users per block of the similarity products, `Config.SUGGESTIONS_CHUNK_SIZE` by default.
+            progress: Called after each chunk with the number of users done and the total.
+
+        Returns:
+            int: The number of users whose suggestions were written.
+
+        Raises:
+            RuntimeError: If NumPy or SciPy is not installed.
+        """
+        try:
+            # Dépendances optionnelles, uniquement pour le calcul par lots
+            import numpy as np
+            from scipy import sparse
+        except ImportError as e:
+            raise RuntimeError("Computing suggestions requires numpy and scipy") from e
+
+        started = datetime.now()
+        chunk_size = chunk_size or Config.SUGGESTIONS_CHUNK_SIZE
+        data = _Matrices.load(np, sparse)
+        if full:
+            targets = np.arange(len(data.user_ids))
+        else:
+            stale = [doc["_id"] for doc in db.suggestions.find({"stale_at": {"$type": "date"}}, {"_id": 1})]
+            targets = np.array([data.rows[user_id] for user_id in stale if user_id in data.rows], dtype=np.int64)
+
+        for start in range(0, len(targets), chunk_size):
+            rows = targets[start:start + chunk_size]
+            scores = data.similarities(rows)
+            thread_scores = (scores @ data.memberships).tocsr()
+            requests = []
+            for position, row in enumerate(rows):
+                excluded_users = {row} | set(data.follows[row].indices) | data.blocked[row]
+                excluded_threads = set(data.memberships[row].indices)
+                requests.append(UpdateOne({"_id": data.user_ids[row]}, {"$set": {
+                    "users": _top(np, scores[position], excluded_users, data.user_ids),
+                    "threads": _top(np, thread_scores[position], excluded_threads, data.thread_ids),
+                    "computed_at": started,
+                }}, upsert=True))
+            db.suggestions.bulk_write(requests, ordered=False)
+            # Une modification survenue pendant le calcul garde l'utilisateur à recalculer
+            db.suggestions.update_many({"_id": {"$in": [data.user_ids[row] for row in rows]}, "stale_at": {"$lte": started}},
+                                       {"$set": {"stale_at": None}})
+            if progress:
+                progress(min(start + chunk_size, len(targets)), len(targets))
+        return len(targets)
+
+
+class _Matrices:
+    # Matrices creuses de tous les utilisateurs, une ligne par utilisateur (même ordre que user_ids)
+
+    def __init__(self, np, sparse):
+        self.np = np
+        self.sparse = sparse
+        self.user_ids: list[ObjectId] = []
+        self.rows: dict[ObjectId, int] = {}
+        self.thread_ids: list[ObjectId] = []
+        self.blocked: list[set[int]] = []
+
+    @classmethod
+    def load(cls, np, sparse) -> '_Matrices':
+        data = cls(np, sparse)
+        users = list(db.users.find({}, {"interests": 1, "followed": 1, "blocked": 1}).batch_size(Config.STREAM_BATCH_SIZE))
+        data.user_ids = [user["_id"] for user in users]
+        data.rows = {user_id: row for row, user_id in enumerate(data.user_ids)}
+        n = len(users)
+
+        interest_columns: dict[ObjectId, int] = {}
+        interest_pairs = [(row, interest_columns.setdefault(interest, len(interest_columns)))
+                          for row, user in enumerate(users) for interest in user.get("interests", [])]
+        follow_pairs = [(row, data.rows[followed]) for row, user in enumerate(users)
+                        for followed in user.get("followed", []) if followed in data.rows]
+        data.blocked = [{data.rows[blocked] for blocked in user.get("blocked", []) if blocked in data.rows} for user in users]
+        # Blocage dans les deux sens : ni l'un ni l'autre ne se voit suggérer
+        for row, other in [(row, other) for row, blocked in enumerate(data.blocked) for other in blocked]:
+            data.blocked[other].add(row)
+
+        interests = data._binary(interest_pairs, (n, len(interest_columns)))
+        norms = np.sqrt(np.asarray(interests.sum(axis=1)).ravel())
+        data.interests = (sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ interests).tocsr()
+        data.follows = data._binary(follow_pairs, (n, n))
+        data.follow_counts = np.asarray(data.follows.sum(axis=1)).ravel()
+
+        threads = list(db.threads.find({"public": True}, {"id_owner": 1}))
+        data.thread_ids = [thread["_id"] for thread in threads]
+        columns = {thread_id: column for column, thread_id in enumerate(data.thread_ids)}
+        member_pairs = [(data.rows[thread["id_owner"]], column) for column, thread in enumerate(threads) if thread.get("id_owner") in data.rows]
+        cursor = db.memberships.find({"id_thread": {"$in": data.thread_ids}}, {"id_thread": 1, "id_user": 1, "_id": 0})
+        member_pairs += [(data.rows[doc["id_user"]], columns[doc["id_thread"]])
+                         for doc in cursor.batch_size(Config.STREAM_BATCH_SIZE) if doc["id_user"] in data.rows]
+        data.memberships = data._binary(member_pairs, (n, len(data.thread_ids)))
+        return data
+
+    def _binary(self, pairs: list[tuple[int, int]], shape: tuple[int, int]):
+        np = self.np
+        rows = np.fromiter((row for row, _ in pairs), dtype=np.int64, count=len(pairs))
+        columns = np.fromiter((column for _, column in pairs), dtype=np.int64, count=len(pairs))
+        matrix = self.sparse.csr_matrix((np.ones(len(pairs), dtype=np.float32), (rows, columns)), shape=shape)
+        matrix.data[:] = 1  # doublons additionnés par la construction
+        return matrix
+
+    def similarities(self, rows):
+        """Similarity of the users of `rows` to every user, as a sparse `len(rows) x n` matrix."""
+        np, sparse = self.np, self.sparse
+        cosine = self.interests[rows] @ self.interests.T
+        common = (self.follows[rows] @ self.follows.T).tocoo()
+        union = self.follow_counts[rows][common.row] + self.follow_counts[common.col] - common.data
+        jaccard = sparse.csr_matrix((common.data / np.maximum(union, 1), (common.row, common.col)), shape=common.shape)
+        return (cosine * Config.SUGGESTIONS_INTEREST_WEIGHT + jaccard * Config.SUGGESTIONS_FOLLOW_WEIGHT).tocsr()
+
+
+def _top(np, row, excluded: set[int], ids: list[ObjectId]) -> list[dict]:
+    # Meilleurs scores d'une ligne creuse, sans trier toute la ligne
+    count = Config.SUGGESTIONS_COUNT + len(excluded)
+    best = np.argpartition(-row.data, count)[:count] if len(row.data) > count else np.arange(len(row.data))
+    order = best[np.argsort(-row.data[best])]
+    top = [{"_id": ids[row.indices[i]], "score": float(row.data[i])} for i in order
+           if row.data[i] > 0 and row.indices[i] not in excluded]
+    return top[:Config.SUGGESTIONS_COUNT]
@@ -1,34 +1,60 @@
 from dataclasses import dataclass, field
 from bson import ObjectId
+from datetime import datetime
 from .post import Post
 from .user import User
 from typing import Generator
-from ..utils.database import get_database
+from ..utils.database import get_database, find_by_ids
+from ..utils.pagination import paginate, ID_SORT
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from .base import Document, QueryShape
+from .membership import Membership, MEMBER, MODERATOR
+from ..utils.helpers import to_objectid
+from ..utils import identity_map
+from ..utils.search import search, text_index
 
 db = get_database()
 
-@dataclass
-class Thread:
+ACTIVE_SORT = [("last_post_at", DESCENDING), ("_id", DESCENDING)]
+POPULAR_SORT = [("post_count", DESCENDING), ("_id", DESCENDING)]
+
+@dataclass(kw_only=True)
+class Thread(Document):
+    COLLECTION = "threads"
+    INDEXES = [
+        IndexModel([("public", ASCENDING), ("last_post_at", DESCENDING), ("_id", DESCENDING)], name="public_active"),
+        IndexModel([("public", ASCENDING), ("post_count", DESCENDING), ("_id", DESCENDING)], name="public_popular"),
+        text_index("threads"),
+    ]
+    QUERIES = [
+        QueryShape("get_by_id", {"_id": ObjectId()}),
+        QueryShape("page", {}, ID_SORT),
+        QueryShape("most_active(recent)", {"public": True, "last_post_at": {"$type": "date"}}, ACTIVE_SORT),
+        QueryShape("most_active(posts)", {"public": True, "post_count": {"$gt": 0}}, POPULAR_SORT),
+    ]
+
     _id: ObjectId = field(default_factory=lambda: None)
     name: str
     public: bool
     id_owner: ObjectId
-    moderators: list[ObjectId] = field(default_factory=list)
-    members: list[ObjectId] = field(default_factory=list)
+    member_count: int = 0  # les membres sont dans la collection `memberships`
+    post_count: int = 0  # maintenu par Post.save/delete
+    last_post_at: datetime | None = None
 
     def save(self) -> None:
-        if self._id is None:
-            result = db.threads.insert_one(self.__dict__)
-            self._id = result.inserted_id
-        else:
-            db.threads.update_one({"_id": self._id}, {"$set": self.__dict__})
+        self._persist(db.threads)
+        identity_map.invalidate("threads", self._id)
+        search.update("threads", self)
 
     def delete(self) -> None:
         if self._id:
             db.threads.delete_one({"_id": self._id})
+            Membership.delete_all(self._id)
+            identity_map.invalidate("threads", self._id)
+            search.remove("threads", self._id)
 
     def update(self, **kwargs) -> None:
-        editable = set(self.__dict__.keys()) - {"_id", "id_owner"}
+        editable = set(self.__dict__.keys()) - {"_id", "id_owner", "member_count", "post_count", "last_post_at"}
         for k, v in kwargs.items():
             if k in editable:
                 self.__setattr__(k, v)
@@ -36,42 +62,48 @@ class Thread:
                 raise ValueError(f"Field '{k}' is not editable")
         self.save()
 
-    def get_moderators(self) -> list[User]:
-        return [User.get_by_id(user_id) for user_id in self.moderators]
+    def role_of(self, id_user: str | ObjectId | None) -> str | None:
+        """Return "owner", "moderator", "member" or None for a user (string IDs from the JWT are accepted)."""
+        if id_user is not None and to_objectid(id_user) == self.id_owner:
+            return "owner"
+        return Membership.role_of(self._id, id_user)
+
+    def can_read(self, id_user: str | ObjectId | None) -> bool:
+        return self.public or self.role_of(id_user) is not None
+
+    def can_moderate(self, id_user: str | ObjectId | None) -> bool:
+        return self.role_of(id_user) in ("owner", MODERATOR)
+
+    def get_moderators(self, limit: int = 30, cursor: str | None = None) -> tuple[list[User], str | None]:
+        memberships, next_cursor = Membership.page(self._id, MODERATOR, limit, cursor)
+        return User.get_by_ids([membership.id_user for membership in memberships])[0], next_cursor
 
-    def get_members(self) -> list[User]:
-        return [User.get_by_id(user_id) for user_id in self.members]
+    def get_members(self, limit: int = 30, cursor: str | None = None) -> tuple[list[User], str | None]:
+        memberships, next_cursor = Membership.page(self._id, None, limit, cursor)
+        return User.get_by_ids([membership.id_user for membership in memberships])[0], next_cursor
 
-    def get_posts(self) -> list[Post]:
-        return [Post(**post) for post in db.posts.find({"id_thread": self._id})]
+    def get_posts(self, limit: int = 30, cursor: str | None = None) -> tuple[list[Post], str | None]:
+        return Post.page(limit, cursor, id_thread=self._id)
 
     def add_member(self, id_user: ObjectId) -> bool:
-        if id_user in self.members:
-            return False
-        self.members.append(id_user)
-        self.save()
-        return True
+        return self._edit_membership(Membership.add(self._id, id_user, MEMBER), 1)
 
     def del_member(self, id_user: ObjectId) -> bool:
-        if id_user not in self.members:
-            return False
-        self.members.remove(id_user)
-        self.save()
-        return True
+        return self._edit_membership(Membership.remove(self._id, id_user), -1)
 
     def add_moderator(self, id_user: ObjectId) -> bool:
-        if id_user in self.moderators:
-            return False
-        self.moderators.append(id_user)
-        self.save()
-        return True
+        was_member = Membership.role_of(self._id, id_user) is not None
+        return self._edit_membership(Membership.add(self._id, id_user, MODERATOR), 0 if was_member else 1)
 
     def del_moderator(self, id_user: ObjectId) -> bool:
-        if id_user not in self.moderators:
-            return False
-        self.moderators.remove(id_user)
-        self.save()
-        return True
+        return Membership.demote(self._id, id_user)
+
+    def _edit_membership(self, changed: bool, delta: int) -> bool:
+        # member_count est incrémenté en base par Membership, on garde l'objet en phase sans le marquer modifié
+        if changed and delta:
+            self.member_count += delta
+            self._snapshot["member_count"] = self.member_count
+        return changed
 
     def make_public(self) -> None:
         self.public = True
@@ -83,11 +115,40 @@ class Thread:
 
     @staticmethod
     def get_by_id(thread_id: str | ObjectId) -> 'Thread | None':
+        thread_id = to_objectid(thread_id)
+        cached = identity_map.get("threads", thread_id)
+        if cached is not None:
+            return cached
         data = db.threads.find_one({"_id": thread_id})
         if data:
-            return Thread(**data)
+            return identity_map.put("threads", thread_id, Thread(**data))
         return None
 
+    @staticmethod
+    def get_by_ids(thread_ids: list[str | ObjectId]) -> tuple[list['Thread'], list[ObjectId]]:
+        return identity_map.load_many("threads", thread_ids, lambda ids: find_by_ids(db.threads, ids), lambda data: Thread(**data))
+
+    @staticmethod
+    def page(limit: int = 30, cursor: str | None = None, **kwargs) -> tuple[list['Thread'], str | None]:
+        docs, next_cursor = paginate(db.threads, kwargs, ID_SORT, limit, cursor)
+        return [Thread(**data) for data in docs], next_cursor
+
+    @staticmethod
+    def most_active(limit: int = 30, cursor: str | None = None, by: str = "recent") -> tuple[list['Thread'], str | None]:
+        """Page through the public threads with posts, by latest post (`by="recent"`) or by number of posts (`by="posts"`).
+
+        Raises:
+            ValueError: If `by` or the cursor is invalid.
+        """
+        if by == "recent":
+            query, sort = {"public": True, "last_post_at": {"$type": "date"}}, ACTIVE_SORT
+        elif by == "posts":
+            query, sort = {"public": True, "post_count": {"$gt": 0}}, POPULAR_SORT
+        else:
+            raise ValueError(f"Unknown sort '{by}'")
+        docs, next_cursor = paginate(db.threads, query, sort, limit, cursor)
+        return [Thread(**data) for data in docs], next_cursor
+
     @staticmethod
     def all(limit: int = 30, **kwargs) -> Generator['Thread']:
         return (Thread(**thread) for thread in db.threads.find(kwargs).limit(limit))
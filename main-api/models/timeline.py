@@ -0,0 +1,173 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Iterator
+import heapq
+from concurrent.futures import Future
+from itertools import islice
+from bson import ObjectId
+from pymongo import UpdateOne
+from .base import Document, QueryShape
+from .post import Post
+from .thread import Thread
+from .membership import Membership
+from .user import User
+from ..utils.database import get_database
+from ..utils.pagination import RECENT_SORT, decode_cursor, keyset_filter, split_page
+from ..utils.helpers import to_objectid
+from ..utils.background import BackgroundPool
+from ..utils.config import Config
+
+db = get_database()
+
+# Pousse les nouveaux posts dans les timelines, hors du chemin de la requête
+fanout = BackgroundPool("fanout", Config.FEED_FANOUT_WORKERS)
+
+@dataclass(kw_only=True)
+class Timeline(Document):
+    """
+    Precomputed home feed of a user: the most recent posts pushed to them, capped at `Config.FEED_TIMELINE_SIZE`.
+
+    Two delivery modes are mixed, chosen per source:
+    - fan-out on write: a new post is pushed to the timeline of every follower of its author and every
+      member of its thread, as long as they number at most `Config.FEED_FANOUT_MAX_FOLLOWERS`;
+    - fan-out on read: posts of bigger accounts and threads are not pushed (that would be one write per
+      follower), they are queried when the feed is read and k-way merged with the stored timeline.
+
+    Attributes:
+        _id (ObjectId): Identifier of the user owning the timeline.
+        entries (list[dict]): `{_id, date, id_author, id_thread}` of the posts, most recent first.
+
+    Pushes are made in the background by the `fanout` pool (see `fan_out_later`), except the one to the
+    author, so saving a post costs one write whatever the audience.
+
+    Methods:
+        fan_out_later(post: Post) -> Future: Pushes a new post to its author now, to the rest of its audience in the background.
+        fan_out(post: Post) -> int: Pushes a new post to the timelines of its audience.
+        read(user_id, limit=30, cursor=None) -> tuple[list[Post], str | None]: Returns one page of the feed.
+    """
+    COLLECTION = "timelines"
+    QUERIES = [QueryShape("get_by_id", {"_id": ObjectId()})]
+
+    _id: ObjectId
+    entries: list[dict] = field(default_factory=list)
+
+    @staticmethod
+    def is_pushed(audience: int) -> bool:
+        return audience <= Config.FEED_FANOUT_MAX_FOLLOWERS
+
+    @staticmethod
+    def _push(post: Post) -> dict:
+        entry = {"_id": post._id, "date": post.date, "id_author": post.id_author, "id_thread": post.id_thread}
+        return {"$push": {"entries": {"$each": [entry], "$sort": {"date": -1, "_id": -1}, "$slice": Config.FEED_TIMELINE_SIZE}}}
+
+    @staticmethod
+    def fan_out_later(post: Post) -> Future:
+        # L'auteur voit son post tout de suite ; l'audience, une fois le pool passé
+        db.timelines.update_one({"_id": post.id_author}, Timeline._push(post), upsert=True)
+        return fanout.submit(Timeline.fan_out, post, False)
+
+    @staticmethod
+    def fan_out(post: Post, include_author: bool = True) -> int:
+        """Push `post` to its author, the followers of its author and the members of its thread, when small enough.
+
+        Returns:
+            int: The number of timelines written.
+        """
+        recipients = {post.id_author}
+        author = User.get_by_id(post.id_author, projection={"follower_count": 1})
+        if author and Timeline.is_pushed(author.__dict__.get("follower_count", 0)):
+            recipients.update(doc["_id"] for doc in db.users.find({"followed": post.id_author}, {"_id": 1}))
+        thread = Thread.get_by_id(post.id_thread)
+        if thread and Timeline.is_pushed(thread.member_count):
+            recipients.update(Membership.user_ids(thread._id))
+
+        if not include_author:
+            recipients.discard(post.id_author)
+        push = Timeline._push(post)
+        requests = [UpdateOne({"_id": user_id}, push, upsert=True) for user_id in recipients]
+        for start in range(0, len(requests), Config.FEED_FANOUT_BATCH_SIZE):
+            db.timelines.bulk_write(requests[start:start + Config.FEED_FANOUT_BATCH_SIZE], ordered=False)
+        return len(requests)
+
+    @staticmethod
+    def read(user_id: str | ObjectId, limit: int = 30, cursor: str | None = None) -> tuple[list[Post], str | None]:
+        """Return one page of a user's feed, most recent first, and the cursor of the next page.
+
+        Posts by blocked users and posts of private threads the user cannot see are left out.
+
+        Raises:
+            ValueError: If the cursor is invalid.
+        """
+        user_id = to_objectid(user_id)
+        after = decode_cursor(cursor, RECENT_SORT) if cursor else None
+        user = User.get_by_id(user_id, projection={"followed": 1, "blocked": 1})
+        if user is None:
+            return [], None
+        blocked = set(user.__dict__.get("blocked", []))
+
+        sources = [Timeline._stored(user_id, after)]
+        pulled_authors = [doc["_id"] for doc in db.users.find(
+            {"_id": {"$in": user.__dict__.get("followed", [])}, "follower_count": {"$gt": Config.FEED_FANOUT_MAX_FOLLOWERS}}, {"_id": 1})]
+        pulled_threads = [doc["_id"] for doc in db.threads.find(
+            {"_id": {"$in": Membership.thread_ids(user_id)}, "member_count": {"$gt": Config.FEED_FANOUT_MAX_FOLLOWERS}}, {"_id": 1})]
+        sources += [Timeline._pulled({"id_author": author_id}, after, limit) for author_id in pulled_authors]
+        sources += [Timeline._pulled({"id_thread": thread_id}, after, limit) for thread_id in pulled_threads]
+
+        # Fusion k-voies des sources, toutes triées de la plus récente à la plus ancienne ; les posts
+        # invisibles sont écartés après chargement, on relit donc jusqu'à remplir la page
+        merged = Timeline._unique(heapq.merge(*sources, key=_sort_key, reverse=True), blocked)
+        selected = []
+        while len(selected) <= limit:
+            batch = list(islice(merged, limit + 1 - len(selected)))
+            if not batch:
+                break
+            selected += Timeline._load_visible(batch, user_id)
+        page, next_cursor = split_page([item for item, _ in selected], RECENT_SORT, limit)
+        return [post for _, post in selected[:len(page)]], next_cursor
+
+    @staticmethod
+    def _unique(items: Iterator[dict], blocked: set[ObjectId]) -> Iterator[dict]:
+        seen = set()
+        for item in items:
+            if item["_id"] not in seen and item["id_author"] not in blocked:
+                seen.add(item["_id"])
+                yield item
+
+    @staticmethod
+    def _load_visible(items: list[dict], user_id: ObjectId) -> list[tuple[dict, Post]]:
+        # Les entrées des timelines ne portent que les clés : les posts sont chargés en une requête
+        loaded, _ = Post.get_by_ids([item["_id"] for item in items if "content" not in item])
+        by_id = {post._id: post for post in loaded}
+        posts = [(item, Post(**item) if "content" in item else by_id.get(item["_id"])) for item in items]
+        visible = {post._id for post in Timeline._visible([post for _, post in posts if post is not None], user_id)}
+        return [(item, post) for item, post in posts if post is not None and post._id in visible]
+
+    @staticmethod
+    def _stored(user_id: ObjectId, after: dict | None) -> Iterator[dict]:
+        doc = db.timelines.find_one({"_id": user_id}) or {}
+        for entry in doc.get("entries", []):
+            if after is None or _sort_key(entry) < _sort_key(after):
+                yield entry
+
+    @staticmethod
+    def _pulled(query: dict, after: dict | None, limit: int) -> Iterator[dict]:
+        # Sans limite : lu par lots tant que la fusion en redemande
+        if after:
+            query = {"$and": [query, keyset_filter(RECENT_SORT, after)]}
+        return db.posts.find(query).sort(RECENT_SORT).batch_size(limit + 1)
+
+    @staticmethod
+    def _visible(posts: list[Post], user_id: ObjectId) -> list[Post]:
+        threads, _ = Thread.get_by_ids(list({post.id_thread for post in posts}))
+        private = [thread._id for thread in threads if not thread.public and thread.id_owner != user_id]
+        roles = Membership.roles_of(user_id, private)
+        allowed = {thread._id for thread in threads if thread._id not in private or thread._id in roles}
+        return [post for post in posts if post.id_thread in allowed]
+
+
+def _sort_key(item: dict) -> tuple[datetime, ObjectId]:
+    # Les dates relues depuis un curseur peuvent porter un fuseau, celles de MongoDB non
+    date = item["date"]
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date, item["_id"]
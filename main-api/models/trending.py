@@ -0,0 +1,182 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from collections import defaultdict
+import heapq
+from bson import ObjectId
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+from .base import Document, QueryShape
+from .key import Key
+from ..utils.database import get_database
+from ..utils.counters import counters
+from ..utils.cache import TTLCache
+from ..utils.config import Config
+
+db = get_database()
+
+# Fenêtres de tendance : durée et demi-vie de la décroissance, en secondes
+WINDOWS = {
+    "1h": (3600, 900),
+    "24h": (24 * 3600, 4 * 3600),
+    "7d": (7 * 24 * 3600, 24 * 3600),
+}
+
+# Dernier instantané lu, partagé par les requêtes du processus
+_snapshots = TTLCache(ttl=Config.TRENDING_CACHE_TTL, max_size=1).reset_at_fork()
+
+@dataclass(kw_only=True)
+class KeyBucket(Document):
+    """
+    Usage counts of the keys during one time bucket of `Config.TRENDING_BUCKET_SECONDS`.
+
+    Posts and comments add one use per key they gained when saved, through the buffered counters,
+    so a burst of posts on the same key costs one write per flush. Buckets older than the longest
+    window are removed when the trending snapshot is computed.
+
+    Attributes:
+        _id (datetime): Start of the bucket.
+        counts (dict[str, int]): Number of uses per key ID (as a string, MongoDB field names are strings).
+    """
+    COLLECTION = "key_buckets"
+    QUERIES = [QueryShape("since", {"_id": {"$gte": datetime.now()}}, [("_id", DESCENDING)])]
+
+    _id: datetime
+    counts: dict[str, int] = field(default_factory=dict)
+
+    @staticmethod
+    def bucket_of(moment: datetime) -> datetime:
+        size = Config.TRENDING_BUCKET_SECONDS
+        return datetime.fromtimestamp(moment.timestamp() // size * size)
+
+    @staticmethod
+    def record(keys: list[ObjectId]) -> None:
+        """Count one use of each key, in the current bucket."""
+        bucket = KeyBucket.bucket_of(datetime.now())
+        for key_id in set(keys):
+            counters.incr("key_buckets", bucket, f"counts.{key_id}", 1, upsert=True)
+
+    @staticmethod
+    def since(start: datetime) -> list['KeyBucket']:
+        """Return the buckets starting at or after `start`, most recent first."""
+        return [KeyBucket(**doc) for doc in db.key_buckets.find({"_id": {"$gte": start}}).sort("_id", DESCENDING)]
+
+    @staticmethod
+    def purge(before: datetime) -> int:
+        return db.key_buckets.delete_many({"_id": {"$lt": before}}).deleted_count
+
+
+def rank_windows(buckets: list[KeyBucket], now: datetime, top_k: int) -> dict[str, list[dict]]:
+    """Score the keys of `buckets` in every window of `WINDOWS` and keep the `top_k` best of each.
+
+    A use counts `0.5 ** (age / half_life)`, the age being taken at the start of its bucket; buckets
+    older than a window are left out of it.
+
+    Returns:
+        dict: `{id_key, score, count}` of the top keys, best first, per window.
+    """
+    scores = {name: defaultdict(float) for name in WINDOWS}
+    uses = {name: defaultdict(int) for name in WINDOWS}
+    # Un seul parcours des seaux : les fenêtres sont emboîtées, chaque seau alimente toutes celles
+    # qui le contiennent encore
+    for bucket in buckets:
+        age = (now - bucket._id).total_seconds()
+        for name, (length, half_life) in WINDOWS.items():
+            if age > length:
+                continue
+            decay = 0.5 ** (age / half_life)
+            for key_id, count in bucket.counts.items():
+                scores[name][key_id] += count * decay
+                uses[name][key_id] += count
+    windows = {}
+    for name in WINDOWS:
+        top = heapq.nlargest(top_k, scores[name].items(), key=lambda item: item[1])
+        windows[name] = [{"id_key": ObjectId(key_id), "score": score, "count": uses[name][key_id]}
+                         for key_id, score in top if score > 0]
+    return windows
+
+
+@dataclass(kw_only=True)
+class TrendingSnapshot(Document):
+    """
+    Precomputed top keys of every window of `WINDOWS`, stored as a single document.
+
+    A key's score in a window is its number of uses, each weighted by `0.5 ** (age / half_life)`, so
+    a key used a lot in the last minutes ranks above one used as much at the start of the window.
+    Requests only read the snapshot (cached `Config.TRENDING_CACHE_TTL` seconds in each process); when
+    it is older than `Config.TRENDING_REFRESH_INTERVAL`, the first request to claim it recomputes it
+    while the others keep serving the previous one. `trending refresh` recomputes it from a cron job.
+
+    Attributes:
+        _id (str): Always `"keys"`.
+        computed_at (datetime | None): When the snapshot was computed, None before the first computation.
+        claimed_at (datetime): When a worker last started recomputing it.
+        windows (dict[str, list[dict]]): `{id_key, name, score, count}` of the top keys, best first, per window.
+
+    Methods:
+        compute() -> TrendingSnapshot: Recomputes and stores the snapshot.
+        current() -> TrendingSnapshot | None: Returns the latest snapshot, recomputing it if stale.
+        top(window, limit=20) -> list[dict]: Returns the top keys of a window.
+    """
+    COLLECTION = "trending"
+    QUERIES = [QueryShape("get", {"_id": "keys"})]
+
+    _id: str = "keys"
+    computed_at: datetime | None = None
+    claimed_at: datetime = field(default_factory=lambda: datetime.now())
+    windows: dict[str, list[dict]] = field(default_factory=dict)
+
+    @staticmethod
+    def compute() -> 'TrendingSnapshot':
+        now = datetime.now()
+        longest = max(length for length, _ in WINDOWS.values())
+        windows = rank_windows(KeyBucket.since(now - timedelta(seconds=longest)), now, Config.TRENDING_TOP_K)
+        key_ids = {entry["id_key"] for entries in windows.values() for entry in entries}
+        keys, _ = Key.get_by_ids(list(key_ids))
+        names = {key._id: key.name for key in keys}
+        for name in WINDOWS:
+            windows[name] = [{**entry, "name": names[entry["id_key"]]} for entry in windows[name] if entry["id_key"] in names]
+
+        snapshot = TrendingSnapshot(computed_at=now, claimed_at=now, windows=windows)
+        db.trending.replace_one({"_id": snapshot._id}, snapshot.to_document(), upsert=True)
+        _snapshots.set(snapshot._id, snapshot)
+        KeyBucket.purge(KeyBucket.bucket_of(now - timedelta(seconds=longest)))
+        return snapshot
+
+    @staticmethod
+    def current() -> 'TrendingSnapshot | None':
+        snapshot = _snapshots.get("keys")
+        if not TTLCache.is_missing(snapshot):
+            return snapshot
+        data = db.trending.find_one({"_id": "keys"})
+        snapshot = _snapshots.set("keys", TrendingSnapshot(**data) if data else None)
+        if TrendingSnapshot._claim(data):
+            snapshot = TrendingSnapshot.compute()
+        return snapshot
+
+    @staticmethod
+    def _claim(data: dict | None) -> bool:
+        # Un seul processus recalcule un instantané périmé ; les autres servent l'ancien en attendant
+        now = datetime.now()
+        stale = now - timedelta(seconds=Config.TRENDING_REFRESH_INTERVAL)
+        if data is None:
+            try:
+                db.trending.insert_one(TrendingSnapshot(claimed_at=now).to_document())
+                return True
+            except DuplicateKeyError:
+                return False
+        if data.get("computed_at") and data["computed_at"] >= stale:
+            return False
+        result = db.trending.update_one({"_id": "keys", "claimed_at": {"$lt": stale}}, {"$set": {"claimed_at": now}})
+        return result.modified_count == 1
+
+    @staticmethod
+    def top(window: str, limit: int = 20) -> list[dict]:
+        """Return the top keys of a window, best first.
+
+        Raises:
+            ValueError: If the window is not one of `WINDOWS`.
+        """
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown window '{window}'")
+        snapshot = TrendingSnapshot.current()
+        return snapshot.windows.get(window, [])[:limit] if snapshot else []
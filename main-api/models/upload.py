@@ -0,0 +1,184 @@
+from dataclasses import dataclass, field
+from bson import ObjectId
+from datetime import datetime
+from typing import BinaryIO
+import os
+import shutil
+from ..utils.database import get_database
+from pymongo import IndexModel, ASCENDING
+from .base import Document, QueryShape
+from .media import Media
+from .user import User
+from ..utils.helpers import isobjectid, to_objectid
+from ..utils.config import Config
+from ..utils import uploads
+
+db = get_database()
+
+@dataclass(kw_only=True)
+class Upload(Document):
+    """
+    Resumable upload session: the client sends the file in ranges and can resume after the last stored byte.
+
+    Bytes are written to `<UPLOAD_TMP_DIR>/<id>.part`; sessions left unfinished expire after
+    `Config.UPLOAD_SESSION_TTL` seconds (TTL index), their part files are removed by `purge_expired`.
+    A completed session keeps the metadata of its file until a post or a comment is created with
+    its ID (see `completed`), so clients never send file paths themselves.
+
+    Attributes:
+        _id (ObjectId): Identifier of the session.
+        id_user (ObjectId): User who started the upload.
+        kind (str): `"media"` or `"pp"`, selecting the byte limit and the allowed types.
+        length (int): Total size announced when the session was created.
+        received (int): Number of bytes already stored, i.e. the offset of the next range.
+        created_at (datetime): Creation date, used by the TTL index.
+        media (dict | None): Metadata of the stored file once the upload is complete, see Media.
+
+    Methods:
+        create(id_user, kind, length) -> Upload: Opens a session after checking the announced size.
+        append(stream, start) -> int: Stores the range starting at `start`.
+        complete() -> Media | None: Checks the assembled file, stores a media or sets the profile picture.
+        completed(upload_ids, id_user) -> list[Media]: Returns the files of completed uploads, to attach them.
+        discard(upload_ids) -> None: Closes sessions whose file was attached.
+    """
+    COLLECTION = "uploads"
+    INDEXES = [IndexModel([("created_at", ASCENDING)], expireAfterSeconds=Config.UPLOAD_SESSION_TTL, name="created_at_ttl")]
+    QUERIES = [QueryShape("get_by_id", {"_id": ObjectId()})]
+
+    _id: ObjectId = field(default_factory=lambda: None)
+    id_user: ObjectId
+    kind: str
+    length: int
+    received: int = 0
+    created_at: datetime = field(default_factory=lambda: datetime.now())
+    media: dict | None = None
+
+    @property
+    def part_path(self) -> str:
+        return os.path.join(Config.UPLOAD_TMP_DIR, f"{self._id}.part")
+
+    def is_complete(self) -> bool:
+        return self.received >= self.length
+
+    def save(self) -> None:
+        self._persist(db.uploads)
+
+    def delete(self) -> None:
+        if self._id:
+            db.uploads.delete_one({"_id": self._id})
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+    @staticmethod
+    def create(id_user: ObjectId, kind: str, length: int) -> 'Upload':
+        """Open a session; raises `UploadTooLarge` right away if `length` exceeds the limit of `kind`."""
+        if kind not in uploads.ALLOWED_TYPES:
+            raise uploads.UploadError(f"Unknown upload kind '{kind}'")
+        uploads.check_length(kind, length)
+        upload = Upload(id_user=to_objectid(id_user), kind=kind, length=length)
+        upload.save()
+        return upload
+
+    @staticmethod
+    def get_by_id(upload_id: str | ObjectId) -> 'Upload | None':
+        data = db.uploads.find_one({"_id": to_objectid(upload_id)})
+        if data:
+            return Upload(**data)
+        return None
+
+    def append(self, stream: BinaryIO, start: int) -> int:
+        """Store the range of the body starting at `start`, which must be the current `received` offset.
+
+        The offset is advanced with a conditional update, so two clients resuming the same session
+        cannot both move it forward.
+
+        Returns:
+            int: The new `received` offset.
+
+        Raises:
+            UploadError: If `start` is not the current offset (the client must resume from `received`).
+            UploadTooLarge: If the range goes past the announced length.
+        """
+        if start != self.received:
+            raise uploads.UploadError(f"Expected range starting at {self.received}")
+        os.makedirs(Config.UPLOAD_TMP_DIR, exist_ok=True)
+        written = uploads.write_chunk(self.part_path, stream, start, self.length - start)
+        if start == 0 and written:
+            with open(self.part_path, "rb") as part:
+                uploads.check_type(self.kind, part.read(uploads.SNIFF_BYTES))
+        result = db.uploads.update_one({"_id": self._id, "received": start}, {"$set": {"received": start + written}})
+        if result.modified_count != 1:
+            raise uploads.UploadError("Concurrent upload on this session")
+        self.received = start + written
+        self.mark_clean()
+        return self.received
+
+    def complete(self) -> Media | None:
+        """Finish the upload once every byte is stored.
+
+        A `"media"` file is moved under `Config.MEDIA_PATH`, named by its content hash, and measured;
+        the returned Media is attached later through the upload ID. A `"pp"` file becomes the profile
+        picture of the uploader, processed in the background like a direct upload (returns None).
+        """
+        if not self.is_complete():
+            raise uploads.UploadError(f"Upload incomplete: {self.received}/{self.length} bytes")
+        with open(self.part_path, "rb") as part:
+            mime = uploads.check_type(self.kind, part.read(uploads.SNIFF_BYTES))
+        if self.kind == "pp":
+            return self._complete_pp()
+        media = Media.from_file(os.path.relpath(self.part_path, Config.MEDIA_PATH))
+        name = media.sha256 + uploads.EXTENSIONS[mime]
+        os.makedirs(Config.MEDIA_PATH, exist_ok=True)
+        os.replace(self.part_path, os.path.join(Config.MEDIA_PATH, name))
+        media = Media(name, mime, media.size, media.width, media.height, media.sha256)
+        # La session reste ouverte jusqu'à ce que le fichier soit attaché à un post ou un commentaire
+        self.media = media.to_document()
+        self.save()
+        return media
+
+    def _complete_pp(self) -> None:
+        user = User.get_by_id(self.id_user)
+        if user is None:
+            raise uploads.UploadError("User not found")
+        # Hors du dossier des envois : purge_expired ne doit pas supprimer le fichier en cours de traitement
+        os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+        path = os.path.join(Config.UPLOAD_FOLDER, f".upload-{self._id}")
+        shutil.move(self.part_path, path)
+        self.delete()
+        user.use_pp(Config.UPLOAD_FOLDER, path, uploads.file_digest(path))
+
+    @staticmethod
+    def completed(upload_ids: list[str | ObjectId], id_user: str | ObjectId) -> list[Media]:
+        """Return the files of completed media uploads of `id_user`, in the order of `upload_ids`.
+
+        Raises:
+            UploadError: If an ID is not a complete media upload of this user.
+        """
+        if not isinstance(upload_ids, list) or not all(isobjectid(upload_id) for upload_id in upload_ids):
+            raise uploads.UploadError("Medias must be a list of upload IDs")
+        ids = [to_objectid(upload_id) for upload_id in upload_ids]
+        found = {doc["_id"]: doc["media"] for doc in db.uploads.find(
+            {"_id": {"$in": ids}, "id_user": to_objectid(id_user), "kind": "media", "media": {"$ne": None}}, {"media": 1})}
+        missing = [str(upload_id) for upload_id in ids if upload_id not in found]
+        if missing:
+            raise uploads.UploadError(f"Uploads not found or not complete: {', '.join(missing)}")
+        return [Media.from_value(found[upload_id]) for upload_id in ids]
+
+    @staticmethod
+    def discard(upload_ids: list[str | ObjectId]) -> None:
+        if upload_ids:
+            db.uploads.delete_many({"_id": {"$in": [to_objectid(upload_id) for upload_id in upload_ids]}})
+
+    @staticmethod
+    def purge_expired() -> int:
+        """Remove the part files whose session expired. Returns the number of files removed."""
+        if not os.path.isdir(Config.UPLOAD_TMP_DIR):
+            return 0
+        names = [name for name in os.listdir(Config.UPLOAD_TMP_DIR) if name.endswith(".part")]
+        alive = {str(doc["_id"]) for doc in db.uploads.find({"_id": {"$in": [to_objectid(n[:-5]) for n in names]}}, {"_id": 1})}
+        removed = 0
+        for name in names:
+            if name[:-5] not in alive:
+                os.remove(os.path.join(Config.UPLOAD_TMP_DIR, name))
+                removed += 1
+        return removed
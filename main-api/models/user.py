@@ -6,21 +6,30 @@ from datetime import date
 from pathlib import Path
 from .interest import Interest
 from .role import Role
-from ..utils.database import get_database
-import bcrypt
-from dtos.user_dto import PublicUserDTO, PrivateUserDTO
+from .suggestion import Suggestion
+from ..utils.database import get_database, find_by_ids
+from ..utils.pagination import paginate, ID_SORT
+from pymongo import IndexModel, ASCENDING
+from .base import Document, QueryShape
+from ..utils import identity_map
+from ..utils.passwords import hasher
+from ..utils import images, uploads
+from ..utils.search import search, text_index
+from ..dtos.user_dto import PublicUserDTO, PrivateUserDTO
 from ..utils.config import Config
-from PIL.Image import Image
+from PIL.Image import Image, open as open_image
 from typing import Generator
-from utils.helpers import allowed_file, isobjectid
-from werkzeug.utils import secure_filename
+from ..utils.helpers import isobjectid, to_objectid
 from werkzeug.datastructures import FileStorage
 
 
 db = get_database()
 
-@dataclass
-class User:
+# Champs des DTOs dont le nom diffère dans le document MongoDB
+_DTO_FIELDS = {"id": "_id", "role": "id_role"}
+
+@dataclass(kw_only=True)
+class User(Document):
     """
     Class representing a user in the application, with basic information such as role, username, password, email, and interests.
     Manages interaction with the MongoDB database, including insertion, update, deletion, and retrieval of user documents.
@@ -40,24 +49,48 @@ class User:
         interests (list[ObjectId]): List of identifiers for the user's interests.
         description (str): Profile description of the user.
         status (str): Current status of the user.
+        follower_count (int): Number of users following this user.
 
     Methods:
-        __post_init__(): Encrypts the password if it isn't already encrypted.
+        __post_init__(): Encrypts the password if it isn't already encrypted and snapshots the loaded state.
         hash_password(password: str | bytes) -> str: Returns the encrypted password.
         check_password(password: str | bytes) -> bool: Verifies if a password is correct.
-        save() -> None: Inserts or updates the user in MongoDB.
+        rehash_password(password: str | bytes) -> bool: Upgrades the stored hash if the bcrypt cost changed.
+        save() -> None: Inserts the user or sends its pending changes to MongoDB.
         delete() -> None: Deletes the user from MongoDB.
         update(**kwargs) -> None: Updates certain fields of the user.
         get_role() -> Role: Retrieves the user's role.
         get_followed() -> list['User']: Retrieves the list of followed users.
         get_blocked() -> list['User']: Retrieves the list of blocked users.
         get_interests() -> list[Interest]: Retrieves the list of the user's interests.
-        get_pp() -> Image: Retrieves the user's profile picture.
-        get_by_id(user_id: str | ObjectId, strtype: bool = True) -> 'User | None': Retrieves a user by their ID.
+        use_pp(folder: Path, path: str, digest: str) -> None: Uses a received image as the user's profile picture.
+        set_pp_digest(user_id: ObjectId, digest: str) -> None: Points a user to processed profile picture variants.
+        get_pp(size: int, ext: str) -> Image: Retrieves the user's profile picture.
+        get_by_id(user_id: str | ObjectId, strtype: bool = True, projection: dict | None = None) -> 'User | None': Retrieves a user by their ID.
+        get_by_ids(user_ids: list[str | ObjectId], projection: dict | None = None) -> tuple[list['User'], list[ObjectId]]: Retrieves several users in one query.
+        projection(dto: type[PublicUserDTO | PrivateUserDTO]) -> dict: Builds the projection needed by a DTO.
         get_by_email(user_email: str | EmailStr) -> 'User | None': Retrieves a user by their email.
+        exists(user_id: str | ObjectId) -> bool: Checks that a user exists without loading it.
+        follow/unfollow/block/unblock(user_id, target_id) -> bool | None: Atomically edits a relation list.
         all(limit: int = 30, **kwargs) -> Generator['User']: Retrieves a list of users based on filters and a limit.
-        to_dto(private: bool = False) -> PublicUserDTO | PrivateUserDTO: Converts the user's data to a public or private DTO.
+        page(limit: int = 30, cursor: str | None = None, **kwargs) -> tuple[list['User'], str | None]: Retrieves one page of users.
+        stream(limit: int = 0, **kwargs) -> Generator['User']: Iterates over matching users, reading them in batches.
+        stream_by_ids(user_ids: list[str | ObjectId]) -> Generator['User']: Iterates over users by ID, reading them in batches.
+        to_dto(private: bool = False, role: Role | None = None) -> PublicUserDTO | PrivateUserDTO: Converts the user's data to a public or private DTO.
     """
+    COLLECTION = "users"
+    INDEXES = [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("followed", ASCENDING)], name="followed"),
+        text_index("users"),
+    ]
+    QUERIES = [
+        QueryShape("get_by_id", {"_id": ObjectId()}),
+        QueryShape("get_by_email", {"email": ""}),
+        QueryShape("page", {}, ID_SORT),
+        QueryShape("followers", {"followed": ObjectId()}),
+    ]
+
     _id: ObjectId = field(default_factory=lambda: None)  # Par défaut None, MongoDB l’attribuera automatiquement
     id_role: ObjectId
     username: str
@@ -65,31 +98,36 @@ class User:
     email: EmailStr
     name: str
     surname: str
-    pp: Path = field(default_factory=Path("base_image.png"))
+    pp: Path = field(default_factory=lambda: Path("base_image.png"))
     birth_date: date
     followed: list[ObjectId] = field(default_factory=list)
     blocked: list[ObjectId] = field(default_factory=list)
     interests: list[ObjectId] = field(default_factory=list)
     description: str = ""
     status: str = ""
+    follower_count: int = 0  # maintenu par follow/unfollow, décide du mode de diffusion du fil
 
     def __post_init__(self):
         """Encrypt the user's password after initialization if it's not already hashed."""
         if not self.password.startswith('$2b$'):
             self.password = self.hash_password(self.password)
         self.validate_email()
+        super().__post_init__()
 
     @staticmethod
     def hash_password(password: str | bytes) -> str:
-        """Hash the user's password using bcrypt.
+        """Hash the user's password using bcrypt, on the password worker pool.
         
         Args:
             password: The plain-text password as a string or bytes.
 
         Returns:
             str: The hashed password.
+
+        Raises:
+            PasswordPoolSaturated: If too many hash operations are already queued.
         """
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        return hasher.hash(password)
 
     def check_password(self, password: str | bytes) -> bool:
         """Check if the provided password matches the stored hashed password.
@@ -99,21 +137,46 @@ class User:
 
         Returns:
             bool: True if the password is correct, False otherwise.
+
+        Raises:
+            PasswordPoolSaturated: If too many hash operations are already queued.
         """
-        return bcrypt.checkpw(password.encode('utf-8'), self.password.encode('utf-8'))
+        return hasher.verify(password, self.password)
+
+    def rehash_password(self, password: str | bytes) -> bool:
+        """Re-hash the password with the configured bcrypt cost if the stored hash uses another one.
+        
+        Must only be called with a password that was just verified.
+
+        Args:
+            password: The plain-text password, already checked with `check_password`.
+
+        Returns:
+            bool: True if the stored hash was upgraded.
+        """
+        if not hasher.needs_rehash(self.password):
+            return False
+        self.password = self.hash_password(password)
+        self.save()
+        return True
 
     def save(self) -> None:
-        """Save the user to the database. Insert a new document if `_id` is None, otherwise update the existing one."""
-        if self._id is None:
-            result = db.users.insert_one(self.__dict__)
-            self._id = result.inserted_id
-        else:
-            db.users.update_one({"_id": self._id}, {"$set": self.__dict__})
+        """Save the user to the database. Insert a new document if `_id` is None, otherwise send only the fields changed since it was loaded."""
+        changed = self._id is None or any(name in fields for fields in self.changes().values()
+                                          for name in ("interests", "followed", "blocked"))
+        self._persist(db.users)
+        identity_map.invalidate("users", self._id)
+        search.update("users", self)
+        if changed:
+            Suggestion.mark_stale(self._id)
 
     def delete(self):
         """Delete the user from the database."""
         if self._id:
             db.users.delete_one({"_id": self._id})
+            identity_map.invalidate("users", self._id)
+            search.remove("users", self._id)
+            Suggestion.delete(self._id)
 
     def update(self, **kwargs) -> None:
         """Update the user's attributes and save the changes.
@@ -127,7 +190,7 @@ class User:
                 if k == "password":
                     self.password = self.hash_password(v)
                 elif k == "role" and Role.get_by_name(v):
-                    self.role = Role.get_by_name(v)._id
+                    self.id_role = Role.get_by_name(v)._id
                 else:
                     setattr(self, k, v)
         self.validate_email()
@@ -141,21 +204,27 @@ class User:
         """
         return Role.get_by_id(self.id_role)
 
-    def get_followed(self) -> list['User']:
+    def get_followed(self, projection: dict | None = None) -> list['User']:
         """Retrieve the list of users followed by this user.
         
+        Args:
+            projection: If given, load only these fields and return partial users.
+
         Returns:
             list[User]: List of User objects that are followed.
         """
-        return [User.get_by_id(user_id) for user_id in self.followed]
+        return User.get_by_ids(self.followed, projection)[0]
 
-    def get_blocked(self) -> list['User']:
+    def get_blocked(self, projection: dict | None = None) -> list['User']:
         """Retrieve the list of users blocked by this user.
         
+        Args:
+            projection: If given, load only these fields and return partial users.
+
         Returns:
             list[User]: List of User objects that are blocked.
         """
-        return [User.get_by_id(user_id) for user_id in self.blocked]
+        return User.get_by_ids(self.blocked, projection)[0]
 
     def get_interests(self) -> list[Interest]:
         """Retrieve the list of interests associated with the user.
@@ -163,31 +232,45 @@ class User:
         Returns:
             list[Interest]: List of Interest objects.
         """
-        return [Interest.get_by_id(user_id) for user_id in self.followed]
+        return Interest.get_by_ids(self.interests)[0]
 
-    def get_pp(self) -> Image:
+    def get_pp(self, size: int = Config.PP_DEFAULT_SIZE, ext: str = "webp") -> Image:
         """Get the user's profile picture as an Image object.
-        
+
+        Args:
+            size: One of `Config.PP_SIZES`, for processed pictures.
+            ext: "webp" or "jpg", for processed pictures.
+
         Returns:
             Image: The profile picture of the user.
         """
-        return Image(Config.MEDIA_PATH / self.pp)
+        if images.is_digest(self.pp):
+            return open_image(os.path.join(Config.UPLOAD_FOLDER, images.variant_name(self.pp, size, ext)))
+        return open_image(Path(Config.MEDIA_PATH) / self.pp)
 
     @staticmethod
-    def get_by_id(user_id: str | ObjectId, strtype: bool = True) -> 'User| None':
+    def get_by_id(user_id: str | ObjectId, strtype: bool = True, projection: dict | None = None) -> 'User| None':
         """Retrieve a user by their unique identifier.
         
         Args:
             user_id: The unique identifier of the user.
             strtype: If True, return as a User object; if False, convert fields to ensure type consistency.
+            projection: If given, load only these fields (see `User.projection`) and return a partial user.
 
         Returns:
             User or None: The user if found, otherwise None.
         """
+        user_id = to_objectid(user_id)
+        cached = identity_map.get("users", user_id)
+        if cached is not None:
+            return cached
+        if projection is not None:
+            data = db.users.find_one({"_id": user_id}, projection)
+            return User.from_partial(data) if data else None
         data = db.users.find_one({"_id": user_id})
         if data:
             if strtype:
-                return User(**data)
+                return identity_map.put("users", user_id, User(**data))
             # Type conversions for consistency
             data["_id"] = ObjectId(data["_id"])
             data["id_role"] = ObjectId(data["id_role"])
@@ -198,9 +281,95 @@ class User:
             data["blocked"] = [ObjectId(like) for like in data.get("blocked", [])]
             data["interests"] = [ObjectId(like) for like in data.get("interests", [])]
             
-            return User(**data)
+            return identity_map.put("users", user_id, User(**data))
         return None
 
+    @staticmethod
+    def get_by_ids(user_ids: list[str | ObjectId], projection: dict | None = None) -> tuple[list['User'], list[ObjectId]]:
+        """Retrieve several users with a single query.
+        
+        Args:
+            user_ids: The unique identifiers of the users.
+            projection: If given, load only these fields (see `User.projection`) and return partial users.
+
+        Returns:
+            tuple[list[User], list[ObjectId]]: The users found, in the order of `user_ids`,
+            and the identifiers that matched no user.
+        """
+        if projection is not None:
+            return identity_map.load_many("users", user_ids, lambda ids: find_by_ids(db.users, ids, projection=projection),
+                                          User.from_partial, remember=False)
+        return identity_map.load_many("users", user_ids, lambda ids: find_by_ids(db.users, ids), lambda data: User(**data))
+
+    @staticmethod
+    def projection(dto: type[PublicUserDTO | PrivateUserDTO]) -> dict:
+        """Build the MongoDB projection loading exactly the fields needed by a DTO.
+        
+        Args:
+            dto: The DTO class the loaded users will be converted to.
+
+        Returns:
+            dict: The projection, usable with `get_by_id`, `get_by_ids`, `page` and `stream`.
+        """
+        return {_DTO_FIELDS.get(name, name): 1 for name in dto.model_fields}
+
+    @staticmethod
+    def exists(user_id: str | ObjectId) -> bool:
+        """Check whether a user exists, using only the `_id` index.
+        
+        Args:
+            user_id: The unique identifier of the user.
+
+        Returns:
+            bool: True if the user exists.
+        """
+        return db.users.count_documents({"_id": to_objectid(user_id)}, limit=1) == 1
+
+    @staticmethod
+    def _edit_relation(user_id: str | ObjectId, relation: str, target_id: str | ObjectId, add: bool) -> bool | None:
+        """Add or remove `target_id` in the `relation` list of a user with one conditional update.
+        
+        Args:
+            user_id: The user whose list is modified.
+            relation: The list field to modify (`followed` or `blocked`).
+            target_id: The identifier to add or remove.
+            add: True to add the identifier, False to remove it.
+
+        Returns:
+            bool or None: True if the list changed, False if it already was in the requested state,
+            None if the user does not exist.
+        """
+        user_id, target_id = to_objectid(user_id), to_objectid(target_id)
+        if add:
+            result = db.users.update_one({"_id": user_id, relation: {"$ne": target_id}}, {"$addToSet": {relation: target_id}})
+        else:
+            result = db.users.update_one({"_id": user_id, relation: target_id}, {"$pull": {relation: target_id}})
+        if result.modified_count:
+            identity_map.invalidate("users", user_id)
+            Suggestion.mark_stale(user_id)
+            if relation == "followed":
+                db.users.update_one({"_id": target_id}, {"$inc": {"follower_count": 1 if add else -1}})
+                identity_map.invalidate("users", target_id)
+            return True
+        # Rien n'a été modifié : soit la relation était déjà dans cet état, soit l'utilisateur n'existe pas
+        return False if User.exists(user_id) else None
+
+    @staticmethod
+    def follow(user_id: str | ObjectId, target_id: str | ObjectId) -> bool | None:
+        return User._edit_relation(user_id, "followed", target_id, add=True)
+
+    @staticmethod
+    def unfollow(user_id: str | ObjectId, target_id: str | ObjectId) -> bool | None:
+        return User._edit_relation(user_id, "followed", target_id, add=False)
+
+    @staticmethod
+    def block(user_id: str | ObjectId, target_id: str | ObjectId) -> bool | None:
+        return User._edit_relation(user_id, "blocked", target_id, add=True)
+
+    @staticmethod
+    def unblock(user_id: str | ObjectId, target_id: str | ObjectId) -> bool | None:
+        return User._edit_relation(user_id, "blocked", target_id, add=False)
+
     @staticmethod
     def get_by_email(user_email: str | EmailStr) -> 'User| None':
         """Retrieve a user by their email address.
@@ -227,37 +396,142 @@ class User:
         Returns:
             Generator[User]: A generator of User objects.
         """
+        return (User(**user) for user in db.users.find(User._filters(kwargs)).limit(limit))
+
+    @staticmethod
+    def query(filters: dict) -> dict:
+        """Build the MongoDB query of a user listing from filters on the fields of `PublicUserDTO`.
+
+        Only public fields can be filtered on, under their DTO names (`id`, `role`, ...); `role` may be
+        a role name.
+
+        Raises:
+            ValueError: If a filter is not a field of `PublicUserDTO`.
+        """
+        unknown = [name for name in filters if name not in PublicUserDTO.model_fields]
+        if unknown:
+            raise ValueError(f"Unknown filter: {', '.join(unknown)}")
+        query = {_DTO_FIELDS.get(name, name): value for name, value in filters.items()}
+        if "_id" in query:
+            query["_id"] = to_objectid(query["_id"])
+        if "id_role" in query and not isobjectid(query["id_role"]):
+            role = Role.get_by_name(query["id_role"])
+            query["id_role"] = role._id if role else None
+        return query
+
+    @staticmethod
+    def page(limit: int = 30, cursor: str | None = None, projection: dict | None = None, query: dict | None = None) -> tuple[list['User'], str | None]:
+        """Retrieve one page of users matching a query, ordered by `_id`.
+        
+        Args:
+            limit: The maximum number of users in the page.
+            cursor: The cursor returned with the previous page, None for the first page.
+            projection: If given, load only these fields and return partial users.
+            query: MongoDB filter of the users, see `query()`; all users if None.
+
+        Returns:
+            tuple[list[User], str | None]: The users and the cursor of the next page, None on the last page.
+
+        Raises:
+            ValueError: If the cursor is invalid.
+        """
+        docs, next_cursor = paginate(db.users, query or {}, ID_SORT, limit, cursor, projection)
+        return [User.from_partial(data) if projection else User(**data) for data in docs], next_cursor
+
+    @staticmethod
+    def stream(limit: int = 0, projection: dict | None = None, query: dict | None = None) -> Generator['User']:
+        """Iterate over all users matching a query, fetched from MongoDB in batches.
+        
+        Args:
+            limit: The maximum number of users to retrieve, 0 for no limit.
+            projection: If given, load only these fields and return partial users.
+            query: MongoDB filter of the users, see `query()`; all users if None.
+
+        Returns:
+            Generator[User]: A generator of User objects, ordered by `_id`.
+        """
+        cursor = db.users.find(query or {}, projection).sort(ID_SORT).limit(limit).batch_size(Config.STREAM_BATCH_SIZE)
+        return (User.from_partial(user) if projection else User(**user) for user in cursor)
+
+    @staticmethod
+    def stream_by_ids(user_ids: list[str | ObjectId], projection: dict | None = None) -> Generator['User']:
+        """Iterate over the users of `user_ids`, loading one batch of users at a time.
+        
+        Args:
+            user_ids: The unique identifiers of the users.
+            projection: If given, load only these fields and return partial users.
+
+        Returns:
+            Generator[User]: A generator of the users found, in the order of `user_ids`.
+        """
+        for start in range(0, len(user_ids), Config.STREAM_BATCH_SIZE):
+            docs, _ = find_by_ids(db.users, user_ids[start:start + Config.STREAM_BATCH_SIZE], projection=projection)
+            yield from (User.from_partial(data) if projection else User(**data) for data in docs)
+
+    @staticmethod
+    def _filters(kwargs: dict) -> dict:
         if 'role' in kwargs and not isobjectid(kwargs['role']):
             kwargs['role'] = Role.get_by_name(kwargs['role'])._id
-        return (User(**user) for user in db.users.find(kwargs).limit(limit))
+        return kwargs
+
+    def set_pp(self, folder: Path, file: FileStorage, declared_length: int | None = None) -> None:
+        """Set the user's profile picture from a multipart upload.
+
+        The upload is copied to `folder` in fixed-size chunks while being hashed (see `utils.uploads`),
+        then resized and re-encoded in the background (see `use_pp`). Werkzeug has already spooled
+        the multipart body when `file` is read and gives no per-file length, so the request is only
+        bounded by `MAX_CONTENT_LENGTH`; the pp limit is enforced during the copy. Resumable uploads
+        of kind `"pp"` are checked before anything is stored.
 
-    def set_pp(self, folder: Path, file: FileStorage) -> None:
-        """Set the user's profile picture.
-        
         Args:
             folder: The folder in which to save the image.
             file: The new "PP" in a Flask (FileStorage) object.
+            declared_length: The size announced by the client, refused before reading if too large.
+
+        Raises:
+            UploadError: If the file is too large or is not a supported image (checked on its magic bytes).
         """
-        if not allowed_file(file.filename):
-            raise ValueError("error: Invalid file format")
-        pp_path = os.path.join(folder, secure_filename(file.filename))
-        file.save(pp_path)
-        self.pp = pp_path
-        self.save()
+        received = uploads.receive(file.stream, "pp", declared_length, folder)
+        self.use_pp(folder, received.path, received.sha256)
+
+    def use_pp(self, folder: Path, path: str, digest: str) -> None:
+        """Make the checked image at `path` the profile picture; the file is consumed.
+
+        The variants are rendered in the background (see `utils.images`) and `pp` is set to the
+        content hash `digest` once every variant exists.
+        """
+        if self._id is None:
+            self.save()
+        if images.variants_exist(folder, digest):
+            # Image déjà connue : rien à recalculer
+            os.remove(path)
+            self.pp = digest
+            self.save()
+            return
+        user_id = self._id
+        images.pipeline.submit(path, folder, digest, on_done=lambda digest: User.set_pp_digest(user_id, digest))
+
+    @staticmethod
+    def set_pp_digest(user_id: ObjectId, digest: str) -> None:
+        """Point a user's profile picture to processed variants, without loading the user."""
+        db.users.update_one({"_id": user_id}, {"$set": {"pp": digest}})
+        identity_map.invalidate("users", user_id)
 
-    def to_dto(self, private: bool = False) -> PublicUserDTO | PrivateUserDTO:
+    def to_dto(self, private: bool = False, role: Role | None = None) -> PublicUserDTO | PrivateUserDTO:
         """Convert the user to a data transfer object (DTO) for external use.
         
         Args:
             private: If True, include private user details in the DTO.
+            role: The user's role if already loaded, otherwise it is retrieved with `get_role`.
 
         Returns:
             PublicUserDTO or PrivateUserDTO: The DTO representation of the user.
         """
+        role = role or self.get_role()
         if private:
             return PrivateUserDTO(
                 id=str(self._id),
-                role=str(self.get_role().name),
+                role=str(role.name),
                 username=self.username,
                 email=self.email,
                 name=self.name,
@@ -273,7 +547,7 @@ class User:
         else:
             return PublicUserDTO(
                 id=str(self._id),
-                role=str(self.get_role().name),
+                role=str(role.name),
                 username=self.username,
                 pp=self.pp,
                 birth_date=self.birth_date,
@@ -1,5 +1,10 @@
 from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
 from ..models.comment import Comment
+from ..models.like import Like
+from ..models.upload import Upload
+from ..utils.helpers import isobjectid
+from ..utils.uploads import UploadError
 from bson import ObjectId
 
 comment_bp = Blueprint("comment_bp", __name__)
@@ -7,13 +12,33 @@ comment_bp = Blueprint("comment_bp", __name__)
 @comment_bp.route("/comments/<comment_id>", methods=["GET"])
 def get_comment(comment_id):
     comment = Comment.get_by_id(ObjectId(comment_id))
-    return jsonify(comment.__dict__) if comment else {"error": "Comment not found"}, 404
+    return (jsonify(comment.__dict__), 200) if comment else (jsonify({"error": "Comment not found"}), 404)
 
 @comment_bp.route("/comments", methods=["POST"])
+@jwt_required()
 def create_comment():
     data = request.json
-    comment = Comment(**data)
-    comment.save()
+    # L'auteur est toujours l'utilisateur du token, jamais celui du corps de la requête
+    data.pop("id_author", None)
+    id_author = get_jwt_identity()
+    # Une réponse hérite du post racine et du chemin de son parent
+    id_parent = data.get("id_parent")
+    parent = Comment.get_by_id(id_parent) if id_parent is not None and isobjectid(id_parent) else None
+    if id_parent is not None and parent is None:
+        return jsonify({"error": "Parent comment not found"}), 404
+    if parent is None and (data.get("id_post") is None or not isobjectid(data["id_post"])):
+        return jsonify({"error": "id_post is required"}), 400
+    data.pop("id_parent", None)
+    id_post = parent.id_post if parent else ObjectId(data.pop("id_post"))
+    data.pop("id_post", None)
+    upload_ids = data.pop("medias", [])
+    try:
+        medias = Upload.completed(upload_ids, id_author)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    comment = Comment.create(id_post, ObjectId(id_author), data.pop("content"), parent=parent,
+                             medias=[media.to_document() for media in medias], **data)
+    Upload.discard(upload_ids)
     return jsonify(comment.__dict__), 201
 
 @comment_bp.route("/comments/<comment_id>", methods=["DELETE"])
@@ -24,3 +49,58 @@ def delete_comment(comment_id):
         return jsonify({"message": "Comment deleted successfully"}), 200
     else:
         return jsonify({"error": "Comment not found"}), 404
+
+@comment_bp.route("/comments/<comment_id>/like", methods=["PUT"])
+@jwt_required()
+def like_comment(comment_id):
+    # Idempotent : liker deux fois ne change rien
+    if not isobjectid(comment_id) or not Comment.exists(comment_id):
+        return jsonify({"error": "Comment not found"}), 404
+    changed = Like.like("comments", comment_id, get_jwt_identity())
+    return jsonify({"liked": True, "changed": changed}), 200
+
+@comment_bp.route("/comments/<comment_id>/like", methods=["DELETE"])
+@jwt_required()
+def unlike_comment(comment_id):
+    if not isobjectid(comment_id) or not Comment.exists(comment_id):
+        return jsonify({"error": "Comment not found"}), 404
+    changed = Like.unlike("comments", comment_id, get_jwt_identity())
+    return jsonify({"liked": False, "changed": changed}), 200
+
+@comment_bp.route("/posts/<post_id>/comments", methods=["GET"])
+def get_post_comments(post_id):
+    """Top-level comments of a post, oldest first, each with its first replies (`?depth=2&replies=3`)."""
+    if not isobjectid(post_id):
+        return jsonify({"error": "Post not found"}), 404
+    try:
+        limit = min(max(int(request.args.get("limit", 30)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    try:
+        nodes, next_cursor = Comment.page_with_replies(
+            ObjectId(post_id), limit=limit, cursor=request.args.get("cursor"),
+            depth=min(int(request.args.get("depth", 2)), 10), replies=min(int(request.args.get("replies", 3)), 50))
+    except ValueError:
+        return jsonify({"error": "Invalid parameters"}), 400
+    response = jsonify([node.to_dict() for node in nodes])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
+@comment_bp.route("/comments/<comment_id>/replies", methods=["GET"])
+def get_comment_replies(comment_id):
+    comment = Comment.get_by_id(ObjectId(comment_id)) if isobjectid(comment_id) else None
+    if not comment:
+        return jsonify({"error": "Comment not found"}), 404
+    try:
+        limit = min(max(int(request.args.get("limit", 30)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    try:
+        replies, next_cursor = comment.get_replies(limit=limit, cursor=request.args.get("cursor"))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    response = jsonify([reply.__dict__ for reply in replies])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
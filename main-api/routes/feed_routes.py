@@ -0,0 +1,28 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from ..models.timeline import Timeline
+from ..models.like import Like
+from .. import logger
+
+feed_bp = Blueprint("feed_bp", __name__, url_prefix="/api")
+
+@feed_bp.route("/feed", methods=["GET"])
+@jwt_required()
+def get_feed():
+    current_user_id = get_jwt_identity()
+    logger.info(f"GET /feed - Current user ID: {current_user_id}")
+    try:
+        limit = min(max(int(request.args.get("limit", 30)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    try:
+        posts, next_cursor = Timeline.read(current_user_id, limit=limit, cursor=request.args.get("cursor"))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    # Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor
+    # Une seule requête pour savoir quels posts de la page l'utilisateur a likés
+    liked = Like.liked_by(current_user_id, [post._id for post in posts])
+    response = jsonify([{**post.__dict__, "liked": post._id in liked} for post in posts])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
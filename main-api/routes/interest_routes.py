@@ -7,7 +7,7 @@ interest_bp = Blueprint("interest_bp", __name__)
 @interest_bp.route("/interests/<interest_id>", methods=["GET"])
 def get_interest(interest_id):
     interest = Interest.get_by_id(ObjectId(interest_id))
-    return jsonify(interest.__dict__) if interest else {"error": "Interest not found"}, 404
+    return (jsonify(interest.__dict__), 200) if interest else (jsonify({"error": "Interest not found"}), 404)
 
 @interest_bp.route("/interests", methods=["POST"])
 def create_interest():
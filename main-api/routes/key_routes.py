@@ -6,19 +6,19 @@ key_bp = Blueprint("key_bp", __name__)
 
 @key_bp.route("/keys/<key_id>", methods=["GET"])
 def get_key(key_id):
-    key = keys.get_by_id(ObjectId(key_id))
-    return jsonify(key.__dict__) if key else {"error": "keys not found"}, 404
+    key = Key.get_by_id(ObjectId(key_id))
+    return (jsonify(key.__dict__), 200) if key else (jsonify({"error": "keys not found"}), 404)
 
 @key_bp.route("/keys", methods=["POST"])
 def create_key():
     data = request.json
-    key = keys(**data)
+    key = Key(**data)
     key.save()
     return jsonify(key.__dict__), 201
 
 @key_bp.route("/keys/<key_id>", methods=["DELETE"])
 def delete_key(key_id):
-    key = keys.get_by_id(ObjectId(key_id))
+    key = Key.get_by_id(ObjectId(key_id))
     if key:
         key.delete()
         return jsonify({"message": "keys deleted successfully"}), 200
@@ -1,5 +1,11 @@
 from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
 from ..models.post import Post
+from ..models.thread import Thread
+from ..models.like import Like
+from ..models.upload import Upload
+from ..utils.helpers import isobjectid
+from ..utils.uploads import UploadError
 from bson import ObjectId
 
 post_bp = Blueprint("post_bp", __name__)
@@ -7,13 +13,32 @@ post_bp = Blueprint("post_bp", __name__)
 @post_bp.route("/posts/<post_id>", methods=["GET"])
 def get_post(post_id):
     post = Post.get_by_id(ObjectId(post_id))
-    return jsonify(post.__dict__) if post else {"error": "Post not found"}, 404
+    return (jsonify(post.__dict__), 200) if post else (jsonify({"error": "Post not found"}), 404)
 
 @post_bp.route("/posts", methods=["POST"])
+@jwt_required()
 def create_post():
     data = request.json
-    post = Post(**data)
+    # L'auteur est toujours l'utilisateur du token, jamais celui du corps de la requête
+    data.pop("id_author", None)
+    id_author = get_jwt_identity()
+    id_thread = data.pop("id_thread", None)
+    thread = Thread.get_by_id(id_thread) if id_thread is not None and isobjectid(id_thread) else None
+    if thread is None:
+        return jsonify({"error": "Thread not found"}), 404
+    if not thread.can_read(id_author):
+        return jsonify({"error": "You cannot post in this thread"}), 403
+    # Les fichiers sont envoyés par /api/uploads : le client ne donne que les IDs des envois terminés
+    upload_ids = data.pop("medias", [])
+    try:
+        medias = Upload.completed(upload_ids, id_author)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    post = Post(id_thread=thread._id, id_author=ObjectId(id_author), **data)
+    for media in medias:
+        post.add_media(media)
     post.save()
+    Upload.discard(upload_ids)
     return jsonify(post.__dict__), 201
 
 @post_bp.route("/posts/<post_id>", methods=["DELETE"])
@@ -24,3 +49,20 @@ def delete_post(post_id):
         return jsonify({"message": "Post deleted successfully"}), 200
     else:
         return jsonify({"error": "Post not found"}), 404
+
+@post_bp.route("/posts/<post_id>/like", methods=["PUT"])
+@jwt_required()
+def like_post(post_id):
+    # Idempotent : liker deux fois ne change rien
+    if not isobjectid(post_id) or not Post.exists(post_id):
+        return jsonify({"error": "Post not found"}), 404
+    changed = Like.like("posts", post_id, get_jwt_identity())
+    return jsonify({"liked": True, "changed": changed}), 200
+
+@post_bp.route("/posts/<post_id>/like", methods=["DELETE"])
+@jwt_required()
+def unlike_post(post_id):
+    if not isobjectid(post_id) or not Post.exists(post_id):
+        return jsonify({"error": "Post not found"}), 404
+    changed = Like.unlike("posts", post_id, get_jwt_identity())
+    return jsonify({"liked": False, "changed": changed}), 200
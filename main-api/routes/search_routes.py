@@ -0,0 +1,41 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from ..models.role import Role
+from ..utils.search import search
+from .. import logger
+
+search_bp = Blueprint("search_bp", __name__, url_prefix="/api")
+
+@search_bp.route("/search", methods=["GET"])
+@jwt_required(optional=True)
+def search_all():
+    current_user_id = get_jwt_identity()
+    query = request.args.get("q", "").strip()
+    logger.info(f"GET /search?q={query} - Current user ID: {current_user_id}")
+    if not query:
+        return jsonify({"error": "Missing query"}), 400
+    # type=users,posts : restreint la recherche à certaines collections
+    kinds = [kind for kind in request.args.get("type", "").split(",") if kind] or None
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    try:
+        results, next_cursor = search.search(query, current_user_id, kinds, limit=limit, cursor=request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Rôles des utilisateurs trouvés chargés en une requête pour les DTO
+    roles, _ = Role.get_by_ids(list({obj.id_role for hit, obj in results if hit.kind == "users"}))
+    roles = {role._id: role for role in roles}
+    items = [{
+        "type": hit.kind,
+        "id": str(hit.id),
+        "score": hit.score,
+        "item": obj.to_dto(role=roles.get(obj.id_role)).model_dump() if hit.kind == "users" else obj.__dict__,
+    } for hit, obj in results]
+    # Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor
+    response = jsonify(items)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
@@ -0,0 +1,39 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from ..dtos.user_dto import PublicUserDTO
+from ..models.suggestion import Suggestion
+from ..models.user import User
+from ..models.role import Role
+from ..models.thread import Thread
+from .. import logger
+
+suggestion_bp = Blueprint("suggestion_bp", __name__, url_prefix="/api")
+
+@suggestion_bp.route("/users/suggested", methods=["GET"])
+@jwt_required()
+def get_suggested_users():
+    current_user_id = get_jwt_identity()
+    logger.info(f"GET /users/suggested - Current user ID: {current_user_id}")
+    # Résultats précalculés par `suggestions compute` : une lecture, puis les utilisateurs en une requête
+    suggestion = Suggestion.get(current_user_id)
+    if not suggestion or not suggestion.users:
+        return jsonify([]), 200
+    users, _ = User.get_by_ids([entry["_id"] for entry in suggestion.users], projection=User.projection(PublicUserDTO))
+    roles, _ = Role.get_by_ids(list({user.id_role for user in users}))
+    roles = {role._id: role for role in roles}
+    dtos = {user._id: user.to_dto(role=roles.get(user.id_role)).model_dump() for user in users}
+    return jsonify([{**dtos[entry["_id"]], "score": entry["score"]} for entry in suggestion.users if entry["_id"] in dtos]), 200
+
+@suggestion_bp.route("/threads/suggested", methods=["GET"])
+@jwt_required()
+def get_suggested_threads():
+    current_user_id = get_jwt_identity()
+    logger.info(f"GET /threads/suggested - Current user ID: {current_user_id}")
+    suggestion = Suggestion.get(current_user_id)
+    if not suggestion or not suggestion.threads:
+        return jsonify([]), 200
+    threads, _ = Thread.get_by_ids([entry["_id"] for entry in suggestion.threads])
+    # Un fil devenu privé depuis le calcul n'est plus suggéré
+    by_id = {thread._id: thread for thread in threads if thread.public}
+    return jsonify([{**by_id[entry["_id"]].__dict__, "score": entry["score"]}
+                    for entry in suggestion.threads if entry["_id"] in by_id]), 200
@@ -1,8 +1,11 @@
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from flask import Blueprint, request, jsonify
 from ..models.thread import Thread
+from ..models.membership import Membership
 from bson import ObjectId
 from ..models.user import User
+from ..models.post import Post
+from ..utils.streaming import wants_ndjson, ndjson_response
 from .. import logger
 
 thread_bp = Blueprint("thread_bp", __name__)
@@ -13,13 +16,78 @@ def get_thread(thread_id):
     current_user_id = get_jwt_identity()
     thread = Thread.get_by_id(ObjectId(thread_id))
     
-    if thread and (thread.public or current_user_id in thread.members or current_user_id in thread.moderators):
+    if thread and thread.can_read(current_user_id):
         return jsonify(thread.__dict__), 200
     else:
         return jsonify({"error": "Thread not found or access denied"}), 404
 
+@thread_bp.route("/threads/<thread_id>/posts", methods=["GET"])
+@jwt_required(optional=True)
+def get_thread_posts(thread_id):
+    current_user_id = get_jwt_identity()
+    thread = Thread.get_by_id(ObjectId(thread_id))
+
+    if not thread or not thread.can_read(current_user_id):
+        return jsonify({"error": "Thread not found or access denied"}), 404
+
+    # Mode streaming (NDJSON) : tous les posts du fil, lus par lots depuis le curseur MongoDB
+    if wants_ndjson():
+        return ndjson_response(Post.stream(id_thread=thread._id), lambda post: post.__dict__)
+
+    try:
+        limit = min(max(int(request.args.get("limit", 30)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    try:
+        posts, next_cursor = thread.get_posts(limit=limit, cursor=request.args.get("cursor"))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    response = jsonify([post.__dict__ for post in posts])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
+@thread_bp.route("/threads/<thread_id>/members", methods=["GET"])
+@jwt_required(optional=True)
+def get_thread_members(thread_id):
+    """Members of a thread, paged (`?role=moderator` for the moderators only)."""
+    current_user_id = get_jwt_identity()
+    thread = Thread.get_by_id(ObjectId(thread_id))
+
+    if not thread or not thread.can_read(current_user_id):
+        return jsonify({"error": "Thread not found or access denied"}), 404
+
+    try:
+        limit = min(max(int(request.args.get("limit", 30)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    try:
+        memberships, next_cursor = Membership.page(thread._id, request.args.get("role"), limit=limit, cursor=request.args.get("cursor"))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+    response = jsonify([{"id_user": str(m.id_user), "role": m.role, "date": m.date} for m in memberships])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
+@thread_bp.route("/threads", methods=["GET"])
+def list_threads():
+    """Public threads, most recently active first (`?sort=recent`) or with the most posts (`?sort=posts`)."""
+    try:
+        limit = min(max(int(request.args.get("limit", 30)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    try:
+        threads, next_cursor = Thread.most_active(limit=limit, cursor=request.args.get("cursor"), by=request.args.get("sort", "recent"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response = jsonify([thread.__dict__ for thread in threads])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
+
 @thread_bp.route("/threads", methods=["POST"])
-@jwt_required
+@jwt_required()
 def create_thread():
     current_user_id = get_jwt_identity()
     try:
@@ -33,14 +101,14 @@ def create_thread():
         return jsonify({"error": "Invalid input or server error"}), 400
 
 @thread_bp.route("/threads/<thread_id>", methods=["DELETE"])
-@jwt_required
+@jwt_required()
 def delete_thread(thread_id):
     current_user_id = get_jwt_identity()
     current_user = User.get_by_id(current_user_id)
     thread = Thread.get_by_id(ObjectId(thread_id))
 
     if thread:
-        if current_user_id != thread.id_owner and current_user.get_role().name != "admin":
+        if thread.role_of(current_user_id) != "owner" and current_user.get_role().name != "admin":
             return jsonify({"error": "Unauthorized access"}), 403
         thread.delete()
         return jsonify({"message": "Thread deleted successfully"}), 200
@@ -48,7 +116,7 @@ def delete_thread(thread_id):
         return jsonify({"error": "Thread not found"}), 404
 
 @thread_bp.route("/threads/<thread_id>", methods=["PUT"])
-@jwt_required
+@jwt_required()
 def update_thread(thread_id):
     current_user_id = get_jwt_identity()
     current_user = User.get_by_id(current_user_id)
@@ -57,7 +125,7 @@ def update_thread(thread_id):
     if not thread:
         return jsonify({"error": "Thread not found"}), 404
 
-    if current_user_id != thread.id_owner and current_user_id not in thread.moderators and current_user.get_role().name != "admin":
+    if not thread.can_moderate(current_user_id) and current_user.get_role().name != "admin":
         return jsonify({"error": "Unauthorized access"}), 403
 
     try:
@@ -69,7 +137,7 @@ def update_thread(thread_id):
         return jsonify({"error": "Invalid input or server error"}), 400
 
 @thread_bp.route("/threads/<thread_id>/members", methods=["POST"])
-@jwt_required
+@jwt_required()
 def add_member(thread_id):
     current_user_id = get_jwt_identity()
     thread = Thread.get_by_id(ObjectId(thread_id))
@@ -77,7 +145,7 @@ def add_member(thread_id):
     if not thread:
         return jsonify({"error": "Thread not found"}), 404
 
-    if current_user_id != thread.id_owner and current_user_id not in thread.moderators:
+    if not thread.can_moderate(current_user_id):
         return jsonify({"error": "Unauthorized access"}), 403
 
     try:
@@ -92,7 +160,7 @@ def add_member(thread_id):
         return jsonify({"error": "Invalid input or server error"}), 400
 
 @thread_bp.route("/threads/<thread_id>/members", methods=["DELETE"])
-@jwt_required
+@jwt_required()
 def remove_member(thread_id):
     current_user_id = get_jwt_identity()
     thread = Thread.get_by_id(ObjectId(thread_id))
@@ -100,7 +168,7 @@ def remove_member(thread_id):
     if not thread:
         return jsonify({"error": "Thread not found"}), 404
 
-    if current_user_id != thread.id_owner and current_user_id not in thread.moderators:
+    if not thread.can_moderate(current_user_id):
         return jsonify({"error": "Unauthorized access"}), 403
 
     try:
@@ -115,7 +183,7 @@ def remove_member(thread_id):
         return jsonify({"error": "Invalid input or server error"}), 400
 
 @thread_bp.route("/threads/<thread_id>/moderators", methods=["POST"])
-@jwt_required
+@jwt_required()
 def add_moderator(thread_id):
     current_user_id = get_jwt_identity()
     thread = Thread.get_by_id(ObjectId(thread_id))
@@ -123,7 +191,7 @@ def add_moderator(thread_id):
     if not thread:
         return jsonify({"error": "Thread not found"}), 404
 
-    if current_user_id != thread.id_owner:
+    if thread.role_of(current_user_id) != "owner":
         return jsonify({"error": "Unauthorized access"}), 403
 
     try:
@@ -138,7 +206,7 @@ def add_moderator(thread_id):
         return jsonify({"error": "Invalid input or server error"}), 400
 
 @thread_bp.route("/threads/<thread_id>/moderators", methods=["DELETE"])
-@jwt_required
+@jwt_required()
 def remove_moderator(thread_id):
     current_user_id = get_jwt_identity()
     thread = Thread.get_by_id(ObjectId(thread_id))
@@ -146,7 +214,7 @@ def remove_moderator(thread_id):
     if not thread:
         return jsonify({"error": "Thread not found"}), 404
 
-    if current_user_id != thread.id_owner:
+    if thread.role_of(current_user_id) != "owner":
         return jsonify({"error": "Unauthorized access"}), 403
 
     try:
@@ -0,0 +1,20 @@
+from flask import Blueprint, request, jsonify
+from ..models.trending import TrendingSnapshot
+from .. import logger
+
+trending_bp = Blueprint("trending_bp", __name__, url_prefix="/api")
+
+@trending_bp.route("/keys/trending", methods=["GET"])
+def get_trending_keys():
+    window = request.args.get("window", "24h")
+    logger.info(f"GET /keys/trending?window={window}")
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "Invalid limit"}), 400
+    try:
+        # Lu depuis l'instantané précalculé, jamais agrégé à la requête
+        keys = TrendingSnapshot.top(window, limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify([{**key, "id_key": str(key["id_key"])} for key in keys]), 200
@@ -0,0 +1,87 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from ..models.upload import Upload
+from ..utils.config import Config
+from ..utils.helpers import isobjectid
+from ..utils.uploads import UploadError
+from .. import logger
+import re
+
+upload_bp = Blueprint("upload_bp", __name__, url_prefix="/api")
+
+_CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+def _get_own_upload(upload_id):
+    upload = Upload.get_by_id(upload_id) if isobjectid(upload_id) else None
+    if upload and str(upload.id_user) == get_jwt_identity():
+        return upload
+    return None
+
+def _state(upload: Upload) -> dict:
+    return {"id": str(upload._id), "kind": upload.kind, "length": upload.length, "received": upload.received,
+            "chunk_size": Config.UPLOAD_MAX_CHUNK}
+
+@upload_bp.route("/uploads", methods=["POST"])
+@jwt_required()
+def create_upload():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get("length"), int) or data["length"] <= 0:
+        return jsonify({"error": "A positive length is required"}), 400
+    try:
+        upload = Upload.create(get_jwt_identity(), data.get("kind", "media"), data["length"])
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    logger.info(f"Upload session {upload._id} created - {upload.length} bytes")
+    return jsonify(_state(upload)), 201
+
+@upload_bp.route("/uploads/<upload_id>", methods=["GET"])
+@jwt_required()
+def get_upload(upload_id):
+    # Permet au client de reprendre un envoi interrompu à partir de `received`
+    upload = _get_own_upload(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(_state(upload)), 200
+
+@upload_bp.route("/uploads/<upload_id>", methods=["PUT"])
+@jwt_required()
+def put_upload_chunk(upload_id):
+    """Store one range, sent as the raw body with `Content-Range: bytes <start>-<end>/<length>`."""
+    upload = _get_own_upload(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    match = _CONTENT_RANGE.match(request.headers.get("Content-Range", ""))
+    if not match:
+        return jsonify({"error": "Content-Range header required"}), 400
+    start, end, length = map(int, match.groups())
+    if length != upload.length or end < start or end >= length:
+        return jsonify({"error": "Invalid range"}), 416
+    if end - start + 1 > Config.UPLOAD_MAX_CHUNK or (request.content_length or 0) > end - start + 1:
+        return jsonify({"error": f"Chunks are limited to {Config.UPLOAD_MAX_CHUNK} bytes"}), 413
+    if start != upload.received:
+        return jsonify({"error": "Unexpected range, resume from the received offset", **_state(upload)}), 409
+
+    try:
+        # Le corps est lu par blocs directement depuis le flux WSGI, sans passer par request.files
+        upload.append(request.stream, start)
+        if not upload.is_complete():
+            return jsonify(_state(upload)), 202
+        media = upload.complete()
+    except UploadError as e:
+        logger.error(f"Upload {upload_id} rejected: {e}")
+        return jsonify({"error": str(e)}), e.status
+    if media is None:
+        logger.info(f"Upload {upload_id} complete - profile picture of {upload.id_user}")
+        return jsonify({**_state(upload), "message": "Profile picture is being processed"}), 201
+    logger.info(f"Upload {upload_id} complete - {media.path}")
+    # L'ID de l'envoi est à donner dans `medias` à la création du post ou du commentaire
+    return jsonify({**_state(upload), "media": media.to_document()}), 201
+
+@upload_bp.route("/uploads/<upload_id>", methods=["DELETE"])
+@jwt_required()
+def delete_upload(upload_id):
+    upload = _get_own_upload(upload_id)
+    if not upload:
+        return jsonify({"error": "Upload not found"}), 404
+    upload.delete()
+    return jsonify({"message": "Upload cancelled"}), 200
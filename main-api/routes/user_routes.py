@@ -1,8 +1,15 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, Response, current_app, redirect, request, jsonify, send_from_directory, url_for
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from pydantic import ValidationError
-from dtos.user_dto import PrivateUserDTO
-from models.user import User
+from ..dtos.user_dto import PrivateUserDTO, PublicUserDTO
+from ..models.user import User
+from ..utils.helpers import isobjectid
+from ..utils.streaming import wants_ndjson, ndjson_response
+from ..utils.passwords import PasswordPoolSaturated
+from ..utils.ratelimit import limiter
+from ..utils.uploads import UploadError
+from ..utils.config import Config
+from ..utils import images
 from bson import ObjectId
 from .. import logger
 import os
@@ -14,7 +21,8 @@ user_bp = Blueprint("user_bp", __name__, url_prefix="/api")
 def get_user(user_id):
     current_user_id = get_jwt_identity()
     logger.info(f"GET /user/{user_id} - Current user ID: {current_user_id}")
-    user = User.get_by_id(user_id)
+    # Seuls les champs du DTO sont lus (le hash du mot de passe n'est jamais chargé)
+    user = User.get_by_id(user_id, projection=User.projection(PrivateUserDTO))
     if user:
         if str(user._id) == current_user_id or user.get_role().name != 'admin':
             user_dto = user.to_dto(private=True)
@@ -27,6 +35,7 @@ def get_user(user_id):
         return jsonify({"error": "User not found"}), 404
 
 @user_bp.route("/register", methods=["POST"])
+@limiter.limit("register", email_field="email")
 def create_user():
     # Gestion des erreurs pour le format de la donnée reçue
     try:
@@ -38,14 +47,15 @@ def create_user():
         user_data = PrivateUserDTO(**data)
         user = User(password=data["password"], **user_data.model_dump())
 
-        # Gestion de l'upload de fichiers
+        # Gestion de l'upload de fichiers : le corps multipart est déjà mis en tampon par werkzeug,
+        # seul MAX_CONTENT_LENGTH le borne (les envois reprenables de type "pp" vérifient la taille avant)
         if len(request.files):
             pp_file = request.files[next(request.files.keys())]
             try:
-                user.set_pp(user_bp.config['UPLOAD_FOLDER'], pp_file)
-            except ValueError as e:
-                logger.error("Invalid file format to new user's pp.")
-                return jsonify({"error": "Invalid file format"}), 400
+                user.set_pp(current_app.config['UPLOAD_FOLDER'], pp_file)
+            except UploadError as e:
+                logger.error(f"Profile picture rejected: {e}")
+                return jsonify({"error": str(e)}), e.status
 
         user.save()
         logger.info(f"User created successfully - ID: {user._id}")
@@ -53,6 +63,9 @@ def create_user():
     except ValidationError as e:
         logger.error(f"Validation error: {e}")
         return jsonify({"error": "Invalid data", "details": e.errors()}), 400
+    except PasswordPoolSaturated:
+        logger.warning("Registration rejected: password pool saturated")
+        return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": "1"}
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         return jsonify({"error": "Something went wrong"}), 500
@@ -91,14 +104,14 @@ def update_user(user_id):
                         if "password" not in data else
                         {**user_data.model_dump(), "password": data["password"]})
 
-            # Gestion de l'upload de fichiers
+            # Gestion de l'upload de fichiers (multipart, borné par MAX_CONTENT_LENGTH)
             if len(request.files):
                 pp_file = request.files[next(request.files.keys())]
                 try:
-                    user.set_pp(user_bp.config['UPLOAD_FOLDER'], pp_file)
-                except ValueError as e:
-                    logger.error("Invalid file format to new user's pp.")
-                    return jsonify({"error": "Invalid file format"}), 400
+                    user.set_pp(current_app.config['UPLOAD_FOLDER'], pp_file)
+                except UploadError as e:
+                    logger.error(f"Profile picture rejected: {e}")
+                    return jsonify({"error": str(e)}), e.status
 
             logger.info(f"User {user_id} updated successfully")
             return jsonify({"message": "User updated successfully"}), 200
@@ -106,6 +119,9 @@ def update_user(user_id):
             logger.error(f"User {user_id} not found")
             return jsonify({"error": "User not found"}), 404
 
+    except PasswordPoolSaturated:
+        logger.warning("Update rejected: password pool saturated")
+        return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": "1"}
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
         return jsonify({"error": "Something went wrong"}), 500
@@ -133,13 +149,19 @@ def delete_user(user_id):
 @user_bp.route("/user/<user_id>/followed", methods=["GET"])
 def get_followed_users(user_id):
     logger.info(f"GET /user/{user_id}/followed")
-    user = User.get_by_id(user_id)
+    user = User.get_by_id(user_id, projection={"followed": 1})
     if not user:
         logger.error(f"User {user_id} not found")
         return jsonify({"error": "User not found"}), 404
 
-    # Récupération des utilisateurs suivis
-    followed_users = user.get_followed()
+    # Mode streaming (NDJSON) : les utilisateurs suivis sont chargés par lots
+    if wants_ndjson():
+        logger.info(f"Streaming followed users of user {user_id} as NDJSON")
+        return ndjson_response(User.stream_by_ids(user.followed, projection=User.projection(PublicUserDTO)),
+                               lambda followed_user: followed_user.to_dto().model_dump())
+
+    # Récupération des utilisateurs suivis (uniquement les champs du DTO public)
+    followed_users = user.get_followed(projection=User.projection(PublicUserDTO))
 
     # Conversion en DTO pour chaque utilisateur suivi (en public DTO par défaut)
     followed_dtos = [followed_user.to_dto().model_dump() for followed_user in followed_users]
@@ -152,23 +174,20 @@ def get_followed_users(user_id):
 def follow_user(user_id):
     current_user_id = get_jwt_identity()
     logger.info(f"POST /user/{user_id}/follow - Current user ID: {current_user_id}")
-    current_user = User.get_by_id(current_user_id)
-    target_user = User.get_by_id(user_id)
 
-    # Vérification de l'existence des utilisateurs
-    if not current_user:
-        logger.error(f"Current user not found - ID: {current_user_id}")
-        return jsonify({"error": "Current user not found"}), 404
-    if not target_user:
+    # Vérification de l'existence de l'utilisateur cible (comptage sur l'index _id, sans charger le document)
+    if not isobjectid(user_id) or not User.exists(user_id):
         logger.error(f"Target user not found - ID: {user_id}")
         return jsonify({"error": "Target user not found"}), 404
 
-    # Ajouter l'utilisateur cible dans la liste des suivis s'il n'est pas déjà suivi
-    if user_id not in [str(f) for f in current_user.followed]:
-        current_user.followed.append(target_user._id)
-        current_user.save()
+    # Ajouter l'utilisateur cible dans la liste des suivis (une seule mise à jour conditionnelle)
+    changed = User.follow(current_user_id, user_id)
+    if changed is None:
+        logger.error(f"Current user not found - ID: {current_user_id}")
+        return jsonify({"error": "Current user not found"}), 404
+    if changed:
         logger.info(f"User {current_user_id} is now following user {user_id}")
-        return jsonify({"message": f"You are now following {target_user.username}"}), 200
+        return jsonify({"message": "You are now following this user"}), 200
     else:
         logger.info(f"User {current_user_id} is already following user {user_id}")
         return jsonify({"message": "You are already following this user"}), 400
@@ -178,23 +197,20 @@ def follow_user(user_id):
 def unfollow_user(user_id):
     current_user_id = get_jwt_identity()
     logger.info(f"POST /user/{user_id}/unfollow - Current user ID: {current_user_id}")
-    current_user = User.get_by_id(current_user_id)
-    target_user = User.get_by_id(user_id)
 
-    # Vérification de l'existence des utilisateurs
-    if not current_user:
-        logger.error(f"Current user not found - ID: {current_user_id}")
-        return jsonify({"error": "Current user not found"}), 404
-    if not target_user:
+    # Vérification de l'existence de l'utilisateur cible (comptage sur l'index _id, sans charger le document)
+    if not isobjectid(user_id) or not User.exists(user_id):
         logger.error(f"Target user not found - ID: {user_id}")
         return jsonify({"error": "Target user not found"}), 404
 
-    # Supprimer l'utilisateur cible de la liste des suivis s'il est suivi
-    if user_id in [str(f) for f in current_user.followed]:
-        current_user.followed = [f for f in current_user.followed if str(f) != user_id]
-        current_user.save()
+    # Supprimer l'utilisateur cible de la liste des suivis (une seule mise à jour conditionnelle)
+    changed = User.unfollow(current_user_id, user_id)
+    if changed is None:
+        logger.error(f"Current user not found - ID: {current_user_id}")
+        return jsonify({"error": "Current user not found"}), 404
+    if changed:
         logger.info(f"User {current_user_id} has unfollowed user {user_id}")
-        return jsonify({"message": f"You have unfollowed {target_user.username}"}), 200
+        return jsonify({"message": "You have unfollowed this user"}), 200
     else:
         logger.info(f"User {current_user_id} is not following user {user_id}")
         return jsonify({"message": "You are not following this user"}), 400
@@ -204,23 +220,20 @@ def unfollow_user(user_id):
 def block_user(user_id):
     current_user_id = get_jwt_identity()
     logger.info(f"POST /user/{user_id}/block - Current user ID: {current_user_id}")
-    current_user = User.get_by_id(current_user_id)
-    target_user = User.get_by_id(user_id)
 
-    # Vérification de l'existence des utilisateurs
-    if not current_user:
-        logger.error(f"Current user not found - ID: {current_user_id}")
-        return jsonify({"error": "Current user not found"}), 404
-    if not target_user:
+    # Vérification de l'existence de l'utilisateur cible (comptage sur l'index _id, sans charger le document)
+    if not isobjectid(user_id) or not User.exists(user_id):
         logger.error(f"Target user not found - ID: {user_id}")
         return jsonify({"error": "Target user not found"}), 404
 
-    # Ajouter l'utilisateur cible dans la liste des bloqués s'il n'est pas déjà bloqué
-    if user_id not in [str(b) for b in current_user.blocked]:
-        current_user.blocked.append(target_user._id)
-        current_user.save()
+    # Ajouter l'utilisateur cible dans la liste des bloqués (une seule mise à jour conditionnelle)
+    changed = User.block(current_user_id, user_id)
+    if changed is None:
+        logger.error(f"Current user not found - ID: {current_user_id}")
+        return jsonify({"error": "Current user not found"}), 404
+    if changed:
         logger.info(f"User {current_user_id} has blocked user {user_id}")
-        return jsonify({"message": f"You have blocked {target_user.username}"}), 200
+        return jsonify({"message": "You have blocked this user"}), 200
     else:
         logger.info(f"User {current_user_id} is already blocking user {user_id}")
         return jsonify({"message": "This user is already blocked"}), 400
@@ -230,23 +243,20 @@ def block_user(user_id):
 def unblock_user(user_id):
     current_user_id = get_jwt_identity()
     logger.info(f"POST /user/{user_id}/unblock - Current user ID: {current_user_id}")
-    current_user = User.get_by_id(current_user_id)
-    target_user = User.get_by_id(user_id)
 
-    # Vérification de l'existence des utilisateurs
-    if not current_user:
-        logger.error(f"Current user not found - ID: {current_user_id}")
-        return jsonify({"error": "Current user not found"}), 404
-    if not target_user:
+    # Vérification de l'existence de l'utilisateur cible (comptage sur l'index _id, sans charger le document)
+    if not isobjectid(user_id) or not User.exists(user_id):
         logger.error(f"Target user not found - ID: {user_id}")
         return jsonify({"error": "Target user not found"}), 404
 
-    # Supprimer l'utilisateur cible de la liste des bloqués s'il est bloqué
-    if user_id in [str(b) for b in current_user.blocked]:
-        current_user.blocked = [b for b in current_user.blocked if str(b) != user_id]
-        current_user.save()
+    # Supprimer l'utilisateur cible de la liste des bloqués (une seule mise à jour conditionnelle)
+    changed = User.unblock(current_user_id, user_id)
+    if changed is None:
+        logger.error(f"Current user not found - ID: {current_user_id}")
+        return jsonify({"error": "Current user not found"}), 404
+    if changed:
         logger.info(f"User {current_user_id} has unblocked user {user_id}")
-        return jsonify({"message": f"You have unblocked {target_user.username}"}), 200
+        return jsonify({"message": "You have unblocked this user"}), 200
     else:
         logger.info(f"User {current_user_id} is not blocking user {user_id}")
         return jsonify({"message": "This user is not in your blocked list"}), 400
@@ -255,33 +265,93 @@ def unblock_user(user_id):
 @jwt_required()
 def get_users():
     logger.info("POST /users - Retrieving users")
-    # Obtenir les filtres et la limite depuis le corps de la requête
+    # Obtenir les filtres, la limite et le curseur depuis le corps de la requête
     data = request.json or {}
-    filters = {k: v for k, v in data.items() if k != "limit"}
-    limit = int(data.get("limit", 30))  # Par défaut, on limite à 30 utilisateurs
-
-    # Obtenir les utilisateurs en appliquant les filtres avec la limite
-    users = User.all(limit=limit, **filters)
+    # Seuls les champs publics sont filtrables : jamais le mot de passe, l'email, etc.
+    try:
+        query = User.query({k: v for k, v in data.items() if k not in ("limit", "cursor")})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Identifier l'utilisateur actuel pour adapter la visibilité des informations
     current_user_id = get_jwt_identity()
     current_user = User.get_by_id(current_user_id)
+    is_admin = current_user.get_role().name == 'admin'
+
+    # Seuls les champs du DTO renvoyé sont lus ; l'utilisateur courant, déjà chargé, reçoit son DTO privé
+    projection = User.projection(PrivateUserDTO if is_admin else PublicUserDTO)
+
+    def serialize(user: User) -> dict:
+        if str(user._id) == current_user_id:
+            return current_user.to_dto(private=True).model_dump()
+        return user.to_dto(private=is_admin).model_dump()
+
+    # Mode streaming (NDJSON) : pas de limite par défaut (0), les utilisateurs sont lus par lots
+    streaming = wants_ndjson()
+    try:
+        limit = max(int(data.get("limit", 0)), 0) if streaming else min(max(int(data.get("limit", 30)), 1), 100)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid limit"}), 400
+    if streaming:
+        logger.info("Streaming users as NDJSON")
+        return ndjson_response(User.stream(limit=limit, projection=projection, query=query), serialize)
+
+    # Obtenir une page d'utilisateurs (pagination par curseur, ordre stable sur _id)
+    try:
+        users, next_cursor = User.page(limit=limit, cursor=data.get("cursor"), projection=projection, query=query)
+    except ValueError:
+        logger.error("Invalid pagination cursor")
+        return jsonify({"error": "Invalid cursor"}), 400
 
     # Renvoyer une liste avec les DTOs publics ou privés en fonction de l'utilisateur courant
+    # Le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor
     logger.info(f"Users retrieved successfully - Count: {len(users)}")
-    return jsonify([
-        user.to_dto(
-            private = (
-                current_user.get_role().name == 'admin' or str(user._id) == current_user_id
-            )
-        ).model_dump()
-        for user in users
-    ]), 200
+    response = jsonify([serialize(user) for user in users])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response, 200
 
 @user_bp.route('/user/<user_id>/pp', methods=['GET'])
 def get_pp(user_id):
-    user = User.get_by_id(ObjectId(user_id))
-    if user and user.pp:
-        return send_from_directory(user_bp.config['UPLOAD_FOLDER'], os.path.basename(user.pp))
+    user = User.get_by_id(ObjectId(user_id), projection={"pp": 1}) if isobjectid(user_id) else None
+    # Chargement partiel : un utilisateur sans photo n'a pas le champ
+    pp = user.__dict__.get("pp") if user else None
+    if pp and images.is_digest(pp):
+        # Variante redimensionnée : ?size=64|256|1024, WebP si le client l'accepte
+        size = request.args.get("size", Config.PP_DEFAULT_SIZE, type=int)
+        if size not in Config.PP_SIZES:
+            return jsonify({"error": "Invalid size"}), 400
+        ext = "webp" if "image/webp" in request.headers.get("Accept", "") else "jpg"
+        # Redirection courte vers l'URL immuable, qui elle est mise en cache durablement
+        response = redirect(url_for("user_bp.get_pp_file", filename=images.variant_name(pp, size, ext)))
+        response.headers["Cache-Control"] = f"public, max-age={Config.PP_REDIRECT_MAX_AGE}"
+        response.headers["Vary"] = "Accept"
+        return response
+    elif pp:
+        return send_from_directory(current_app.config['UPLOAD_FOLDER'], os.path.basename(pp))
     else:
         return jsonify({"error": "Profile picture not found"}), 404
+
+@user_bp.route('/pp/<filename>', methods=['GET'])
+def get_pp_file(filename):
+    # Le nom contient le hash du contenu : le fichier ne change jamais et MongoDB n'est pas consulté
+    if not images.is_variant_name(filename):
+        return jsonify({"error": "Profile picture not found"}), 404
+    headers = {"Cache-Control": f"public, max-age={Config.PP_MAX_AGE}, immutable", "ETag": f'"{filename}"'}
+    if request.if_none_match.contains(filename):
+        return Response(status=304, headers=headers)
+
+    folder = current_app.config['UPLOAD_FOLDER']
+    path = os.path.join(folder, filename)
+    if not os.path.isfile(path):
+        return jsonify({"error": "Profile picture not found"}), 404
+    mimetype = images.MIMETYPES[filename.rsplit(".", 1)[1]]
+    if Config.PP_SENDFILE == "x-accel":
+        # nginx sert lui-même le fichier depuis son emplacement interne
+        response = Response(mimetype=mimetype, headers={"X-Accel-Redirect": Config.PP_ACCEL_PREFIX + filename})
+    elif Config.PP_SENDFILE == "x-sendfile":
+        response = Response(mimetype=mimetype, headers={"X-Sendfile": os.path.abspath(path)})
+    else:
+        response = send_from_directory(folder, filename, mimetype=mimetype, etag=False, conditional=False)
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,49 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+
+class BackgroundPool:
+    """
+    Small thread pool running deferred work (writes nobody waits for) off the request threads.
+
+    Created on first use, recreated in forked workers; `pending` and `failed` are exposed by `stats()`.
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # Les threads du pool ne survivent pas au fork
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.failed = 0
+
+    def submit(self, fn: Callable, *args) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            self.pending += 1
+
+        def run():
+            try:
+                return fn(*args)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.pending -= 1
+
+        return self._executor.submit(run)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "pending": self.pending, "failed": self.failed}
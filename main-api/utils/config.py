@@ -7,4 +7,92 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY')
     MEDIA_PATH = os.getenv('MEDIA_PATH') or 'media'
     TOKEN_EXPIRES = int(os.getenv('TOKEN_EXPIRES')) or 3600
-    
\ No newline at end of file
+
+    # MongoDB (un seul client partagé par processus)
+    MONGO_URI = os.getenv('MONGO_URI') or 'mongodb://localhost:27017/'
+    MONGO_DB = os.getenv('MONGO_DB') or 'watif_db'
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE') or 50)
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE') or 0)
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS') or 60000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS') or 2000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS') or 5000)
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS') or 5000)
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS') or 10000)
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS') or ''  # ex: "zstd,snappy,zlib"
+
+    # Taille des lots lus depuis MongoDB pour les réponses en streaming
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE') or 500)
+
+    # Hachage des mots de passe (bcrypt) sur un pool de threads borné
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS') or 12)
+    PASSWORD_POOL_WORKERS = int(os.getenv('PASSWORD_POOL_WORKERS') or 2)
+    PASSWORD_POOL_MAX_QUEUE = int(os.getenv('PASSWORD_POOL_MAX_QUEUE') or 32)
+    PASSWORD_POOL_TIMEOUT = float(os.getenv('PASSWORD_POOL_TIMEOUT') or 10)
+
+    # Limitation des tentatives sur /login et /api/register ("<requêtes>/<secondes>")
+    RATE_LIMIT_STORAGE_URL = os.getenv('RATE_LIMIT_STORAGE_URL') or ''  # vide : en mémoire, ex: "redis://localhost:6379/0"
+    RATE_LIMITS = {
+        "login": {
+            "ip": os.getenv('LOGIN_RATE_LIMIT_IP') or '20/60',
+            "email": os.getenv('LOGIN_RATE_LIMIT_EMAIL') or '5/300',
+        },
+        "register": {
+            "ip": os.getenv('REGISTER_RATE_LIMIT_IP') or '5/600',
+            "email": os.getenv('REGISTER_RATE_LIMIT_EMAIL') or '3/3600',
+        },
+    }
+
+    # Photos de profil : tailles générées (carrés, en pixels) et pool de traitement en arrière-plan
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER') or os.path.join('static', 'profile_pics')
+    PP_SIZES = [int(size) for size in (os.getenv('PP_SIZES') or '64,256,1024').split(',')]
+    PP_DEFAULT_SIZE = int(os.getenv('PP_DEFAULT_SIZE') or 256)
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS') or 2)
+    IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS') or 40_000_000)  # protection contre les "decompression bombs"
+
+    # Diffusion des photos de profil : URLs immuables (hash du contenu) mises en cache longtemps
+    PP_MAX_AGE = int(os.getenv('PP_MAX_AGE') or 31536000)
+    PP_REDIRECT_MAX_AGE = int(os.getenv('PP_REDIRECT_MAX_AGE') or 60)
+    PP_SENDFILE = (os.getenv('PP_SENDFILE') or '').lower()  # vide, "x-accel" (nginx) ou "x-sendfile" (Apache, lighttpd)
+    PP_ACCEL_PREFIX = os.getenv('PP_ACCEL_PREFIX') or '/protected/profile_pics/'
+
+    # Envois de fichiers : limites en octets par type, lus par blocs, reprise des gros envois par plages
+    UPLOAD_LIMITS = {
+        "pp": int(os.getenv('UPLOAD_LIMIT_PP') or 5 * 1024 * 1024),
+        "media": int(os.getenv('UPLOAD_LIMIT_MEDIA') or 200 * 1024 * 1024),
+    }
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE') or 64 * 1024)
+    UPLOAD_MAX_CHUNK = int(os.getenv('UPLOAD_MAX_CHUNK') or 8 * 1024 * 1024)  # taille maximale d'une plage (PUT /api/uploads/<id>)
+    UPLOAD_TMP_DIR = os.getenv('UPLOAD_TMP_DIR') or os.path.join(MEDIA_PATH, '.uploads')
+    UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL') or 24 * 3600)
+
+    # Fil d'actualité : au-delà de FEED_FANOUT_MAX_FOLLOWERS abonnés (ou membres d'un fil), les posts
+    # ne sont plus copiés dans les timelines à l'écriture mais lus et fusionnés à la lecture
+    FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS') or 5000)
+    FEED_FANOUT_BATCH_SIZE = int(os.getenv('FEED_FANOUT_BATCH_SIZE') or 1000)
+    FEED_TIMELINE_SIZE = int(os.getenv('FEED_TIMELINE_SIZE') or 800)
+    FEED_FANOUT_WORKERS = int(os.getenv('FEED_FANOUT_WORKERS') or 2)  # threads poussant les nouveaux posts, hors requête
+
+    # Compteurs dénormalisés (like_count...) : incréments regroupés en mémoire puis écrits par lots
+    COUNTER_FLUSH_INTERVAL = float(os.getenv('COUNTER_FLUSH_INTERVAL') or 2)
+    COUNTER_MAX_PENDING = int(os.getenv('COUNTER_MAX_PENDING') or 1000)
+
+    # Contrôles d'accès aux fils : rôle (fil, utilisateur) gardé en cache dans chaque processus
+    THREAD_ACCESS_CACHE_TTL = float(os.getenv('THREAD_ACCESS_CACHE_TTL') or 5)
+    THREAD_ACCESS_CACHE_SIZE = int(os.getenv('THREAD_ACCESS_CACHE_SIZE') or 100000)
+
+    # Recherche : "mongo" (index texte) ou "memory" (index inversé par processus, préfixes et fautes de frappe)
+    SEARCH_BACKEND = (os.getenv('SEARCH_BACKEND') or 'mongo').lower()
+    SEARCH_REBUILD_INTERVAL = float(os.getenv('SEARCH_REBUILD_INTERVAL') or 600)  # relit les écritures des autres processus
+    SEARCH_MAX_EXPANSIONS = int(os.getenv('SEARCH_MAX_EXPANSIONS') or 50)  # termes retenus par préfixe
+
+    # Clés tendance : usages comptés par seaux de temps, top recalculé périodiquement dans un instantané
+    TRENDING_BUCKET_SECONDS = int(os.getenv('TRENDING_BUCKET_SECONDS') or 600)
+    TRENDING_TOP_K = int(os.getenv('TRENDING_TOP_K') or 100)
+    TRENDING_REFRESH_INTERVAL = int(os.getenv('TRENDING_REFRESH_INTERVAL') or 120)
+    TRENDING_CACHE_TTL = float(os.getenv('TRENDING_CACHE_TTL') or 15)
+
+    # Suggestions d'utilisateurs et de fils : calculées par lots (numpy/scipy), lues telles quelles
+    SUGGESTIONS_COUNT = int(os.getenv('SUGGESTIONS_COUNT') or 20)
+    SUGGESTIONS_CHUNK_SIZE = int(os.getenv('SUGGESTIONS_CHUNK_SIZE') or 1000)
+    SUGGESTIONS_INTEREST_WEIGHT = float(os.getenv('SUGGESTIONS_INTEREST_WEIGHT') or 0.5)
+    SUGGESTIONS_FOLLOW_WEIGHT = float(os.getenv('SUGGESTIONS_FOLLOW_WEIGHT') or 0.5)
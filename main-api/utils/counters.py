@@ -0,0 +1,123 @@
+import atexit
+import os
+import threading
+import time
+from collections import defaultdict
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from .config import Config
+from .database import get_database
+
+db = get_database()
+
+
+class CounterBuffer:
+    """
+    Accumulates `$inc` deltas in memory and writes them in batches with `bulk_write`.
+
+    A post liked a thousand times in a second costs one update per flush instead of a thousand
+    writes to the same document. Deltas are flushed when `max_pending` keys are waiting, every
+    `interval` seconds by a background thread, and at interpreter exit; counters read in between
+    may lag by up to `interval` seconds.
+
+    Methods:
+        incr(collection: str, obj_id: ObjectId, name: str, delta: int = 1, upsert: bool = False) -> None: Buffers an increment.
+        flush() -> int: Writes the pending deltas, returns the number of documents updated.
+        stats() -> dict: Returns the buffer metrics.
+    """
+
+    def __init__(self, interval: float, max_pending: int):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[str, ObjectId], dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._upserts: set[str] = set()  # collections dont les documents sont créés au premier incrément
+        self._thread = None
+        self._flushes = 0
+        self._flushed_docs = 0
+        self._last_flush = time.monotonic()
+
+    def incr(self, collection: str, obj_id: ObjectId, name: str, delta: int = 1, upsert: bool = False) -> None:
+        with self._lock:
+            self._pending[(collection, obj_id)][name] += delta
+            if upsert:
+                self._upserts.add(collection)
+            full = len(self._pending) >= self.max_pending
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="counters", daemon=True)
+                self._thread.start()
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write the pending deltas, one `bulk_write` per collection.
+
+        Deltas whose write failed are put back for the next flush: only the operations listed in the
+        `writeErrors` of a `BulkWriteError` (the others were applied), or every operation of the
+        collection for any other error. The first error is raised once every collection was tried.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+            self._last_flush = time.monotonic()
+        by_collection = defaultdict(list)
+        for (collection, obj_id), deltas in pending.items():
+            deltas = {name: delta for name, delta in deltas.items() if delta}
+            if deltas:
+                by_collection[collection].append((obj_id, deltas))
+        updated, error = 0, None
+        for collection, items in by_collection.items():
+            requests = [UpdateOne({"_id": obj_id}, {"$inc": deltas}, upsert=collection in self._upserts) for obj_id, deltas in items]
+            try:
+                db[collection].bulk_write(requests, ordered=False)
+                updated += len(requests)
+            except BulkWriteError as e:
+                failed = {write_error["index"] for write_error in e.details.get("writeErrors", [])}
+                self._requeue(collection, [items[i] for i in sorted(failed)])
+                updated += len(requests) - len(failed)
+                error = error or e
+            except Exception as e:
+                # Aucune information sur ce qui a été appliqué : toute la collection est remise en attente
+                self._requeue(collection, items)
+                error = error or e
+        with self._lock:
+            self._flushes += 1
+            self._flushed_docs += updated
+        if error is not None:
+            raise error
+        return updated
+
+    def _requeue(self, collection: str, items: list[tuple[ObjectId, dict[str, int]]]) -> None:
+        with self._lock:
+            for obj_id, deltas in items:
+                for name, delta in deltas.items():
+                    self._pending[(collection, obj_id)][name] += delta
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                pass  # MongoDB indisponible : nouvelle tentative au prochain intervalle
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "flushes": self._flushes,
+                "flushed_docs": self._flushed_docs,
+                "seconds_since_flush": time.monotonic() - self._last_flush,
+            }
+
+
+counters = CounterBuffer(interval=Config.COUNTER_FLUSH_INTERVAL, max_pending=Config.COUNTER_MAX_PENDING)
+
+atexit.register(counters.flush)
+
+if hasattr(os, "register_at_fork"):
+    # Le thread de vidage ne survit pas au fork, et les deltas du parent ne doivent pas être écrits deux fois.
+    os.register_at_fork(after_in_child=counters._reset)
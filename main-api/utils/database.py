@@ -1,5 +1,192 @@
-from pymongo import MongoClient
+import os
+import threading
+import time
+from bson import ObjectId
+from pymongo import MongoClient, monitoring
+from pymongo.database import Database
+from .config import Config
+from .helpers import to_objectid
 
-def get_database():
-    client = MongoClient("mongodb://localhost:27017/")
-    return client["watif_db"]
+_client: MongoClient | None = None
+_client_lock = threading.Lock()
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Collects checkout counts and wait times for the shared connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.connections = 0
+            self.in_use = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connections": self.connections,
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": (self.total_wait / self.checkouts * 1000) if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+                "max_pool_size": Config.MONGO_MAX_POOL_SIZE,
+            }
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event) -> None:
+        wait = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def connection_check_out_failed(self, event) -> None:
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.connections -= 1
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+
+pool_stats = PoolStats()
+
+
+def client_options() -> dict:
+    """Pool, timeout and compression options shared by the sync and async clients."""
+    options = dict(
+        maxPoolSize=Config.MONGO_MAX_POOL_SIZE,
+        minPoolSize=Config.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=Config.MONGO_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=Config.MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=Config.MONGO_SOCKET_TIMEOUT_MS,
+        connect=False,
+    )
+    if Config.MONGO_COMPRESSORS:
+        options["compressors"] = Config.MONGO_COMPRESSORS
+    return options
+
+
+def get_client() -> MongoClient:
+    """Return the process-wide MongoClient, creating it on first use.
+
+    The client is dropped in forked children (see `_reset_after_fork`) so each
+    worker opens its own sockets instead of sharing the parent's.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(Config.MONGO_URI, event_listeners=[pool_stats], **client_options())
+    return _client
+
+
+def close_client() -> None:
+    """Close the shared client; the next access opens a fresh one."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def _reset_after_fork() -> None:
+    # The inherited client's sockets belong to the parent: forget it without closing.
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+    pool_stats.reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class LazyDatabase:
+    """Database handle resolved against the shared client on each access.
+
+    Model modules bind it at import time, but no connection is made until the
+    first query, and forked workers transparently get their own client.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def _resolve(self) -> Database:
+        return get_client()[self._name]
+
+    def __getattr__(self, name: str):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name: str):
+        return self._resolve()[name]
+
+
+def get_database() -> LazyDatabase:
+    return LazyDatabase(Config.MONGO_DB)
+
+
+def get_pool_stats() -> dict:
+    return pool_stats.snapshot()
+
+
+def find_by_ids(collection, ids, query: dict | None = None, projection: dict | None = None) -> tuple[list[dict], list[ObjectId]]:
+    """Fetch the documents for `ids` with a single `$in` query.
+
+    Args:
+        collection: The collection to query.
+        ids: Identifiers to load; strings are converted to ObjectId.
+        query: Extra filter applied alongside the `$in` clause.
+        projection: Optional projection passed to `find`.
+
+    Returns:
+        tuple[list[dict], list[ObjectId]]: The documents found, in the order of `ids`,
+        and the identifiers that matched no document.
+    """
+    ids = [to_objectid(i) for i in ids]
+    if not ids:
+        return [], []
+    by_id = {doc["_id"]: doc for doc in collection.find({**(query or {}), "_id": {"$in": list(set(ids))}}, projection)}
+    found, missing = [], []
+    for i in ids:
+        if i in by_id:
+            found.append(by_id[i])
+        else:
+            missing.append(i)
+    return found, missing
@@ -10,3 +10,9 @@ def isobjectid(obj: object) -> bool:
 def allowed_file(filename: str) -> bool:
     allowed_extensions = {'png', 'jpg', 'jpeg', 'gif'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
+
+def to_objectid(obj: object) -> ObjectId | object:
+    """Return `obj` as an ObjectId when it is a valid one, unchanged otherwise."""
+    if isinstance(obj, ObjectId):
+        return obj
+    return ObjectId(obj) if isobjectid(obj) else obj
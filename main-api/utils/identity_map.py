@@ -0,0 +1,79 @@
+from flask import g, has_app_context
+from bson import ObjectId
+from typing import Any, Callable
+from .helpers import to_objectid
+
+# Les objets chargés pendant une requête sont gardés dans `g` : un même document
+# n'est lu qu'une fois par contexte d'application. Hors contexte, rien n'est mis en cache.
+
+
+def _registry() -> dict | None:
+    if not has_app_context():
+        return None
+    if "_identity_map" not in g:
+        g._identity_map = {}
+    return g._identity_map
+
+
+def get(collection: str, obj_id: str | ObjectId) -> Any | None:
+    """Return the object already loaded for `obj_id` in this request, if any."""
+    registry = _registry()
+    if registry is None:
+        return None
+    return registry.get((collection, to_objectid(obj_id)))
+
+
+def put(collection: str, obj_id: str | ObjectId, obj: Any) -> Any:
+    """Remember `obj` for the rest of the request and return it."""
+    registry = _registry()
+    if registry is not None and obj is not None:
+        registry[(collection, to_objectid(obj_id))] = obj
+    return obj
+
+
+def invalidate(collection: str, obj_id: str | ObjectId | None) -> None:
+    """Forget the object loaded for `obj_id`, so the next lookup hits the database."""
+    registry = _registry()
+    if registry is not None and obj_id is not None:
+        registry.pop((collection, to_objectid(obj_id)), None)
+
+
+def clear() -> None:
+    registry = _registry()
+    if registry is not None:
+        registry.clear()
+
+
+def load_many(collection: str, ids: list[str | ObjectId], fetch: Callable, factory: Callable,
+              remember: bool = True) -> tuple[list, list[ObjectId]]:
+    """Resolve `ids` from the identity map, fetching only the ones not loaded yet.
+
+    Args:
+        collection: Name of the collection, used as the map namespace.
+        ids: Identifiers to resolve.
+        fetch: Called with the unknown identifiers, returns `(documents, missing)`.
+        factory: Builds a model object from a document.
+        remember: Whether fetched objects are kept in the map; False for partially loaded objects.
+
+    Returns:
+        tuple[list, list[ObjectId]]: The objects in the order of `ids` and the identifiers not found.
+    """
+    ids = [to_objectid(i) for i in ids]
+    loaded = {}
+    for i in ids:
+        obj = get(collection, i)
+        if obj is not None:
+            loaded[i] = obj
+    unknown = list(dict.fromkeys(i for i in ids if i not in loaded))
+    if unknown:
+        docs, _ = fetch(unknown)
+        for data in docs:
+            obj = factory(data)
+            loaded[data["_id"]] = put(collection, data["_id"], obj) if remember else obj
+    found, missing = [], []
+    for i in ids:
+        if i in loaded:
+            found.append(loaded[i])
+        else:
+            missing.append(i)
+    return found, missing
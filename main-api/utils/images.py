@@ -0,0 +1,122 @@
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+from PIL import Image, ImageOps
+from .config import Config
+
+# Chaîne de traitement des photos de profil : l'original est décodé une fois, recadré en
+# carré à chaque taille de PP_SIZES et ré-encodé en WebP et JPEG. Les fichiers sont nommés
+# d'après le SHA-256 de l'original, deux envois identiques ne sont donc stockés qu'une fois.
+
+Image.MAX_IMAGE_PIXELS = Config.IMAGE_MAX_PIXELS
+
+FORMATS = {
+    "webp": ("WEBP", {"quality": 82, "method": 4}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+MIMETYPES = {"webp": "image/webp", "jpg": "image/jpeg"}
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_VARIANT = re.compile(r"^[0-9a-f]{64}_\d+\.(webp|jpg)$")
+
+
+def is_digest(value: object) -> bool:
+    """Tell whether a stored `pp` value (str or Path) is a content hash produced by this pipeline."""
+    return value is not None and bool(_DIGEST.match(str(value)))
+
+
+def is_variant_name(filename: str) -> bool:
+    """Tell whether `filename` names a processed variant (also rejects any path component)."""
+    return bool(_VARIANT.match(filename))
+
+
+def variant_name(digest: str, size: int, ext: str) -> str:
+    return f"{digest}_{size}.{ext}"
+
+
+def variants_exist(folder: str, digest: str) -> bool:
+    return all(os.path.exists(os.path.join(folder, variant_name(digest, size, ext)))
+               for size in Config.PP_SIZES for ext in FORMATS)
+
+
+def render_variants(source: str, folder: str, digest: str) -> list[str]:
+    """Decode `source` and write every size/format variant of it in `folder`.
+
+    Each file is written under a temporary name then renamed, so a variant is never served half-written.
+
+    Raises:
+        PIL.UnidentifiedImageError: If the file is not a decodable image.
+    """
+    written = []
+    with Image.open(source) as original:
+        original.draft("RGB", (max(Config.PP_SIZES),) * 2)  # décodage JPEG réduit quand c'est possible
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for size in Config.PP_SIZES:
+            side = min(size, *image.size)  # pas d'agrandissement
+            resized = ImageOps.fit(image, (side, side), Image.Resampling.LANCZOS)
+            for ext, (fmt, options) in FORMATS.items():
+                frame = resized
+                if fmt == "JPEG" and frame.mode == "RGBA":
+                    frame = Image.new("RGB", frame.size, (255, 255, 255))
+                    frame.paste(resized, mask=resized.getchannel("A"))
+                path = os.path.join(folder, variant_name(digest, size, ext))
+                tmp = f"{path}.tmp"
+                frame.save(tmp, fmt, **options)
+                os.replace(tmp, path)
+                written.append(path)
+    return written
+
+
+class ImagePipeline:
+    """Background pool running the image processing off the request threads."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._reset()
+
+    def _reset(self) -> None:
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.failed = 0
+
+    def submit(self, source: str, folder: str, digest: str, on_done: Callable[[str], None]) -> Future:
+        """Render the variants of `source` in the background, then call `on_done(digest)`.
+
+        The temporary upload is removed once processed, whether it succeeded or not.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="images")
+            self.pending += 1
+
+        def run():
+            try:
+                if not variants_exist(folder, digest):
+                    render_variants(source, folder, digest)
+                on_done(digest)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.pending -= 1
+                if os.path.exists(source):
+                    os.remove(source)
+
+        return self._executor.submit(run)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "pending": self.pending, "failed": self.failed}
+
+
+pipeline = ImagePipeline(Config.IMAGE_WORKERS)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=pipeline._reset)
@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+from .database import get_database
+
+# Gestion déclarative des index : chaque modèle déclare ses INDEXES et les formes de
+# requêtes (QUERIES) de ses méthodes de recherche ; ce module les synchronise et vérifie
+# avec explain() qu'aucune de ces requêtes ne parcourt toute la collection.
+
+db = get_database()
+
+# Options comparées entre l'index déclaré et l'index existant
+_COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds", "weights", "default_language")
+
+
+def all_models() -> list[type]:
+    from ..models.user import User
+    from ..models.role import Role
+    from ..models.key import Key
+    from ..models.interest import Interest
+    from ..models.thread import Thread
+    from ..models.post import Post
+    from ..models.comment import Comment
+    from ..models.upload import Upload
+    from ..models.timeline import Timeline
+    from ..models.like import Like
+    from ..models.membership import Membership
+    from ..models.trending import KeyBucket, TrendingSnapshot
+    from ..models.suggestion import Suggestion
+    return [User, Role, Key, Interest, Thread, Post, Comment, Upload, Timeline, Like, Membership, KeyBucket, TrendingSnapshot,
+            Suggestion]
+
+
+@dataclass
+class IndexDiff:
+    collection: str
+    missing: list[IndexModel] = field(default_factory=list)
+    changed: list[IndexModel] = field(default_factory=list)
+    extra: list[str] = field(default_factory=list)
+
+    def is_clean(self) -> bool:
+        return not (self.missing or self.changed or self.extra)
+
+
+def declared_indexes(models: list[type] | None = None) -> dict[str, list[IndexModel]]:
+    """Group the declared indexes by collection (several models may share one)."""
+    declared = {}
+    for model in models or all_models():
+        indexes = declared.setdefault(model.COLLECTION, [])
+        names = {index.document["name"] for index in indexes}
+        indexes.extend(index for index in model.INDEXES if index.document["name"] not in names)
+    return declared
+
+
+def _same_definition(index: IndexModel, info: dict) -> bool:
+    wanted = index.document
+    if list(wanted["key"].items()) != [tuple(k) for k in info["key"]]:
+        return False
+    return all(wanted.get(option) == info.get(option) for option in _COMPARED_OPTIONS)
+
+
+def diff_indexes(models: list[type] | None = None) -> list[IndexDiff]:
+    """Compare the declared indexes with the ones present in the database."""
+    diffs = []
+    for collection, indexes in declared_indexes(models).items():
+        existing = db[collection].index_information()
+        diff = IndexDiff(collection)
+        for index in indexes:
+            info = existing.get(index.document["name"])
+            if info is None:
+                diff.missing.append(index)
+            elif not _same_definition(index, info):
+                diff.changed.append(index)
+        declared_names = {index.document["name"] for index in indexes}
+        diff.extra = [name for name in existing if name != "_id_" and name not in declared_names]
+        diffs.append(diff)
+    return diffs
+
+
+def sync_indexes(models: list[type] | None = None, prune: bool = False) -> list[IndexDiff]:
+    """Create the missing indexes; with `prune`, also rebuild changed ones and drop undeclared ones.
+
+    Returns:
+        list[IndexDiff]: The differences found before synchronizing.
+    """
+    diffs = diff_indexes(models)
+    for diff in diffs:
+        collection = db[diff.collection]
+        if prune:
+            for name in diff.extra + [index.document["name"] for index in diff.changed]:
+                collection.drop_index(name)
+        to_create = diff.missing + (diff.changed if prune else [])
+        if to_create:
+            collection.create_indexes(to_create)
+    return diffs
+
+
+def _stages(plan) -> list[str]:
+    # Les plans diffèrent selon le moteur (classique ou SBE) : on parcourt tout l'arbre.
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if isinstance(plan.get("stage"), str) else []
+        for value in plan.values():
+            stages.extend(_stages(value))
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _stages(item)]
+    return []
+
+
+def check_query_plans(models: list[type] | None = None) -> list[tuple[str, str, list[str]]]:
+    """Run `explain()` on every declared finder query and report the winning plan stages.
+
+    Returns:
+        list[tuple[str, str, list[str]]]: `(model.finder, "ok" | "COLLSCAN" | "error", stages)` per query.
+    """
+    report = []
+    for model in models or all_models():
+        for query in model.QUERIES:
+            cursor = db[model.COLLECTION].find(query.filter)
+            if query.sort:
+                cursor = cursor.sort(query.sort)
+            try:
+                stages = _stages(cursor.explain()["queryPlanner"]["winningPlan"])
+            except OperationFailure as e:
+                report.append((f"{model.__name__}.{query.finder}", "error", [str(e)]))
+                continue
+            status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+            report.append((f"{model.__name__}.{query.finder}", status, stages))
+    return report
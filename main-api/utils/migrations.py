@@ -0,0 +1,210 @@
+from datetime import datetime
+from typing import Callable
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.collection import Collection
+from .database import get_database
+
+# Migrations de données par lots, reprenables : l'avancement (dernier _id traité) est
+# enregistré dans la collection `migrations` après chaque lot, une exécution interrompue
+# repart donc du lot suivant.
+
+db = get_database()
+
+COMMENTS_TO_COLLECTION = "comments_to_collection"
+LIKES_TO_COLLECTION = "likes_to_collection"
+COMMENT_TREES = "comment_trees"
+THREAD_MEMBERSHIPS = "thread_memberships"
+THREAD_STATS = "thread_stats"
+
+
+class MigrationOrderError(RuntimeError):
+    """Raised when a migration needs another one to have completed first."""
+
+
+def _require(name: str, before: str) -> None:
+    # Les commentaires doivent être dans leur collection : sinon les likes seraient enregistrés avec la
+    # mauvaise cible, et les arbres de réponses effacés sans avoir été recopiés
+    if not _checkpoint(before)["done"]:
+        raise MigrationOrderError(f"Migration '{name}' requires '{before}' to be complete, run it first")
+
+
+def _checkpoint(name: str) -> dict:
+    return db.migrations.find_one({"_id": name}) or {"_id": name, "last_id": None, "processed": 0, "done": False}
+
+
+def _run_batched(name: str, sources: list[str], query: dict, apply: Callable[[Collection, list[dict]], None],
+                 batch_size: int, max_batches: int | None, progress: Callable[[dict], None] | None,
+                 projection: dict | None = None, rerun: bool = False) -> dict:
+    """Run `apply` on the documents matching `query`, batch by batch in `_id` order, saving a checkpoint after each.
+
+    The collections of `sources` are processed one after the other. `apply` must be idempotent: a
+    batch interrupted before its checkpoint is written is processed again by the next run.
+
+    Args:
+        name: Identifier of the migration in the `migrations` collection.
+        sources: Collections to read, in order.
+        query: Filter selecting the documents still to migrate.
+        apply: Called with the collection and each batch of documents.
+        batch_size: Number of documents per batch.
+        max_batches: Stop after this many batches (the next run resumes), None to run to completion.
+        progress: Called with the checkpoint after each batch.
+        projection: Fields read from the documents, all of them if None.
+        rerun: Start over when the migration already completed, for migrations that recompute values.
+
+    Returns:
+        dict: The checkpoint of the migration (`last_id`, `processed`, `done`).
+    """
+    state = _checkpoint(name)
+    if rerun and state["done"]:
+        state.update(last_id=None, processed=0, done=False, collection=sources[0])
+    state.setdefault("collection", sources[0])
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        collection = db[state["collection"]]
+        page = dict(query)
+        if state["last_id"] is not None:
+            page["_id"] = {"$gt": state["last_id"]}
+        batch = list(collection.find(page, projection).sort("_id", ASCENDING).limit(batch_size))
+        if not batch:
+            position = sources.index(state["collection"])
+            if position + 1 < len(sources):
+                state.update(collection=sources[position + 1], last_id=None)
+                continue
+            state["done"] = True
+            break
+        apply(collection, batch)
+        state["last_id"] = batch[-1]["_id"]
+        state["processed"] += len(batch)
+        state["updated_at"] = datetime.now()
+        db.migrations.replace_one({"_id": name}, state, upsert=True)
+        batches += 1
+        if progress:
+            progress(state)
+    db.migrations.replace_one({"_id": name}, state, upsert=True)
+    return state
+
+
+def migrate_comments(batch_size: int = 1000, max_batches: int | None = None,
+                     progress: Callable[[dict], None] | None = None) -> dict:
+    """Move the comments stored in `posts` (documents without a title) into the `comments` collection.
+
+    Comments are upserted into `comments` before being deleted from `posts`.
+    """
+    def apply(posts: Collection, batch: list[dict]) -> None:
+        db.comments.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch], ordered=False)
+        posts.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}, "title": {"$exists": False}})
+
+    return _run_batched(COMMENTS_TO_COLLECTION, ["posts"], {"title": {"$exists": False}}, apply,
+                        batch_size, max_batches, progress)
+
+
+def migrate_likes(batch_size: int = 1000, max_batches: int | None = None,
+                  progress: Callable[[dict], None] | None = None) -> dict:
+    """Move the `likes` arrays embedded in posts, then comments, into the `likes` collection.
+
+    Each like is upserted on its (target, user) pair, then the array is replaced by `like_count`.
+
+    Raises:
+        MigrationOrderError: If `migrate_comments` has not completed.
+    """
+    _require(LIKES_TO_COLLECTION, COMMENTS_TO_COLLECTION)
+
+    def apply(collection: Collection, batch: list[dict]) -> None:
+        likes = [
+            UpdateOne({"id_target": doc["_id"], "id_user": id_user},
+                      {"$setOnInsert": {"target": collection.name, "date": datetime.now()}}, upsert=True)
+            for doc in batch for id_user in dict.fromkeys(doc.get("likes") or [])
+        ]
+        if likes:
+            db.likes.bulk_write(likes, ordered=False)
+        collection.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"like_count": len(set(doc.get("likes") or []))}, "$unset": {"likes": ""}})
+            for doc in batch
+        ], ordered=False)
+
+    return _run_batched(LIKES_TO_COLLECTION, ["posts", "comments"], {"likes": {"$exists": True}}, apply,
+                        batch_size, max_batches, progress, projection={"likes": 1})
+
+
+def migrate_comment_trees(batch_size: int = 100, max_batches: int | None = None,
+                          progress: Callable[[dict], None] | None = None) -> dict:
+    """Replace the `comments` arrays of posts and comments by materialized paths on the comments.
+
+    Each tree is walked level by level (one `$in` query per level) from the post; every comment gets
+    `id_post`, `id_parent`, `path`, `depth` and `reply_count` with plain `$set`, then the arrays are removed.
+
+    Raises:
+        MigrationOrderError: If `migrate_comments` has not completed.
+    """
+    _require(COMMENT_TREES, COMMENTS_TO_COLLECTION)
+
+    def apply(posts: Collection, batch: list[dict]) -> None:
+        for post in batch:
+            updates = []
+            level = {comment_id: [] for comment_id in post.get("comments") or []}
+            while level:
+                next_level = {}
+                for doc in db.comments.find({"_id": {"$in": list(level)}}, {"comments": 1}):
+                    path = level[doc["_id"]]
+                    children = doc.get("comments") or []
+                    updates.append(UpdateOne({"_id": doc["_id"]}, {
+                        "$set": {"id_post": post["_id"], "id_parent": path[-1] if path else None, "path": path,
+                                 "depth": len(path), "reply_count": len(children)},
+                        "$unset": {"comments": ""},
+                    }))
+                    next_level.update((child, path + [doc["_id"]]) for child in children)
+                level = next_level
+            if updates:
+                db.comments.bulk_write(updates, ordered=False)
+        posts.update_many({"_id": {"$in": [post["_id"] for post in batch]}}, {"$unset": {"comments": ""}})
+
+    return _run_batched(COMMENT_TREES, ["posts"], {"comments": {"$exists": True}}, apply,
+                        batch_size, max_batches, progress, projection={"comments": 1})
+
+
+def migrate_memberships(batch_size: int = 100, max_batches: int | None = None,
+                        progress: Callable[[dict], None] | None = None) -> dict:
+    """Move the `members` and `moderators` arrays of threads into the `memberships` collection.
+
+    Memberships are upserted on their (thread, user) pair before the arrays are replaced by `member_count`.
+    """
+    def apply(threads: Collection, batch: list[dict]) -> None:
+        updates = []
+        for thread in batch:
+            roles = dict.fromkeys(thread.get("members") or [], "member")
+            roles.update(dict.fromkeys(thread.get("moderators") or [], "moderator"))
+            if roles:
+                db.memberships.bulk_write([
+                    UpdateOne({"id_thread": thread["_id"], "id_user": id_user},
+                              {"$set": {"role": role}, "$setOnInsert": {"date": datetime.now()}}, upsert=True)
+                    for id_user, role in roles.items()
+                ], ordered=False)
+            updates.append(UpdateOne({"_id": thread["_id"]}, {"$set": {"member_count": len(roles)}, "$unset": {"members": "", "moderators": ""}}))
+        threads.bulk_write(updates, ordered=False)
+
+    query = {"$or": [{"members": {"$exists": True}}, {"moderators": {"$exists": True}}]}
+    return _run_batched(THREAD_MEMBERSHIPS, ["threads"], query, apply,
+                        batch_size, max_batches, progress, projection={"members": 1, "moderators": 1})
+
+
+def migrate_thread_stats(batch_size: int = 500, max_batches: int | None = None,
+                         progress: Callable[[dict], None] | None = None) -> dict:
+    """Compute the denormalized `post_count` and `last_post_at` of every thread from its posts.
+
+    The values are recomputed and `$set`, so the migration starts over when run again, to repair
+    counters that drifted.
+    """
+    def apply(threads: Collection, batch: list[dict]) -> None:
+        ids = [doc["_id"] for doc in batch]
+        stats = {doc["_id"]: doc for doc in db.posts.aggregate([
+            {"$match": {"id_thread": {"$in": ids}}},
+            {"$group": {"_id": "$id_thread", "post_count": {"$sum": 1}, "last_post_at": {"$max": "$date"}}},
+        ])}
+        threads.bulk_write([
+            UpdateOne({"_id": thread_id}, {"$set": {"post_count": stats.get(thread_id, {}).get("post_count", 0),
+                                                    "last_post_at": stats.get(thread_id, {}).get("last_post_at")}})
+            for thread_id in ids
+        ], ordered=False)
+
+    return _run_batched(THREAD_STATS, ["threads"], {}, apply, batch_size, max_batches, progress,
+                        projection={"_id": 1}, rerun=True)
@@ -0,0 +1,93 @@
+import base64
+import binascii
+from bson import json_util
+from pymongo import ASCENDING, DESCENDING
+from pymongo.collection import Collection
+
+# Pagination par clé (keyset) : le curseur contient les valeurs de tri du dernier
+# document renvoyé, la page suivante repart de là via l'index au lieu de faire un skip().
+
+ID_SORT = [("_id", ASCENDING)]
+RECENT_SORT = [("date", DESCENDING), ("_id", DESCENDING)]
+CHRONO_SORT = [("date", ASCENDING), ("_id", ASCENDING)]
+
+
+def encode_cursor(values: dict) -> str:
+    """Serialize the sort values of the last returned document into an opaque token."""
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort: list[tuple[str, int]]) -> dict:
+    """Decode a token produced by `encode_cursor` for the given sort.
+
+    Raises:
+        ValueError: If the token is malformed or was issued for another sort order.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json_util.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, dict) or set(values) != {name for name, _ in sort}:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_filter(sort: list[tuple[str, int]], after: dict) -> dict:
+    """Build the filter selecting the documents strictly after `after` in `sort` order."""
+    clauses = []
+    for i, (name, direction) in enumerate(sort):
+        clause = {prev: after[prev] for prev, _ in sort[:i]}
+        clause[name] = {"$gt" if direction == ASCENDING else "$lt": after[name]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def paginate(collection: Collection, query: dict, sort: list[tuple[str, int]], limit: int = 30,
+             cursor: str | None = None, projection: dict | None = None) -> tuple[list[dict], str | None]:
+    """Return one page of documents and the cursor of the next page.
+
+    Args:
+        collection: The collection to read.
+        query: Filter of the listing.
+        sort: Sort order; its last key must be unique (usually `_id`) for the order to be stable.
+        limit: Maximum number of documents in the page.
+        cursor: Token returned with the previous page, None for the first page.
+        projection: Optional projection passed to `find`.
+
+    Returns:
+        tuple[list[dict], str | None]: The documents and the next cursor, None on the last page.
+
+    Raises:
+        ValueError: If the cursor is invalid or `limit` is below 1.
+    """
+    _check_limit(limit)
+    docs = list(collection.find(page_query(query, sort, cursor), projection).sort(sort).limit(limit + 1))
+    return split_page(docs, sort, limit)
+
+
+def page_query(query: dict, sort: list[tuple[str, int]], cursor: str | None) -> dict:
+    """Restrict `query` to the documents after `cursor`, if any."""
+    if not cursor:
+        return query
+    after = keyset_filter(sort, decode_cursor(cursor, sort))
+    return {"$and": [query, after]} if query else after
+
+
+def split_page(docs: list[dict], sort: list[tuple[str, int]], limit: int) -> tuple[list[dict], str | None]:
+    """Cut the `limit + 1` documents read for a page into the page and the next cursor.
+
+    Raises:
+        ValueError: If `limit` is below 1.
+    """
+    _check_limit(limit)
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor({name: docs[-1].get(name) for name, _ in sort})
+
+
+def _check_limit(limit: int) -> None:
+    # Une limite nulle ou négative ferait lire toute la collection à MongoDB (limit(0) = sans limite)
+    if limit < 1:
+        raise ValueError("Invalid limit")
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import bcrypt
+from .config import Config
+
+
+class PasswordPoolSaturated(RuntimeError):
+    """Raised when too many hash/verify operations are already waiting for a worker, or one waited longer than the timeout."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, size-limited thread pool instead of the request thread.
+
+    bcrypt releases the GIL, so the pool threads really run in parallel with request handling, while
+    `workers` caps how many cores password work can take. At most `max_queue` operations may wait
+    for a worker; beyond that `PasswordPoolSaturated` is raised right away rather than queueing, and
+    also when an operation is not done after `timeout` seconds.
+
+    Methods:
+        hash(password: str | bytes) -> str: Hashes a password with the configured cost.
+        verify(password: str | bytes, hashed: str | bytes) -> bool: Checks a password against a hash.
+        needs_rehash(hashed: str | bytes) -> bool: Tells whether a hash uses another cost than the configured one.
+        stats() -> dict: Returns the pool saturation metrics.
+    """
+
+    def __init__(self, workers: int, max_queue: int, rounds: int, timeout: float):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self.timeout = timeout
+        self._reset()
+
+    def _reset(self) -> None:
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        self._in_flight = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordPoolSaturated("Password hashing pool is saturated")
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            self._in_flight += 1
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._total_wait += started - submitted
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._in_flight -= 1
+                    self._completed += 1
+                    self._total_run += time.perf_counter() - started
+                self._slots.release()
+
+        try:
+            return self._executor.submit(run).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # L'opération finira en arrière-plan et libérera sa place ; la requête, elle, n'attend plus
+            with self._lock:
+                self._timed_out += 1
+            raise PasswordPoolSaturated("Password hashing pool did not answer in time") from None
+
+    def hash(self, password: str | bytes) -> str:
+        password = password.encode('utf-8') if isinstance(password, str) else password
+        return self._submit(lambda: bcrypt.hashpw(password, bcrypt.gensalt(rounds=self.rounds)).decode('utf-8'))
+
+    def verify(self, password: str | bytes, hashed: str | bytes) -> bool:
+        password = password.encode('utf-8') if isinstance(password, str) else password
+        hashed = hashed.encode('utf-8') if isinstance(hashed, str) else hashed
+        return self._submit(bcrypt.checkpw, password, hashed)
+
+    def needs_rehash(self, hashed: str | bytes) -> bool:
+        hashed = hashed.decode('utf-8') if isinstance(hashed, bytes) else hashed
+        # Format bcrypt : $2b$<coût>$<sel+hash>
+        parts = hashed.split('$')
+        return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != self.rounds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "rounds": self.rounds,
+                "running": self._running,
+                "queued": self._in_flight - self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "avg_wait_ms": (self._total_wait / self._completed * 1000) if self._completed else 0.0,
+                "avg_run_ms": (self._total_run / self._completed * 1000) if self._completed else 0.0,
+            }
+
+
+hasher = PasswordHasher(
+    workers=Config.PASSWORD_POOL_WORKERS,
+    max_queue=Config.PASSWORD_POOL_MAX_QUEUE,
+    rounds=Config.BCRYPT_ROUNDS,
+    timeout=Config.PASSWORD_POOL_TIMEOUT,
+)
+
+if hasattr(os, "register_at_fork"):
+    # Les threads du pool ne survivent pas au fork : chaque worker recrée le sien.
+    os.register_at_fork(after_in_child=hasher._reset)
@@ -0,0 +1,191 @@
+import threading
+import time
+import zlib
+from functools import wraps
+from typing import Protocol
+from flask import request, jsonify, make_response
+from .config import Config
+
+
+class BucketStore(Protocol):
+    """Storage of the token buckets. `consume` must be atomic for a given key."""
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> tuple[bool, float]:
+        """Take `cost` tokens from the bucket `key`, refilled at `rate` tokens per second up to `capacity`.
+
+        A negative `cost` gives tokens back (never above `capacity`) and is always allowed.
+
+        Returns:
+            tuple[bool, float]: Whether the tokens were taken, and otherwise the seconds to wait.
+        """
+        ...
+
+
+class MemoryStore:
+    """
+    In-process bucket store, sharded so concurrent requests on different keys do not share a lock.
+
+    Each shard keeps at most `max_keys` buckets; when full, buckets that have refilled completely
+    (which behave exactly like a missing bucket) are dropped first.
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 10000):
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        self.max_keys = max_keys
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> tuple[bool, float]:
+        buckets, lock = self._shards[zlib.crc32(key.encode('utf-8')) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, last = buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens >= cost:
+                buckets[key] = (min(capacity, tokens - cost), now)
+                allowed, retry_after = True, 0.0
+            else:
+                buckets[key] = (tokens, now)
+                allowed, retry_after = False, (cost - tokens) / rate
+            if len(buckets) > self.max_keys:
+                self._evict(buckets, capacity, rate, now)
+        return allowed, retry_after
+
+    @staticmethod
+    def _evict(buckets: dict, capacity: float, rate: float, now: float) -> None:
+        full = [k for k, (tokens, last) in buckets.items() if tokens + (now - last) * rate >= capacity]
+        for k in full:
+            del buckets[k]
+        if not full:
+            # Aucun seau inactif : on retire les plus anciens
+            for k, _ in sorted(buckets.items(), key=lambda item: item[1][1])[:len(buckets) // 10 or 1]:
+                del buckets[k]
+
+
+class RedisStore:
+    """
+    Bucket store shared by all workers, backed by Redis (or any client speaking its protocol).
+
+    The refill and the consumption run in one Lua script, so they are atomic across processes.
+    The client is injected, which lets tests run it against a local stand-in server.
+    """
+
+    _SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    local retry_after = 0
+    if tokens >= cost then
+        tokens = math.min(capacity, tokens - cost)
+        allowed = 1
+    else
+        retry_after = (cost - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(retry_after)}
+    """
+
+    def __init__(self, client, prefix: str = "watif:ratelimit:"):
+        self.prefix = prefix
+        self._script = client.register_script(self._SCRIPT)
+
+    def consume(self, key: str, capacity: float, rate: float, cost: float = 1.0) -> tuple[bool, float]:
+        allowed, retry_after = self._script(keys=[self.prefix + key], args=[capacity, rate, time.time(), cost])
+        return bool(int(allowed)), float(retry_after)
+
+    @classmethod
+    def from_url(cls, url: str) -> 'RedisStore':
+        import redis  # Dépendance optionnelle, uniquement pour le stockage partagé
+        return cls(redis.Redis.from_url(url))
+
+
+def parse_rule(rule: str) -> tuple[float, float]:
+    """Parse a `"<requests>/<seconds>"` rule into a bucket `(capacity, refill rate per second)`."""
+    requests, seconds = rule.split("/")
+    return float(requests), float(requests) / float(seconds)
+
+
+def store_from_url(url: str) -> BucketStore:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore.from_url(url)
+    return MemoryStore()
+
+
+class RateLimiter:
+    """
+    Applies per-IP and per-email token buckets to credential endpoints.
+
+    The IP bucket counts every attempt. The email bucket only counts failures: its token is taken
+    before the view runs (so parallel attempts cannot all get through) and given back when the view
+    does not answer with a 4xx, so logging in successfully never uses up the allowance of an account.
+    """
+
+    def __init__(self, store: BucketStore | None = None):
+        self._store = store
+
+    @property
+    def store(self) -> BucketStore:
+        if self._store is None:
+            self._store = store_from_url(Config.RATE_LIMIT_STORAGE_URL)
+        return self._store
+
+    @store.setter
+    def store(self, store: BucketStore) -> None:
+        self._store = store
+
+    @staticmethod
+    def _buckets(scope: str, ip: str | None, email: str | None) -> list[tuple[str, str]]:
+        buckets = [(f"{scope}:ip:{ip}", Config.RATE_LIMITS[scope]["ip"])]
+        if email:
+            buckets.append((f"{scope}:email:{email.strip().lower()}", Config.RATE_LIMITS[scope]["email"]))
+        return buckets
+
+    def check(self, scope: str, ip: str | None, email: str | None) -> tuple[bool, float]:
+        """Consume one token from each bucket applying to the request.
+
+        Returns:
+            tuple[bool, float]: Whether the request may proceed, and otherwise the seconds to wait.
+        """
+        for key, rule in self._buckets(scope, ip, email):
+            allowed, retry_after = self.store.consume(key, *parse_rule(rule))
+            if not allowed:
+                return False, retry_after
+        return True, 0.0
+
+    def succeeded(self, scope: str, email: str | None) -> None:
+        """Give back the email token taken by `check`, the attempt did not fail."""
+        if email:
+            key, rule = self._buckets(scope, None, email)[1]
+            self.store.consume(key, *parse_rule(rule), cost=-1.0)
+
+    def limit(self, scope: str, email_field: str):
+        """Decorate a view so it is refused with 429 before any database or bcrypt work once a bucket is empty.
+
+        Args:
+            scope: Name of the rules in `Config.RATE_LIMITS` (`"login"`, `"register"`).
+            email_field: Key of the email in the JSON body, used for the per-email bucket.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                data = request.get_json(silent=True)
+                email = data.get(email_field) if isinstance(data, dict) else None
+                email = email if isinstance(email, str) else None
+                allowed, retry_after = self.check(scope, request.remote_addr, email)
+                if not allowed:
+                    return jsonify({"error": "Too many attempts, please retry later"}), 429, {"Retry-After": str(max(1, int(retry_after + 0.999)))}
+                response = make_response(view(*args, **kwargs))
+                # Seuls les refus (4xx) comptent pour l'email : les connexions réussies rendent leur jeton
+                if not 400 <= response.status_code < 500:
+                    self.succeeded(scope, email)
+                return response
+            return wrapper
+        return decorator
+
+
+limiter = RateLimiter()
@@ -0,0 +1,382 @@
+import bisect
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import NamedTuple, Protocol
+from bson import ObjectId
+from pymongo import TEXT, IndexModel, ASCENDING
+from .config import Config
+from .database import get_database
+from .pagination import encode_cursor, decode_cursor
+from .helpers import to_objectid
+
+# Recherche plein texte sur les utilisateurs, fils, posts et commentaires. Le moteur est
+# interchangeable : index texte MongoDB, ou index inversé en mémoire (préfixes et fautes de frappe)
+# tenu à jour par les save()/delete() des modèles.
+
+db = get_database()
+
+# Champs indexés par collection, avec leur poids dans le score
+FIELDS = {
+    "users": {"username": 10, "description": 2},
+    "threads": {"name": 10},
+    "posts": {"title": 8, "content": 2},
+    "comments": {"content": 2},
+}
+
+_OFFSET_SORT = [("offset", ASCENDING)]
+_WORD = re.compile(r"\w+")
+
+
+def text_index(kind: str) -> IndexModel:
+    """The MongoDB text index of a collection, declared in the model `INDEXES`."""
+    return IndexModel([(name, TEXT) for name in FIELDS[kind]], weights=FIELDS[kind], name="search_text",
+                      default_language="none")
+
+
+def tokenize(text: str) -> list[str]:
+    # Minuscules sans accents : "Été" et "ete" donnent le même terme
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii").lower()
+    return _WORD.findall(text)
+
+
+class SearchHit(NamedTuple):
+    kind: str
+    id: ObjectId
+    score: float
+
+
+class SearchIndex(Protocol):
+    """Backend of the search: ranks documents of the `FIELDS` collections for a query."""
+
+    def update(self, kind: str, obj_id: ObjectId, fields: dict[str, str]) -> None:
+        """Index (or re-index) a document after it was saved."""
+        ...
+
+    def remove(self, kind: str, obj_id: ObjectId) -> None:
+        ...
+
+    def search(self, query: str, kinds: list[str], limit: int, offset: int = 0) -> list[SearchHit]:
+        """Return the hits ranked `offset` to `offset + limit`, best first."""
+        ...
+
+
+class MongoTextIndex:
+    """Search backed by the text indexes of the collections, kept up to date by MongoDB itself."""
+
+    def update(self, kind: str, obj_id: ObjectId, fields: dict[str, str]) -> None:
+        pass
+
+    def remove(self, kind: str, obj_id: ObjectId) -> None:
+        pass
+
+    def search(self, query: str, kinds: list[str], limit: int, offset: int = 0) -> list[SearchHit]:
+        hits = []
+        for kind in kinds:
+            cursor = db[kind].find({"$text": {"$search": query}}, {"score": {"$meta": "textScore"}}) \
+                .sort([("score", {"$meta": "textScore"})]).limit(offset + limit)
+            hits += [SearchHit(kind, doc["_id"], doc["score"]) for doc in cursor]
+        hits.sort(key=lambda hit: hit.score, reverse=True)
+        return hits[offset:offset + limit]
+
+
+class _Terms:
+    # Contenu d'un index inversé ; InvertedIndex en construit un nouveau à chaque reconstruction
+
+    def __init__(self):
+        self.postings: dict[str, dict[tuple[str, ObjectId], float]] = defaultdict(dict)
+        self.documents: dict[tuple[str, ObjectId], set[str]] = {}
+        self.vocabulary: list[str] = []
+        self.deletes: dict[str, set[str]] = defaultdict(set)
+
+    def update(self, kind: str, obj_id: ObjectId, fields: dict[str, str]) -> None:
+        self.remove(kind, obj_id)
+        key = (kind, obj_id)
+        weights = defaultdict(float)
+        for name, text in fields.items():
+            for term in tokenize(text):
+                weights[term] += FIELDS[kind][name]
+        for term, weight in weights.items():
+            if term not in self.postings:
+                bisect.insort(self.vocabulary, term)
+                for deleted in _deletions(term):
+                    self.deletes[deleted].add(term)
+            self.postings[term][key] = weight
+        self.documents[key] = set(weights)
+
+    def remove(self, kind: str, obj_id: ObjectId) -> None:
+        key = (kind, obj_id)
+        for term in self.documents.pop(key, ()):
+            postings = self.postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self.postings[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+                for deleted in _deletions(term):
+                    self.deletes[deleted].discard(term)
+
+    def expand(self, token: str, prefix_factor: float, typo_factor: float) -> dict[str, float]:
+        matches = {token: 1.0} if token in self.postings else {}
+        start = bisect.bisect_left(self.vocabulary, token)
+        for term in self.vocabulary[start:start + Config.SEARCH_MAX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            matches.setdefault(term, prefix_factor)
+        if not matches and len(token) >= 4:
+            candidates = set(self.deletes.get(token, ())) | {d for d in _deletions(token) if d in self.postings}
+            for deleted in _deletions(token):
+                candidates |= self.deletes.get(deleted, set())
+            for term in candidates:
+                if _within_one_edit(token, term):
+                    matches.setdefault(term, typo_factor)
+        return matches
+
+
+class InvertedIndex:
+    """
+    In-process inverted index with prefix matching and single-typo tolerance.
+
+    Postings map each term to the weighted frequency of the term per document. A sorted vocabulary
+    answers prefix queries by bisection; typos are found through a deletion dictionary (every term
+    with one character removed), which finds terms one edit away without scanning the vocabulary.
+    Scores are TF-IDF with the field weights of `FIELDS`; prefix and typo matches count for less.
+
+    The index is built from MongoDB on first use, then updated by the model saves of this process;
+    writes made by other workers are picked up by the periodic rebuild (`Config.SEARCH_REBUILD_INTERVAL`).
+    Rebuilds run in a background thread on a new index, swapped in once complete: searches keep
+    using the current one meanwhile, and updates received during the rebuild are replayed on the new one.
+    """
+
+    PREFIX_FACTOR = 0.7
+    TYPO_FACTOR = 0.5
+
+    def __init__(self):
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # Une reconstruction en cours dans le parent ne continue pas dans l'enfant
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._lock = threading.RLock()  # protège _terms et _journal
+        self._rebuilding = threading.Lock()  # une seule reconstruction à la fois
+        self._terms = _Terms()
+        self._journal: list[tuple[str, tuple]] | None = None  # modifications reçues pendant une reconstruction
+        self._built_at = None
+        self.rebuild_thread: threading.Thread | None = None
+
+    def rebuild(self) -> None:
+        """Rebuild the index from MongoDB now, in the calling thread."""
+        with self._rebuilding:
+            self._build()
+
+    def _build(self) -> None:
+        with self._lock:
+            self._journal = []
+        terms = _Terms()
+        try:
+            for kind, fields in FIELDS.items():
+                for doc in db[kind].find({}, dict.fromkeys(fields, 1)).batch_size(Config.STREAM_BATCH_SIZE):
+                    terms.update(kind, doc["_id"], {name: doc.get(name) or "" for name in fields})
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            for operation, args in self._journal:
+                getattr(terms, operation)(*args)
+            self._terms, self._journal = terms, None
+            self._built_at = time.monotonic()
+
+    def _rebuild_in_background(self) -> None:
+        try:
+            self._build()
+        finally:
+            self._rebuilding.release()
+
+    def _ensure_built(self) -> None:
+        if self._built_at is None:
+            # Premier appel : aucun index à servir en attendant, on attend celui qui le construit
+            with self._rebuilding:
+                if self._built_at is None:
+                    self._build()
+        elif time.monotonic() - self._built_at > Config.SEARCH_REBUILD_INTERVAL and self._rebuilding.acquire(blocking=False):
+            self.rebuild_thread = threading.Thread(target=self._rebuild_in_background, name="search-rebuild", daemon=True)
+            self.rebuild_thread.start()
+
+    def _apply(self, operation: str, *args) -> None:
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((operation, args))
+            if self._built_at is not None:
+                getattr(self._terms, operation)(*args)
+
+    def update(self, kind: str, obj_id: ObjectId, fields: dict[str, str]) -> None:
+        # Avant la première construction, seul le journal compte : la construction lira le document
+        self._apply("update", kind, obj_id, fields)
+
+    def remove(self, kind: str, obj_id: ObjectId) -> None:
+        self._apply("remove", kind, obj_id)
+
+    def _expand(self, token: str) -> dict[str, float]:
+        """Terms matching a query token, with the factor applied to their score."""
+        return self._terms.expand(token, self.PREFIX_FACTOR, self.TYPO_FACTOR)
+
+    def search(self, query: str, kinds: list[str], limit: int, offset: int = 0) -> list[SearchHit]:
+        self._ensure_built()
+        with self._lock:
+            terms = self._terms
+            total = len(terms.documents) or 1
+            scores = defaultdict(float)
+            for token in set(tokenize(query)):
+                for term, factor in self._expand(token).items():
+                    postings = terms.postings[term]
+                    idf = math.log(1 + total / len(postings))
+                    for key, weight in postings.items():
+                        if key[0] in kinds:
+                            scores[key] += factor * weight * idf
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[offset:offset + limit]
+        return [SearchHit(kind, obj_id, score) for (kind, obj_id), score in ranked]
+
+
+def _deletions(term: str) -> set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        # Substitution, ou inversion de deux lettres voisines
+        return len(diffs) <= 1 or (len(diffs) == 2 and diffs[1] == diffs[0] + 1
+                                   and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]])
+    short, long = (a, b) if len(a) < len(b) else (b, a)
+    return any(long[:i] + long[i + 1:] == short for i in range(len(long)))
+
+
+def index_from_config() -> SearchIndex:
+    return InvertedIndex() if Config.SEARCH_BACKEND == "memory" else MongoTextIndex()
+
+
+class SearchService:
+    """Entry point used by the models (incremental updates) and the routes (visibility-aware paging)."""
+
+    def __init__(self, index: SearchIndex | None = None):
+        self._index = index
+
+    @property
+    def index(self) -> SearchIndex:
+        if self._index is None:
+            self._index = index_from_config()
+        return self._index
+
+    @index.setter
+    def index(self, index: SearchIndex) -> None:
+        self._index = index
+
+    def update(self, kind: str, obj) -> None:
+        """Re-index a model instance after `save()`; partial objects only re-index the loaded fields."""
+        fields = {name: obj.__dict__.get(name) or "" for name in FIELDS[kind] if name in obj.__dict__}
+        if len(fields) == len(FIELDS[kind]):
+            self.index.update(kind, obj._id, fields)
+
+    def remove(self, kind: str, obj_id: ObjectId) -> None:
+        self.index.remove(kind, obj_id)
+
+    def search(self, query: str, user_id: str | ObjectId | None, kinds: list[str] | None = None, limit: int = 20,
+               cursor: str | None = None) -> tuple[list[tuple[SearchHit, object]], str | None]:
+        """Return one page of visible results and the cursor of the next page.
+
+        Results in private threads the user cannot read, and results by users blocked by (or blocking)
+        the user, are skipped; the index is read in batches until the page is full.
+
+        Returns:
+            tuple: `(hit, model instance)` pairs, best first, and the next cursor (None on the last page).
+
+        Raises:
+            ValueError: If the cursor or a kind is invalid.
+        """
+        kinds = kinds or list(FIELDS)
+        if any(kind not in FIELDS for kind in kinds):
+            raise ValueError("Unknown result type")
+        offset = decode_cursor(cursor, _OFFSET_SORT)["offset"] if cursor else 0
+        visible = _Visibility(to_objectid(user_id) if user_id else None)
+        results = []
+        while len(results) < limit:
+            batch = self.index.search(query, kinds, limit * 2, offset)
+            for position, (hit, obj) in enumerate(zip(batch, visible.load_many(batch))):
+                if obj is not None:
+                    results.append((hit, obj))
+                if len(results) == limit:
+                    return results, encode_cursor({"offset": offset + position + 1})
+            if len(batch) < limit * 2:
+                return results, None
+            offset += len(batch)
+        return results, encode_cursor({"offset": offset})
+
+
+class _Visibility:
+    # Charge les résultats par lots (une requête par type) et applique les règles d'accès ; les fils
+    # et les blocages sont mis en cache le temps d'une recherche.
+
+    def __init__(self, user_id: ObjectId | None):
+        from ..models.user import User
+        self.user_id = user_id
+        me = User.get_by_id(user_id, projection={"blocked": 1}) if user_id else None
+        self.blocked = set(me.__dict__.get("blocked", [])) if me else set()
+        if user_id:
+            self.blocked |= {doc["_id"] for doc in db.users.find({"blocked": user_id}, {"_id": 1})}
+        self._threads = {}  # fil lisible, ou None
+
+    def _load_threads(self, thread_ids: list[ObjectId]) -> None:
+        from ..models.thread import Thread
+        from ..models.membership import Membership
+        missing = list({thread_id for thread_id in thread_ids if thread_id not in self._threads})
+        if not missing:
+            return
+        threads, _ = Thread.get_by_ids(missing)
+        private = [thread._id for thread in threads if not thread.public and thread.id_owner != self.user_id]
+        roles = Membership.roles_of(self.user_id, private)
+        readable = {thread._id: thread for thread in threads if thread._id not in private or thread._id in roles}
+        for thread_id in missing:
+            self._threads[thread_id] = readable.get(thread_id)
+
+    def load_many(self, hits: list[SearchHit]) -> list:
+        """The model instance of each hit, None where the user may not see it."""
+        from ..models.user import User
+        from ..models.post import Post
+        from ..models.comment import Comment
+        from ..dtos.user_dto import PublicUserDTO
+        ids = defaultdict(list)
+        for hit in hits:
+            ids[hit.kind].append(hit.id)
+        users = {user._id: user for user in User.get_by_ids(ids["users"], projection=User.projection(PublicUserDTO))[0]} if ids["users"] else {}
+        comments = {comment._id: comment for comment in Comment.get_by_ids(ids["comments"])[0]} if ids["comments"] else {}
+        post_ids = ids["posts"] + [comment.id_post for comment in comments.values()]
+        posts = {post._id: post for post in Post.get_by_ids(post_ids)[0]} if post_ids else {}
+        self._load_threads(ids["threads"] + [post.id_thread for post in posts.values()])
+
+        def visible_post(post_id: ObjectId):
+            post = posts.get(post_id)
+            return post if post and post.id_author not in self.blocked and self._threads.get(post.id_thread) else None
+
+        loaded = []
+        for hit in hits:
+            if hit.kind == "users":
+                loaded.append(None if hit.id in self.blocked else users.get(hit.id))
+            elif hit.kind == "threads":
+                loaded.append(self._threads.get(hit.id))
+            elif hit.kind == "posts":
+                loaded.append(visible_post(hit.id))
+            else:
+                comment = comments.get(hit.id)
+                visible = comment and comment.id_author not in self.blocked and visible_post(comment.id_post)
+                loaded.append(comment if visible else None)
+        return loaded
+
+
+search = SearchService()
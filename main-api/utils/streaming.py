@@ -0,0 +1,34 @@
+import json
+from typing import Any, Callable, Iterable
+from flask import Response, request, stream_with_context
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_ndjson() -> bool:
+    """Tell whether the client asked for a streamed NDJSON listing.
+
+    Either with `Accept: application/x-ndjson` or with the `?stream=1` query flag.
+    """
+    if request.args.get("stream", "").lower() in ("1", "true", "ndjson"):
+        return True
+    best = request.accept_mimetypes.best_match([NDJSON_MIMETYPE, "application/json"])
+    return best == NDJSON_MIMETYPE
+
+
+def ndjson_response(items: Iterable, serialize: Callable[[Any], dict], status: int = 200) -> Response:
+    """Stream `items` as one JSON document per line.
+
+    Items are serialized one at a time while the iterable is consumed, so memory use
+    does not depend on the number of results.
+
+    Args:
+        items: Objects to send, typically a generator over a MongoDB cursor.
+        serialize: Converts an item into a JSON-serializable dict.
+        status: HTTP status of the response.
+    """
+    def generate():
+        for item in items:
+            yield json.dumps(serialize(item), default=str) + "\n"
+
+    return Response(stream_with_context(generate()), status=status, mimetype=NDJSON_MIMETYPE)
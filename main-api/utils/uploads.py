@@ -0,0 +1,143 @@
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO, NamedTuple
+from .config import Config
+
+# Réception des fichiers envoyés : le corps est copié par blocs de taille fixe dans un fichier
+# temporaire, la taille annoncée est vérifiée avant toute lecture et la taille réelle pendant la
+# copie, et le type est déduit des premiers octets plutôt que de l'extension du nom.
+
+SIGNATURES = [
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),  # après "RIFF" + taille
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+]
+SNIFF_BYTES = 16
+
+EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "video/mp4": ".mp4",
+    "video/webm": ".webm",
+}
+
+ALLOWED_TYPES = {
+    "pp": {"image/png", "image/jpeg", "image/gif", "image/webp"},
+    "media": set(EXTENSIONS),
+}
+
+
+class UploadError(ValueError):
+    """Raised when an upload is refused; `status` is the HTTP status to answer with."""
+    status = 400
+
+
+class UploadTooLarge(UploadError):
+    status = 413
+
+
+class UnsupportedMediaType(UploadError):
+    status = 415
+
+
+class ReceivedFile(NamedTuple):
+    path: str
+    size: int
+    mime: str
+    sha256: str
+
+
+def sniff(head: bytes) -> str | None:
+    """Return the MIME type matching the magic bytes at the start of a file, or None."""
+    if head[:4] == b"RIFF" and head[8:12] != b"WEBP":
+        return None
+    for offset, signature, mime in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime
+    return None
+
+
+def check_type(kind: str, head: bytes) -> str:
+    mime = sniff(head)
+    if mime not in ALLOWED_TYPES[kind]:
+        raise UnsupportedMediaType("Unsupported file type")
+    return mime
+
+
+def check_length(kind: str, length: int | None) -> None:
+    """Refuse a declared length above the limit of `kind` before reading the body."""
+    if length is not None and length > Config.UPLOAD_LIMITS[kind]:
+        raise UploadTooLarge(f"File exceeds {Config.UPLOAD_LIMITS[kind]} bytes")
+
+
+def receive(stream: BinaryIO, kind: str, declared_length: int | None = None, directory: str | None = None) -> ReceivedFile:
+    """Copy an upload to a temporary file, enforcing the byte limit and the allowed types of `kind`.
+
+    Args:
+        stream: The body to read, consumed in `Config.UPLOAD_CHUNK_SIZE` blocks.
+        kind: `"pp"` or `"media"`, selecting the limit in `Config.UPLOAD_LIMITS` and the allowed types.
+        declared_length: The length announced by the client, checked before anything is read.
+        directory: Where to create the temporary file (the system default if None).
+
+    Raises:
+        UploadTooLarge: If the declared or the streamed length exceeds the limit.
+        UnsupportedMediaType: If the magic bytes match no allowed type.
+    """
+    check_length(kind, declared_length)
+    limit = Config.UPLOAD_LIMITS[kind]
+    digest = hashlib.sha256()
+    size = 0
+    mime = None
+    tmp = tempfile.NamedTemporaryFile(dir=directory, prefix=".upload-", delete=False)
+    try:
+        with tmp:
+            while chunk := stream.read(Config.UPLOAD_CHUNK_SIZE):
+                if mime is None:
+                    mime = check_type(kind, chunk[:SNIFF_BYTES])
+                size += len(chunk)
+                if size > limit:
+                    # La taille annoncée peut être absente ou fausse : on s'arrête dès le dépassement
+                    raise UploadTooLarge(f"File exceeds {limit} bytes")
+                digest.update(chunk)
+                tmp.write(chunk)
+        if mime is None:
+            raise UnsupportedMediaType("Empty file")
+    except BaseException:
+        os.remove(tmp.name)
+        raise
+    return ReceivedFile(tmp.name, size, mime, digest.hexdigest())
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 hex digest of a file, read in blocks."""
+    with open(path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def write_chunk(path: str, stream: BinaryIO, offset: int, max_bytes: int) -> int:
+    """Write `stream` at `offset` of the file `path`, reading at most `max_bytes`.
+
+    Returns:
+        int: The number of bytes written.
+
+    Raises:
+        UploadTooLarge: If the stream holds more than `max_bytes`.
+    """
+    written = 0
+    with open(path, "r+b" if os.path.exists(path) else "wb") as file:
+        file.seek(offset)
+        while chunk := stream.read(Config.UPLOAD_CHUNK_SIZE):
+            written += len(chunk)
+            if written > max_bytes:
+                file.truncate(offset)
+                raise UploadTooLarge("Chunk exceeds the announced range")
+            file.write(chunk)
+        file.truncate(offset + written)
+    return written
@@ -0,0 +1,39 @@
+import importlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Le code de l'API est le paquet `main-api` (importé via importlib, le nom contient un tiret)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Configuration minimale, sans fichier .env ; MONGO_TEST_URI active les tests qui ont besoin d'un mongod
+os.environ.setdefault("SECRET_KEY", "test-secret-of-at-least-32-bytes!")
+os.environ.setdefault("TOKEN_EXPIRES", "1")
+os.environ.setdefault("UPLOAD_FOLDER", tempfile.mkdtemp(prefix="watif-pp-"))
+os.environ.setdefault("MEDIA_PATH", tempfile.mkdtemp(prefix="watif-media-"))
+os.environ["MONGO_DB"] = "watif_test"
+if os.getenv("MONGO_TEST_URI"):
+    os.environ["MONGO_URI"] = os.environ["MONGO_TEST_URI"]
+
+
+def load(name: str):
+    """Import a module of the API package, e.g. `load("utils.pagination")`."""
+    return importlib.import_module(f"main-api.{name}")
+
+
+@pytest.fixture
+def mongodb():
+    """The test database, emptied after the test; skips when MONGO_TEST_URI is not set or unreachable."""
+    if not os.getenv("MONGO_TEST_URI"):
+        pytest.skip("MONGO_TEST_URI is not set")
+    database = load("utils.database")
+    try:
+        database.get_client().admin.command("ping")
+    except Exception as e:
+        pytest.skip(f"MongoDB unreachable: {e}")
+    db = database.get_database()
+    yield db
+    database.get_client().drop_database(db.name)
@@ -0,0 +1,111 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token, create_refresh_token
+
+from conftest import load
+
+api = load("__init__")
+routes = load("aio.routes")
+aio_database = load("aio.database")
+
+
+@pytest.fixture(scope="module")
+def flask_app():
+    app = api.WatifAPI("watif_test")
+    app.jwt.init_app(app)
+    return app
+
+
+@pytest.fixture
+def router(flask_app):
+    return routes.AsyncRouter(app=flask_app)
+
+
+def request(flask_app, headers: dict | None = None) -> "routes.Request":
+    scope = {"method": "GET", "path": "/", "headers": [(k.encode(), v.encode()) for k, v in (headers or {}).items()]}
+    return routes.Request(scope, None, flask_app)
+
+
+def bearer(flask_app, create=create_access_token, **kwargs) -> dict:
+    with flask_app.app_context():
+        return {"Authorization": f"Bearer {create(identity='665f1f77bcf86cd799439011', **kwargs)}"}
+
+
+def test_identity_of_an_access_token(flask_app):
+    assert request(flask_app, bearer(flask_app)).identity() == "665f1f77bcf86cd799439011"
+
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"Authorization": "Bearer not-a-token"},
+    {"Authorization": "Basic dXNlcjpwYXNz"},
+])
+def test_identity_without_valid_token(flask_app, headers):
+    assert request(flask_app, headers).identity() is None
+
+
+def test_identity_rejects_refresh_and_expired_tokens(flask_app):
+    assert request(flask_app, bearer(flask_app, create_refresh_token)).identity() is None
+    assert request(flask_app, bearer(flask_app, expires_delta=timedelta(seconds=-60))).identity() is None
+
+
+def call(router, path: str, query: str = "", headers: dict | None = None) -> tuple[int, dict, bytes]:
+    """Send one GET request through the ASGI router, in a fresh event loop."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode(),
+                 "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]}
+        try:
+            await router(scope, receive, send)
+        finally:
+            await aio_database.close_async_client()
+
+    asyncio.run(run())
+    start = messages[0]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, b"".join(m.get("body", b"") for m in messages[1:])
+
+
+@pytest.fixture
+def thread(mongodb):
+    thread_id = mongodb.threads.insert_one({"name": "aio", "public": True, "id_owner": None}).inserted_id
+    now = datetime.now()
+    mongodb.posts.insert_many([
+        {"id_thread": thread_id, "id_author": None, "title": f"post {i}", "content": "", "date": now - timedelta(minutes=i)}
+        for i in range(105)
+    ])
+    return thread_id
+
+
+def test_thread_posts_pages(router, thread):
+    status, headers, body = call(router, f"/threads/{thread}/posts", "limit=10")
+    assert status == 200
+    assert [post["title"] for post in json.loads(body)] == [f"post {i}" for i in range(10)]
+    status, _, body = call(router, f"/threads/{thread}/posts", f"limit=10&cursor={headers['x-next-cursor']}")
+    assert [post["title"] for post in json.loads(body)] == [f"post {i}" for i in range(10, 20)]
+
+
+def test_thread_posts_limit_is_clamped(router, thread):
+    status, _, body = call(router, f"/threads/{thread}/posts", "limit=1000")
+    assert status == 200 and len(json.loads(body)) == 100
+
+
+@pytest.mark.parametrize("query,error", [("limit=ten", "Invalid limit"), ("cursor=garbage", "Invalid cursor")])
+def test_thread_posts_bad_parameters(router, thread, query, error):
+    status, _, body = call(router, f"/threads/{thread}/posts", query)
+    assert status == 400 and json.loads(body)["error"] == error
+
+
+def test_private_thread_is_hidden(router, mongodb):
+    thread_id = mongodb.threads.insert_one({"name": "private", "public": False, "id_owner": None}).inserted_id
+    status, _, _ = call(router, f"/threads/{thread_id}/posts")
+    assert status == 404
@@ -0,0 +1,151 @@
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+from flask import jsonify
+from flask_jwt_extended import create_access_token
+
+from conftest import load
+
+api = load("__init__")
+
+
+@pytest.fixture(scope="module")
+def app():
+    app = api.WatifAPI("watif_test")
+    app.jwt.init_app(app)
+    return app
+
+
+def bearer(app, identity: ObjectId | None = None) -> dict:
+    with app.app_context():
+        return {"Authorization": f"Bearer {create_access_token(identity=str(identity or ObjectId()))}"}
+
+
+def test_model_values_are_sent_as_strings(app):
+    obj_id = ObjectId()
+    with app.app_context():
+        assert jsonify({"_id": obj_id, "pp": Path("a/b.png")}).get_json() == {"_id": str(obj_id), "pp": "a/b.png"}
+
+
+@pytest.mark.parametrize("rule,method", [
+    ("/threads", "GET"),
+    ("/threads/<thread_id>/posts", "GET"),
+    ("/threads/<thread_id>/members", "POST"),
+    ("/posts", "POST"),
+    ("/posts/<post_id>/like", "PUT"),
+    ("/comments", "POST"),
+    ("/comments/<comment_id>/replies", "GET"),
+    ("/posts/<post_id>/comments", "GET"),
+    ("/keys/<key_id>", "GET"),
+    ("/interests", "POST"),
+])
+def test_routes_are_registered(app, rule, method):
+    assert any(r.rule == rule and method in r.methods for r in app.url_map.iter_rules())
+
+
+def test_get_post_answers_200_when_found(app, monkeypatch):
+    post_model = load("models.post")
+    post = post_model.Post(_id=ObjectId(), id_thread=ObjectId(), id_author=ObjectId(), title="t", content="c")
+    monkeypatch.setattr(post_model.Post, "get_by_id", staticmethod(lambda post_id: post if post_id == post._id else None))
+    client = app.test_client()
+    response = client.get(f"/posts/{post._id}")
+    assert response.status_code == 200 and response.get_json()["title"] == "t"
+    assert client.get(f"/posts/{ObjectId()}").status_code == 404
+
+
+@pytest.mark.parametrize("body,status", [
+    ({"content": "hi", "id_parent": str(ObjectId())}, 404),
+    ({"content": "hi", "id_parent": "not-an-id"}, 404),
+    ({"content": "hi"}, 400),
+    ({"content": "hi", "id_post": "not-an-id"}, 400),
+])
+def test_create_comment_checks_its_parent_and_post(app, monkeypatch, body, status):
+    comment_model = load("models.comment")
+    monkeypatch.setattr(comment_model.Comment, "get_by_id", staticmethod(lambda comment_id: None))
+    assert app.test_client().post("/comments", json=body, headers=bearer(app)).status_code == status
+
+
+@pytest.mark.parametrize("path", ["/posts", "/comments"])
+def test_creating_requires_a_token(app, path):
+    assert app.test_client().post(path, json={"content": "hi"}).status_code == 401
+
+
+@pytest.mark.parametrize("path,body", [
+    ("/posts", {"id_thread": str(ObjectId()), "title": "t", "content": "c"}),
+    ("/comments", {"id_post": str(ObjectId()), "content": "c"}),
+])
+def test_uploads_are_checked_against_the_token_user(app, monkeypatch, path, body):
+    upload_model = load("models.upload")
+    thread = load("models.thread").Thread(_id=ObjectId(body.get("id_thread")), name="t", public=True, id_owner=ObjectId())
+    monkeypatch.setattr(load("models.thread").Thread, "get_by_id", staticmethod(lambda thread_id: thread))
+    user, other = ObjectId(), ObjectId()
+    owners = []
+
+    def completed(upload_ids, id_user):
+        owners.append(id_user)
+        raise load("utils.uploads").UploadError("Uploads not found or not complete")
+
+    monkeypatch.setattr(upload_model.Upload, "completed", staticmethod(completed))
+    response = app.test_client().post(path, json={**body, "id_author": str(other), "medias": [str(ObjectId())]},
+                                      headers=bearer(app, user))
+    assert response.status_code == 400 and owners == [str(user)]
+
+
+@pytest.fixture
+def threads(monkeypatch):
+    thread_model = load("models.thread")
+    owner = ObjectId()
+    found = {thread._id: thread for thread in [
+        thread_model.Thread(_id=ObjectId(), name="public", public=True, id_owner=owner),
+        thread_model.Thread(_id=ObjectId(), name="private", public=False, id_owner=owner),
+    ]}
+    monkeypatch.setattr(thread_model.Thread, "get_by_id", staticmethod(lambda thread_id: found.get(ObjectId(thread_id))))
+    monkeypatch.setattr(thread_model.Thread, "role_of", lambda self, id_user: None)
+    return list(found)
+
+
+def test_create_post_checks_its_thread(app, threads):
+    client = app.test_client()
+    post = {"title": "t", "content": "c"}
+    assert client.post("/posts", json={**post, "id_thread": str(ObjectId())}, headers=bearer(app)).status_code == 404
+    assert client.post("/posts", json={**post, "id_thread": "not-an-id"}, headers=bearer(app)).status_code == 404
+    assert client.post("/posts", json=post, headers=bearer(app)).status_code == 404
+    assert client.post("/posts", json={**post, "id_thread": str(threads[1])}, headers=bearer(app)).status_code == 403
+
+
+def test_create_post_stores_object_ids(app, threads, monkeypatch):
+    post_model = load("models.post")
+    saved = []
+    monkeypatch.setattr(post_model.Post, "save", lambda self: saved.append(self))
+    monkeypatch.setattr(load("models.upload").Upload, "completed", staticmethod(lambda upload_ids, id_user: []))
+    user = ObjectId()
+    response = app.test_client().post("/posts", json={"id_thread": str(threads[0]), "title": "t", "content": "c"},
+                                      headers=bearer(app, user))
+    assert response.status_code == 201
+    assert saved[0].id_thread == threads[0] and saved[0].id_author == user
+
+
+@pytest.mark.parametrize("path", ["/threads", f"/threads/{ObjectId()}/posts", f"/posts/{ObjectId()}/comments", "/api/keys/trending"])
+def test_non_numeric_limit_is_refused(app, monkeypatch, path):
+    thread_model = load("models.thread")
+    thread = thread_model.Thread(_id=ObjectId(), name="t", public=True, id_owner=ObjectId())
+    monkeypatch.setattr(thread_model.Thread, "get_by_id", staticmethod(lambda thread_id: thread))
+    response = app.test_client().get(f"{path}?limit=abc")
+    assert response.status_code == 400 and response.get_json() == {"error": "Invalid limit"}
+
+
+def test_user_query_translates_public_fields(monkeypatch):
+    user_model = load("models.user")
+    role = load("models.role").Role(_id=ObjectId(), name="admin")
+    monkeypatch.setattr(user_model.Role, "get_by_name", staticmethod(lambda name: role if name == "admin" else None))
+    user_id = ObjectId()
+    assert user_model.User.query({"id": str(user_id), "role": "admin", "username": "bob"}) == {
+        "_id": user_id, "id_role": role._id, "username": "bob"}
+    assert user_model.User.query({"role": "nobody"}) == {"id_role": None}
+
+
+@pytest.mark.parametrize("body", [{"password": {"$exists": True}}, {"email": "a@b.c"}, {"projection": {"password": 1}}])
+def test_get_users_refuses_private_filters(app, body):
+    response = app.test_client().post("/api/users", json=body, headers=bearer(app))
+    assert response.status_code == 400 and response.get_json()["error"].startswith("Unknown filter")
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from conftest import load
+
+Comment = load("models.comment").Comment
+
+
+def insert(mongodb, id_post, parent, minutes):
+    path = parent["path"] + [parent["_id"]] if parent else []
+    doc = {"_id": ObjectId(), "id_author": ObjectId(), "content": "", "id_post": id_post,
+           "id_parent": parent["_id"] if parent else None, "path": path, "depth": len(path),
+           "date": datetime(2024, 1, 1) + timedelta(minutes=minutes)}
+    mongodb.comments.insert_one(doc)
+    return doc
+
+
+def test_page_with_replies_keeps_the_first_replies_of_each_parent(mongodb):
+    id_post = ObjectId()
+    first = insert(mongodb, id_post, None, 0)
+    second = insert(mongodb, id_post, None, 1)
+    # Réponses insérées dans le désordre : l'ordre vient du tri de $topN
+    replies = [insert(mongodb, id_post, first, minutes) for minutes in (50, 10, 40, 20, 30)]
+    nested = insert(mongodb, id_post, replies[1], 60)
+
+    nodes, cursor = Comment.page_with_replies(id_post, limit=10, depth=2, replies=3)
+    assert cursor is None
+    assert [node.comment._id for node in nodes] == [first["_id"], second["_id"]]
+    assert [node.comment._id for node in nodes[0].replies] == [replies[1]["_id"], replies[3]["_id"], replies[4]["_id"]]
+    assert [node.comment._id for node in nodes[0].replies[0].replies] == [nested["_id"]]
+    assert nodes[1].replies == []
+
+    nodes, _ = Comment.page_with_replies(id_post, limit=10, depth=1, replies=0)
+    assert all(node.replies == [] for node in nodes)
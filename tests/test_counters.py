@@ -0,0 +1,79 @@
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, AutoReconnect
+
+from conftest import load
+
+counters = load("utils.counters")
+
+
+class FakeCollection:
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.applied = []
+
+    def bulk_write(self, requests, ordered=True):
+        if self.fail is None:
+            self.applied += requests
+            return
+        error = self.fail(requests)
+        if isinstance(error, BulkWriteError):
+            failed = {write_error["index"] for write_error in error.details["writeErrors"]}
+            self.applied += [request for i, request in enumerate(requests) if i not in failed]
+        raise error
+
+
+def first_failed(requests):
+    return BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate"}], "nInserted": 0})
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    collections = {}
+    monkeypatch.setattr(counters, "db", collections)
+    buffer = counters.CounterBuffer(interval=3600, max_pending=1000)
+    buffer._thread = object()  # pas de thread de vidage pendant le test
+    return buffer, collections
+
+
+def test_deltas_are_summed_per_document(buffer):
+    buffer, collections = buffer
+    collections["posts"] = FakeCollection()
+    post_id = ObjectId()
+    buffer.incr("posts", post_id, "like_count", 1)
+    buffer.incr("posts", post_id, "like_count", 1)
+    buffer.incr("posts", post_id, "share_count", 0)
+    assert buffer.flush() == 1
+    assert collections["posts"].applied[0]._doc == {"$inc": {"like_count": 2}}
+    assert buffer.stats()["pending"] == 0
+
+
+def test_only_failed_operations_are_requeued(buffer):
+    buffer, collections = buffer
+    collections["posts"] = FakeCollection(fail=first_failed)
+    collections["comments"] = FakeCollection()
+    first, second, comment = ObjectId(), ObjectId(), ObjectId()
+    buffer.incr("posts", first, "like_count", 1)
+    buffer.incr("posts", second, "like_count", 1)
+    buffer.incr("comments", comment, "like_count", 1)
+    with pytest.raises(BulkWriteError):
+        buffer.flush()
+    assert len(collections["comments"].applied) == 1
+    assert dict(buffer._pending) == {("posts", first): {"like_count": 1}}
+
+    collections["posts"].fail = None
+    assert buffer.flush() == 1
+    assert len(collections["posts"].applied) == 2  # la deuxième n'est pas écrite deux fois
+
+
+def test_other_errors_requeue_the_whole_collection(buffer):
+    buffer, collections = buffer
+    collections["posts"] = FakeCollection(fail=lambda requests: AutoReconnect("down"))
+    collections["comments"] = FakeCollection()
+    post_id, comment_id = ObjectId(), ObjectId()
+    buffer.incr("posts", post_id, "like_count", 3)
+    buffer.incr("comments", comment_id, "like_count", 1)
+    with pytest.raises(AutoReconnect):
+        buffer.flush()
+    assert dict(buffer._pending) == {("posts", post_id): {"like_count": 3}}
+    assert len(collections["comments"].applied) == 1
@@ -0,0 +1,45 @@
+from dataclasses import dataclass, field
+
+import pytest
+from bson import ObjectId
+
+from conftest import load
+
+base = load("models.base")
+
+
+@dataclass(kw_only=True)
+class Item(base.Document):
+    _id: ObjectId = None
+    name: str
+    tags: list[str] = field(default_factory=list)
+
+
+@pytest.mark.parametrize("old, new, expected", [
+    (["a"], ["a", "b", "c"], ("$addToSet", {"$each": ["b", "c"]})),
+    (["a", "b", "c"], ["a", "c"], ("$pull", {"$in": ["b"]})),
+    (["a", "b"], ["b", "a"], None),  # réordonné
+    (["a", "b"], ["a", "c"], None),  # ajout et retrait
+    (["a", "a"], ["a", "a", "b"], None),  # doublons
+    ([{"x": 1}], [{"x": 1}, {"y": 2}], None),  # éléments non hachables
+    (["a", "b"], ["b"], ("$pull", {"$in": ["a"]})),
+])
+def test_list_delta(old, new, expected):
+    assert base._list_delta(old, new) == expected
+
+
+def test_changes_sends_only_modified_fields():
+    item = Item(_id=ObjectId(), name="a", tags=["x"])
+    assert item.changes() == {}
+    item.name = "b"
+    item.tags.append("y")
+    assert item.changes() == {"$set": {"name": "b"}, "$addToSet": {"tags": {"$each": ["y"]}}}
+    item.mark_clean()
+    assert not item.is_dirty()
+
+
+def test_changes_rewrites_reordered_list():
+    item = Item(_id=ObjectId(), name="a", tags=["x", "y"])
+    item.tags.reverse()
+    assert item.changes() == {"$set": {"tags": ["y", "x"]}}
+
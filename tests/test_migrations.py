@@ -0,0 +1,44 @@
+import pytest
+
+from conftest import load
+
+migrations = load("utils.migrations")
+
+
+def test_run_batched_resumes_and_moves_to_next_source(mongodb):
+    mongodb.posts.insert_many([{"n": n} for n in range(5)])
+    mongodb.comments.insert_many([{"n": n} for n in range(3)])
+    seen = []
+
+    def apply(collection, batch):
+        seen.extend((collection.name, doc["n"]) for doc in batch)
+
+    state = migrations._run_batched("test", ["posts", "comments"], {}, apply, batch_size=2, max_batches=2, progress=None)
+    assert not state["done"] and state["processed"] == 4
+    state = migrations._run_batched("test", ["posts", "comments"], {}, apply, batch_size=2, max_batches=None, progress=None)
+    assert state["done"] and state["processed"] == 8
+    assert seen == [("posts", n) for n in range(5)] + [("comments", n) for n in range(3)]
+
+
+class FakeMigrations:
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+
+    def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+
+class FakeDatabase:
+    def __init__(self, checkpoints):
+        self.migrations = FakeMigrations(checkpoints)
+
+    def __getattr__(self, name):
+        raise AssertionError(f"the {name} collection must not be touched")
+
+
+@pytest.mark.parametrize("migrate", ["migrate_likes", "migrate_comment_trees"])
+@pytest.mark.parametrize("checkpoints", [[], [{"_id": "comments_to_collection", "done": False}]])
+def test_migrations_reading_comments_require_them_moved_first(monkeypatch, migrate, checkpoints):
+    monkeypatch.setattr(migrations, "db", FakeDatabase(checkpoints))
+    with pytest.raises(migrations.MigrationOrderError):
+        getattr(migrations, migrate)()
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from conftest import load
+
+pagination = load("utils.pagination")
+
+
+def test_cursor_round_trip_keeps_bson_types():
+    values = {"date": datetime(2024, 5, 1, 12, 30), "_id": ObjectId()}
+    token = pagination.encode_cursor(values)
+    assert "=" not in token
+    assert pagination.decode_cursor(token, pagination.RECENT_SORT) == values
+
+
+@pytest.mark.parametrize("token", ["not base64 !", "bm90IGpzb24", pagination.encode_cursor([1, 2])])
+def test_decode_rejects_malformed_tokens(token):
+    with pytest.raises(ValueError):
+        pagination.decode_cursor(token, pagination.ID_SORT)
+
+
+def test_decode_rejects_cursor_of_another_sort():
+    token = pagination.encode_cursor({"_id": ObjectId()})
+    with pytest.raises(ValueError):
+        pagination.decode_cursor(token, pagination.RECENT_SORT)
+
+
+def test_keyset_filter_single_key():
+    after = {"_id": ObjectId()}
+    assert pagination.keyset_filter(pagination.ID_SORT, after) == {"_id": {"$gt": after["_id"]}}
+
+
+def test_keyset_filter_compound_descending():
+    after = {"date": datetime(2024, 1, 1), "_id": ObjectId()}
+    assert pagination.keyset_filter(pagination.RECENT_SORT, after) == {"$or": [
+        {"date": {"$lt": after["date"]}},
+        {"date": after["date"], "_id": {"$lt": after["_id"]}},
+    ]}
+
+
+def test_page_query_combines_filter_and_cursor():
+    after = {"_id": ObjectId()}
+    token = pagination.encode_cursor(after)
+    assert pagination.page_query({}, pagination.ID_SORT, None) == {}
+    assert pagination.page_query({}, pagination.ID_SORT, token) == {"_id": {"$gt": after["_id"]}}
+    assert pagination.page_query({"public": True}, pagination.ID_SORT, token) == {
+        "$and": [{"public": True}, {"_id": {"$gt": after["_id"]}}]}
+
+
+def test_split_page():
+    docs = [{"_id": ObjectId()} for _ in range(3)]
+    assert pagination.split_page(docs, pagination.ID_SORT, 3) == (docs, None)
+    page, cursor = pagination.split_page(docs, pagination.ID_SORT, 2)
+    assert page == docs[:2]
+    assert pagination.decode_cursor(cursor, pagination.ID_SORT) == {"_id": docs[1]["_id"]}
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_split_page_rejects_limits_below_one(limit):
+    with pytest.raises(ValueError, match="Invalid limit"):
+        pagination.split_page([{"_id": ObjectId()}], pagination.ID_SORT, limit)
+    with pytest.raises(ValueError, match="Invalid limit"):
+        pagination.paginate(None, {}, pagination.ID_SORT, limit)
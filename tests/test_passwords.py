@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+from conftest import load
+
+passwords = load("utils.passwords")
+
+
+def test_hash_and_verify():
+    hasher = passwords.PasswordHasher(workers=1, max_queue=1, rounds=4, timeout=5)
+    hashed = hasher.hash("secret")
+    assert hasher.verify("secret", hashed)
+    assert not hasher.verify("other", hashed)
+    assert not hasher.needs_rehash(hashed)
+
+
+def test_timeout_is_reported_as_saturation():
+    hasher = passwords.PasswordHasher(workers=1, max_queue=1, rounds=4, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(passwords.PasswordPoolSaturated):
+        hasher._submit(release.wait)
+    release.set()
+    assert hasher.stats()["timed_out"] == 1
+
+
+def test_full_queue_is_rejected():
+    hasher = passwords.PasswordHasher(workers=1, max_queue=0, rounds=4, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(passwords.PasswordPoolSaturated):
+        hasher._submit(release.wait)
+    # La première opération occupe encore le seul worker : la suivante est refusée sans attendre
+    with pytest.raises(passwords.PasswordPoolSaturated):
+        hasher._submit(release.wait)
+    release.set()
+    assert hasher.stats()["rejected"] == 1
@@ -0,0 +1,49 @@
+import pytest
+from bson import ObjectId
+
+from conftest import load
+
+api = load("__init__")
+user_model = load("models.user")
+images = load("utils.images")
+
+DIGEST = "a" * 64
+
+
+@pytest.fixture
+def client():
+    app = api.WatifAPI("watif_test")
+    app.jwt.init_app(app)
+    return app.test_client()
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    documents = {}
+
+    def get_by_id(user_id, projection=None):
+        data = documents.get(user_id)
+        return user_model.User.from_partial({"_id": user_id, **data}) if data is not None else None
+
+    monkeypatch.setattr(user_model.User, "get_by_id", staticmethod(get_by_id))
+    return documents
+
+
+def test_user_without_picture_is_404(client, stored):
+    user_id = ObjectId()
+    stored[user_id] = {}
+    assert client.get(f"/api/user/{user_id}/pp").status_code == 404
+
+
+def test_unknown_user_is_404(client, stored):
+    assert client.get(f"/api/user/{ObjectId()}/pp").status_code == 404
+    assert client.get("/api/user/not-an-id/pp").status_code == 404
+
+
+def test_processed_picture_redirects_to_its_variant(client, stored):
+    user_id = ObjectId()
+    stored[user_id] = {"pp": DIGEST}
+    response = client.get(f"/api/user/{user_id}/pp?size=64", headers={"Accept": "image/webp"})
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith(images.variant_name(DIGEST, 64, "webp"))
+    assert client.get(f"/api/user/{user_id}/pp?size=3").status_code == 400
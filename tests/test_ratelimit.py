@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from conftest import load
+
+ratelimit = load("utils.ratelimit")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    monkeypatch.setattr(ratelimit.time, "time", clock)
+    return clock
+
+
+def redis_client():
+    url = os.getenv("REDIS_TEST_URL")
+    if url:
+        redis = pytest.importorskip("redis")
+        return redis.Redis.from_url(url)
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # scripts Lua
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request, clock):
+    if request.param == "memory":
+        return ratelimit.MemoryStore(shards=2)
+    client = redis_client()
+    client.flushdb()
+    return ratelimit.RedisStore(client)
+
+
+def test_parse_rule():
+    assert ratelimit.parse_rule("5/300") == (5.0, 5 / 300)
+
+
+def test_bucket_empties_then_refills(store, clock):
+    for _ in range(3):
+        assert store.consume("k", 3, 1.0) == (True, 0.0)
+    allowed, retry_after = store.consume("k", 3, 1.0)
+    assert not allowed and retry_after == pytest.approx(1.0)
+    clock.now += 0.5
+    allowed, retry_after = store.consume("k", 3, 1.0)
+    assert not allowed and retry_after == pytest.approx(0.5)
+    clock.now += 0.5
+    assert store.consume("k", 3, 1.0)[0]
+
+
+def test_refill_is_capped(store, clock):
+    clock.now += 3600
+    for _ in range(2):
+        assert store.consume("k", 2, 1.0)[0]
+    assert not store.consume("k", 2, 1.0)[0]
+
+
+def test_negative_cost_gives_tokens_back(store):
+    assert store.consume("k", 1, 0.001)[0]
+    assert store.consume("k", 1, 0.001, cost=-1.0)[0]
+    assert store.consume("k", 1, 0.001, cost=-1.0)[0]  # déjà plein : rien de plus
+    assert store.consume("k", 1, 0.001)[0]
+    assert not store.consume("k", 1, 0.001)[0]
+
+
+def test_buckets_are_independent(store):
+    assert store.consume("a", 1, 0.001)[0]
+    assert not store.consume("a", 1, 0.001)[0]
+    assert store.consume("b", 1, 0.001)[0]
+
+
+def test_memory_store_evicts_full_buckets(clock):
+    store = ratelimit.MemoryStore(shards=1, max_keys=2)
+    store.consume("a", 1, 1.0)
+    clock.now += 10
+    store.consume("b", 1, 1.0)
+    store.consume("c", 1, 1.0)
+    buckets, _ = store._shards[0]
+    assert set(buckets) == {"b", "c"}
+
+
+@pytest.fixture
+def app(clock, monkeypatch):
+    flask = pytest.importorskip("flask")
+    monkeypatch.setitem(ratelimit.Config.RATE_LIMITS, "login", {"ip": "100/60", "email": "2/3600"})
+    limiter = ratelimit.RateLimiter(ratelimit.MemoryStore())
+    app = flask.Flask(__name__)
+
+    @app.post("/login")
+    @limiter.limit("login", email_field="mail")
+    def login():
+        ok = flask.request.get_json()["password"] == "right"
+        return (flask.jsonify(ok=True), 200) if ok else (flask.jsonify(ok=False), 401)
+
+    return app.test_client()
+
+
+def test_successful_logins_do_not_use_the_email_bucket(app):
+    for _ in range(5):
+        assert app.post("/login", json={"mail": "a@b.c", "password": "right"}).status_code == 200
+
+
+def test_failed_logins_empty_the_email_bucket(app):
+    for _ in range(2):
+        assert app.post("/login", json={"mail": "A@b.c ", "password": "wrong"}).status_code == 401
+    response = app.post("/login", json={"mail": "a@b.c", "password": "right"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert app.post("/login", json={"mail": "other@b.c", "password": "right"}).status_code == 200
@@ -0,0 +1,151 @@
+import threading
+
+import pytest
+from bson import ObjectId
+
+from conftest import load
+
+search = load("utils.search")
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("python", "python", True),
+    ("python", "pithon", True),   # substitution
+    ("python", "pyhton", True),   # inversion de deux lettres voisines
+    ("python", "pytho", True),    # suppression
+    ("python", "pythons", True),  # insertion
+    ("python", "pyhtno", False),
+    ("python", "pitons", False),
+    ("python", "pyth", False),
+])
+def test_within_one_edit(a, b, expected):
+    assert search._within_one_edit(a, b) is expected
+    assert search._within_one_edit(b, a) is expected
+
+
+def test_deletions():
+    assert search._deletions("abc") == {"bc", "ac", "ab"}
+    assert search._deletions("aa") == {"a"}
+
+
+class FakeCursor(list):
+    def batch_size(self, size):
+        return self
+
+
+class FakeCollection:
+    def __init__(self, docs, on_read=None):
+        self.docs, self.on_read = docs, on_read
+
+    def find(self, query, projection):
+        if self.on_read:
+            self.on_read()
+        return FakeCursor(self.docs)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    collections = {kind: FakeCollection([]) for kind in search.FIELDS}
+    monkeypatch.setattr(search, "db", collections)
+    return collections
+
+
+@pytest.fixture
+def index(fake_db):
+    index = search.InvertedIndex()
+    index.rebuild()
+    return index
+
+
+def test_expand_exact_prefix_and_typo(index):
+    ids = [ObjectId() for _ in range(3)]
+    index.update("threads", ids[0], {"name": "python"})
+    index.update("threads", ids[1], {"name": "pythonistas"})
+    index.update("threads", ids[2], {"name": "cuisine"})
+
+    assert index._expand("python") == {"python": 1.0, "pythonistas": index.PREFIX_FACTOR}
+    assert index._expand("pyth") == {"python": index.PREFIX_FACTOR, "pythonistas": index.PREFIX_FACTOR}
+    assert index._expand("cuisnie") == {"cuisine": index.TYPO_FACTOR}
+    assert index._expand("cusine") == {"cuisine": index.TYPO_FACTOR}
+    # Pas de correction sur les mots courts : trop de faux positifs
+    assert index._expand("cui") == {"cuisine": index.PREFIX_FACTOR}
+    assert index._expand("pyt") == {"python": index.PREFIX_FACTOR, "pythonistas": index.PREFIX_FACTOR}
+    assert index._expand("cat") == {}
+
+
+def test_search_ranks_by_field_weight_and_forgets_removed_documents(index):
+    titled, mentioned = ObjectId(), ObjectId()
+    index.update("posts", titled, {"title": "Été à Lyon", "content": ""})
+    index.update("posts", mentioned, {"title": "Vacances", "content": "un été pluvieux"})
+    index.update("users", ObjectId(), {"username": "ete", "description": ""})
+
+    hits = index.search("ete", ["posts"], 10)
+    assert [hit.id for hit in hits] == [titled, mentioned]
+    assert hits[0].score > hits[1].score
+
+    index.remove("posts", titled)
+    assert [hit.id for hit in index.search("été", ["posts"], 10)] == [mentioned]
+    assert index._expand("lyon") == {}
+
+
+def test_rebuild_replays_updates_received_during_the_build(fake_db):
+    index = search.InvertedIndex()
+    saved, removed = ObjectId(), ObjectId()
+
+    def concurrent_writes():
+        # Sauvegardes d'un autre thread pendant la lecture des collections
+        index.update("threads", saved, {"name": "nouveau"})
+        index.remove("threads", removed)
+
+    fake_db["threads"] = FakeCollection([{"_id": removed, "name": "ancien"}], on_read=concurrent_writes)
+    index.rebuild()
+
+    assert [hit.id for hit in index.search("nouveau", ["threads"], 10)] == [saved]
+    assert index.search("ancien", ["threads"], 10) == []
+
+
+def test_stale_index_is_rebuilt_in_background_and_swapped(index, fake_db, monkeypatch):
+    old = ObjectId()
+    index.update("threads", old, {"name": "musique"})
+    release = threading.Event()
+    fake_db["threads"] = FakeCollection([{"_id": ObjectId(), "name": "musique"}, {"_id": old, "name": "musique"}],
+                                        on_read=release.wait)
+    monkeypatch.setattr(search.Config, "SEARCH_REBUILD_INTERVAL", -1)
+
+    # La reconstruction attend : la recherche répond avec l'index courant sans l'attendre
+    assert [hit.id for hit in index.search("musique", ["threads"], 10)] == [old]
+    rebuild = index.rebuild_thread
+    assert rebuild.is_alive()
+    assert index.search("musique", ["threads"], 10) and index.rebuild_thread is rebuild
+
+    release.set()
+    rebuild.join(timeout=5)
+    assert len(index.search("musique", ["threads"], 10)) == 2
+
+
+def test_search_loads_visible_hits_per_batch(mongodb, monkeypatch):
+    reader, author, blocked, owner = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+    public = mongodb.threads.insert_one({"name": "jardin public", "public": True, "id_owner": owner}).inserted_id
+    private = mongodb.threads.insert_one({"name": "jardin secret", "public": False, "id_owner": owner}).inserted_id
+    mongodb.users.insert_many([{"_id": reader, "username": "reader", "blocked": [blocked]},
+                               {"_id": author, "username": "jardinier"},
+                               {"_id": blocked, "username": "jardin"}])
+    visible = mongodb.posts.insert_one({"id_thread": public, "id_author": author, "title": "jardin", "content": ""}).inserted_id
+    mongodb.posts.insert_one({"id_thread": private, "id_author": author, "title": "jardin", "content": ""})
+    mongodb.posts.insert_one({"id_thread": public, "id_author": blocked, "title": "jardin", "content": ""})
+    comment = mongodb.comments.insert_one({"id_post": visible, "id_author": author, "content": "jardin"}).inserted_id
+
+    monkeypatch.setattr(search, "db", mongodb)
+    service = search.SearchService(search.InvertedIndex())
+    batches, load_many = [], search._Visibility.load_many
+
+    def counting(self, hits):
+        batches.append(len(hits))
+        return load_many(self, hits)
+
+    monkeypatch.setattr(search._Visibility, "load_many", counting)
+
+    results, cursor = service.search("jardin", reader, limit=10)
+    assert cursor is None
+    assert {obj._id for _, obj in results} == {public, visible, comment, author}
+    assert batches == [7]
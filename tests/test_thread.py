@@ -0,0 +1,51 @@
+import pytest
+from bson import ObjectId
+
+from conftest import load
+
+thread_model = load("models.thread")
+membership = load("models.membership")
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def add(id_thread, id_user, role=membership.MEMBER):
+        calls.append(("add", id_thread, id_user, role))
+        return True
+
+    def remove(id_thread, id_user):
+        calls.append(("remove", id_thread, id_user))
+        return True
+
+    monkeypatch.setattr(membership.Membership, "add", staticmethod(add))
+    monkeypatch.setattr(membership.Membership, "remove", staticmethod(remove))
+    monkeypatch.setattr(membership.Membership, "role_of", staticmethod(lambda id_thread, id_user: None))
+    return calls
+
+
+@pytest.fixture
+def thread():
+    thread = thread_model.Thread(_id=ObjectId(), name="t", public=False, id_owner=ObjectId(), member_count=2)
+    thread.mark_clean()
+    return thread
+
+
+def test_add_member(thread, calls):
+    user_id = ObjectId()
+    assert thread.add_member(user_id)
+    assert calls == [("add", thread._id, user_id, membership.MEMBER)]
+    # Compteur déjà incrémenté en base : l'objet suit sans avoir de modification à envoyer
+    assert thread.member_count == 3 and not thread.changes()
+
+
+def test_del_member(thread, calls):
+    assert thread.del_member(ObjectId())
+    assert thread.member_count == 1 and not thread.changes()
+
+
+def test_add_moderator_counts_new_members(thread, calls):
+    assert thread.add_moderator(ObjectId())
+    assert calls[0][3] == membership.MODERATOR
+    assert thread.member_count == 3
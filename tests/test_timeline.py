@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from conftest import load
+
+background = load("utils.background")
+timeline = load("models.timeline")
+Post = load("models.post").Post
+
+
+def test_background_pool_counts_failures():
+    pool = background.BackgroundPool("test", 1)
+    assert pool.submit(lambda a, b: a + b, 1, 2).result() == 3
+    with pytest.raises(ZeroDivisionError):
+        pool.submit(lambda: 1 / 0).result()
+    assert pool.stats() == {"workers": 1, "pending": 0, "failed": 1}
+
+
+@pytest.fixture
+def feed(mongodb):
+    reader, author, owner = ObjectId(), ObjectId(), ObjectId()
+    public = mongodb.threads.insert_one({"name": "public", "public": True, "id_owner": owner}).inserted_id
+    private = mongodb.threads.insert_one({"name": "private", "public": False, "id_owner": owner}).inserted_id
+    mongodb.users.insert_one({"_id": reader, "followed": [author], "blocked": []})
+    mongodb.users.insert_one({"_id": author, "follower_count": 1})
+    now = datetime.now().replace(microsecond=0)
+    posts = []
+    # Les posts les plus récents sont dans un fil privé : invisibles pour le lecteur
+    for i in range(12):
+        thread = private if i < 7 else public
+        posts.append({"_id": ObjectId(), "id_thread": thread, "id_author": author, "title": f"post {i}",
+                      "content": "", "date": now - timedelta(minutes=i)})
+    mongodb.posts.insert_many(posts)
+    mongodb.timelines.insert_one({"_id": reader, "entries": [
+        {key: post[key] for key in ("_id", "date", "id_author", "id_thread")} for post in posts]})
+    return reader
+
+
+def test_pages_are_filled_with_visible_posts(feed):
+    titles, cursor = [], None
+    while True:
+        posts, cursor = timeline.Timeline.read(feed, limit=3, cursor=cursor)
+        assert len(posts) == 3 or cursor is None
+        titles += [post.title for post in posts]
+        if cursor is None:
+            break
+    assert titles == [f"post {i}" for i in range(7, 12)]
+
+
+def test_fan_out_later_pushes_to_the_author_first(mongodb, monkeypatch):
+    author, follower = ObjectId(), ObjectId()
+    mongodb.users.insert_many([{"_id": author, "follower_count": 1}, {"_id": follower, "followed": [author]}])
+    post = Post(_id=ObjectId(), id_thread=ObjectId(), id_author=author, title="t", content="")
+    future = timeline.Timeline.fan_out_later(post)
+    assert mongodb.timelines.find_one({"_id": author})["entries"][0]["_id"] == post._id
+    assert future.result() == 1
+    assert mongodb.timelines.find_one({"_id": follower})["entries"][0]["_id"] == post._id
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from conftest import load
+
+trending = load("models.trending")
+KeyBucket = trending.KeyBucket
+
+NOW = datetime(2026, 1, 1, 12)
+
+
+def bucket(age: timedelta, **counts) -> KeyBucket:
+    return KeyBucket(_id=NOW - age, counts=counts)
+
+
+def ranked(windows: dict, name: str) -> list[tuple[str, float, int]]:
+    return [(str(entry["id_key"]), entry["score"], entry["count"]) for entry in windows[name]]
+
+
+def test_recent_uses_outrank_older_ones():
+    fresh, old = str(ObjectId()), str(ObjectId())
+    windows = trending.rank_windows([bucket(timedelta(minutes=5), **{fresh: 3}),
+                                     bucket(timedelta(minutes=50), **{old: 4})], NOW, 10)
+
+    # 1h : demi-vie de 15 minutes, 3 usages récents valent plus que 4 anciens
+    assert ranked(windows, "1h") == [(fresh, pytest.approx(3 * 0.5 ** (1 / 3)), 3),
+                                     (old, pytest.approx(4 * 0.5 ** (10 / 3)), 4)]
+    # 7d : demi-vie d'un jour, l'écart d'âge compte peu
+    assert [key for key, _, _ in ranked(windows, "7d")] == [old, fresh]
+
+
+def test_buckets_older_than_a_window_are_left_out():
+    key = str(ObjectId())
+    windows = trending.rank_windows([bucket(timedelta(minutes=10), **{key: 1}),
+                                     bucket(timedelta(hours=3), **{key: 2}),
+                                     bucket(timedelta(days=2), **{key: 5})], NOW, 10)
+
+    assert [count for _, _, count in ranked(windows, "1h")] == [1]
+    assert [count for _, _, count in ranked(windows, "24h")] == [3]
+    assert [count for _, _, count in ranked(windows, "7d")] == [8]
+
+
+def test_keeps_the_top_k_best_first():
+    keys = [str(ObjectId()) for _ in range(5)]
+    windows = trending.rank_windows([bucket(timedelta(0), **{key: i + 1 for i, key in enumerate(keys)}),
+                                     bucket(timedelta(0), **{keys[0]: 0})], NOW, 3)
+
+    assert [key for key, _, _ in ranked(windows, "24h")] == keys[:1:-1]
+    assert all(isinstance(entry["id_key"], ObjectId) for entry in windows["1h"])
+
+
+def test_keys_without_score_are_dropped():
+    windows = trending.rank_windows([bucket(timedelta(0), **{str(ObjectId()): 0})], NOW, 10)
+    assert windows == {name: [] for name in trending.WINDOWS}
@@ -0,0 +1,103 @@
+import hashlib
+import io
+
+import pytest
+from bson import ObjectId
+from PIL import Image
+
+from conftest import load
+
+uploads = load("utils.uploads")
+upload_model = load("models.upload")
+
+
+
+def png(width: int = 3, height: int = 2) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+PNG = png()
+
+
+@pytest.mark.parametrize("medias", [["media/cat.png"], [{"path": "../../etc/passwd"}], "not a list"])
+def test_raw_paths_are_refused(medias):
+    with pytest.raises(uploads.UploadError):
+        upload_model.Upload.completed(medias, ObjectId())
+
+
+def test_completed_upload_is_attached_by_id(mongodb):
+    user_id = ObjectId()
+    upload = upload_model.Upload.create(user_id, "media", len(PNG))
+    upload.append(io.BytesIO(PNG), 0)
+    media = upload.complete()
+    assert (media.mime, media.width, media.height, media.size) == ("image/png", 3, 2, len(PNG))
+
+    assert upload_model.Upload.completed([str(upload._id)], user_id) == [media]
+    with pytest.raises(uploads.UploadError):
+        upload_model.Upload.completed([str(upload._id)], ObjectId())  # envoi d'un autre utilisateur
+
+    upload_model.Upload.discard([str(upload._id)])
+    with pytest.raises(uploads.UploadError):
+        upload_model.Upload.completed([str(upload._id)], user_id)
+
+
+def test_unfinished_upload_cannot_be_attached(mongodb):
+    user_id = ObjectId()
+    upload = upload_model.Upload.create(user_id, "media", len(PNG))
+    upload.append(io.BytesIO(PNG[:10]), 0)
+    with pytest.raises(uploads.UploadError):
+        upload_model.Upload.completed([upload._id], user_id)
+
+
+@pytest.mark.parametrize("head,mime", [
+    (b"\x89PNG\r\n\x1a\n\x00\x00", "image/png"),
+    (b"\xff\xd8\xff\xe0\x00\x10JFIF", "image/jpeg"),
+    (b"GIF89a\x01\x00", "image/gif"),
+    (b"RIFF\x24\x00\x00\x00WEBPVP8 ", "image/webp"),
+    (b"RIFF\x24\x00\x00\x00WAVEfmt ", None),
+    (b"\x00\x00\x00\x18ftypmp42", "video/mp4"),
+    (b"\x1a\x45\xdf\xa3\x9f", "video/webm"),
+    (b"<svg xmlns=", None),
+    (b"", None),
+])
+def test_sniff(head, mime):
+    assert uploads.sniff(head) == mime
+
+
+def test_check_type_depends_on_the_kind():
+    mp4 = b"\x00\x00\x00\x18ftypmp42"
+    assert uploads.check_type("media", mp4) == "video/mp4"
+    with pytest.raises(uploads.UnsupportedMediaType):
+        uploads.check_type("pp", mp4)
+    assert uploads.check_type("pp", PNG[:uploads.SNIFF_BYTES]) == "image/png"
+
+
+def test_receive_hashes_and_checks_the_stream(tmp_path):
+    received = uploads.receive(io.BytesIO(PNG), "pp", directory=str(tmp_path))
+    assert received.mime == "image/png" and received.size == len(PNG)
+    assert received.sha256 == uploads.file_digest(received.path)
+
+
+def test_receive_stops_past_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setitem(uploads.Config.UPLOAD_LIMITS, "pp", 16)
+    monkeypatch.setattr(uploads.Config, "UPLOAD_CHUNK_SIZE", 8)
+    with pytest.raises(uploads.UploadTooLarge):
+        uploads.receive(io.BytesIO(PNG), "pp", directory=str(tmp_path))
+    with pytest.raises(uploads.UploadTooLarge):
+        uploads.receive(io.BytesIO(PNG), "pp", declared_length=len(PNG), directory=str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_completed_pp_upload_becomes_the_profile_picture(mongodb, monkeypatch):
+    user_model = load("models.user")
+    used = []
+    monkeypatch.setattr(user_model.User, "use_pp", lambda self, folder, path, digest: used.append((self._id, digest)))
+    monkeypatch.setattr(user_model.User, "get_by_id", staticmethod(lambda uid: user_model.User.from_partial({"_id": uid})))
+    user_id = ObjectId()
+    upload = upload_model.Upload.create(user_id, "pp", len(PNG))
+    upload.append(io.BytesIO(PNG), 0)
+    assert upload.complete() is None
+    assert used == [(user_id, hashlib.sha256(PNG).hexdigest())]
+    assert upload_model.Upload.get_by_id(upload._id) is None